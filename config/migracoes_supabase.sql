@@ -0,0 +1,22 @@
+-- Migrações das tabelas de controle (balancos_trimestrais, log_atualizacoes)
+-- Executar no SQL Editor do Supabase (comandos idempotentes)
+
+-- Manifesto com marcas d'água por ticker publicado ao lado de cada Parquet
+alter table balancos_trimestrais add column if not exists manifesto_path text;
+
+-- Layout do dataset: 'monolitico' (um Parquet) ou 'particionado' (manifesto + partições Ano/Tipo)
+alter table balancos_trimestrais add column if not exists formato text default 'monolitico';
+
+-- Segmentos delta: último delta publicado e quantos aguardam compactação
+alter table balancos_trimestrais add column if not exists segmento_delta text;
+alter table balancos_trimestrais add column if not exists deltas_pendentes integer default 0;
+
+-- Codec e nível de compressão usados nos Parquet da versão
+alter table balancos_trimestrais add column if not exists compressao text;
+alter table balancos_trimestrais add column if not exists nivel_compressao integer;
+
+-- Catálogo (tickers, nomes, trimestres, contas) lido pelo dashboard sem baixar dados
+alter table balancos_trimestrais add column if not exists catalogo_path text;
+
+-- Métricas por etapa da execução (tempo, CPU, registros, bytes, memória) em log_atualizacoes
+alter table log_atualizacoes add column if not exists metricas jsonb;
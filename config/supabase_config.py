@@ -1,30 +1,38 @@
 import os
-from supabase import create_client, Client
 
 # Ler variáveis de ambiente
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-# Debug: verificar se as variáveis foram carregadas
-if not SUPABASE_URL:
-    raise ValueError("SUPABASE_URL não está configurada nas variáveis de ambiente")
+_supabase_client = None
 
-if not SUPABASE_KEY:
-    raise ValueError("SUPABASE_KEY não está configurada nas variáveis de ambiente")
+def validar_configuracao():
+    """Confere as variáveis de ambiente (só quando o cliente é realmente necessário)"""
 
-# Validar formato da URL
-if not SUPABASE_URL.startswith("https://"):
-    raise ValueError(f"SUPABASE_URL inválida: {SUPABASE_URL}")
+    if not SUPABASE_URL:
+        raise ValueError("SUPABASE_URL não está configurada nas variáveis de ambiente")
 
-print(f"🔗 Conectando ao Supabase: {SUPABASE_URL}")
+    if not SUPABASE_KEY:
+        raise ValueError("SUPABASE_KEY não está configurada nas variáveis de ambiente")
 
-_supabase_client = None
+    # Validar formato da URL
+    if not SUPABASE_URL.startswith("https://"):
+        raise ValueError(f"SUPABASE_URL inválida: {SUPABASE_URL}")
 
 def get_supabase_client():
     global _supabase_client
     if _supabase_client is None:
+        validar_configuracao()
+        from supabase import create_client
+
+        print(f"🔗 Conectando ao Supabase: {SUPABASE_URL}")
         _supabase_client = create_client(SUPABASE_URL, SUPABASE_KEY)
         print("✅ Cliente Supabase criado com sucesso")
     return _supabase_client
 
-supabase = get_supabase_client()
+def __getattr__(nome):
+    # `from config.supabase_config import supabase` continua funcionando, mas o
+    # cliente só é criado (e as variáveis validadas) no primeiro acesso
+    if nome == 'supabase':
+        return get_supabase_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {nome!r}")
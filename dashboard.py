@@ -6,7 +6,14 @@ Versão simplificada e estável
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from scripts.data_loader import carregar_dados_completos, selecionar_empresa, listar_todas_empresas
+from scripts.processador_dados import formatar_valores_brasileiros
+from scripts.hierarquia_contas import decodificar_conta
+from scripts.data_loader import (
+    selecionar_fatia_empresa,
+    listar_todas_empresas,
+    carregar_catalogo_ativo,
+    informacoes_empresa,
+)
 
 st.set_page_config(
     page_title="Dashboard B3 - Balanços",
@@ -33,77 +40,132 @@ with st.sidebar:
         empresas,
         index=empresas.index('PETR4') if 'PETR4' in empresas else 0
     )
+    
+    catalogo = carregar_catalogo_ativo()
+    if catalogo:
+        st.caption(f"🕒 Atualizado em {catalogo['gerado_em'][:16].replace('T', ' ')}")
 
 # Main content
 if ticker:
-    st.header(f"🏢 {ticker}")
+    # Resumo do catálogo: título e métricas aparecem antes de ler os dados
+    info = informacoes_empresa(ticker)
+    
+    st.header(f"🏢 {ticker}" + (f" - {info['nome']}" if info and info.get('nome') else ""))
+    
+    # Tabs
+    tab1, tab2, tab3 = st.tabs(["📊 Visão Geral", "📈 Gráficos", "📋 Dados Brutos"])
+    
+    with tab1:
+        st.subheader("Visão Geral da Empresa")
+        metricas = st.container()
+    
+    def mostrar_metricas(trimestres, primeiro_ano, ultimo_ano, contas, rotulo_contas):
+        col1, col2, col3, col4 = metricas.columns(4)
+        col1.metric("Trimestres", trimestres)
+        col2.metric("Primeiro Ano", primeiro_ano)
+        col3.metric("Último Ano", ultimo_ano)
+        col4.metric(rotulo_contas, contas)
+    
+    if info:
+        mostrar_metricas(
+            info['trimestres'], info['primeiro_ano'], info['ultimo_ano'],
+            info['contas'], "Contas (último trimestre)"
+        )
     
     # Carregar dados
     with st.spinner(f"Carregando dados de {ticker}..."):
-        df_empresa, nome = selecionar_empresa(ticker)
+        # Fatia sem cópia da tabela compartilhada; cada aba converte só o que exibe
+        fatia, nome = selecionar_fatia_empresa(ticker)
     
-    if df_empresa is None or df_empresa.empty:
+    if fatia is None:
         st.error(f"⚠️ Nenhum dado encontrado para {ticker}")
         st.info("Verifique se a empresa está na base de dados")
         st.stop()
     
-    # Tabs
-    tab1, tab2, tab3 = st.tabs(["📊 Visão Geral", "📈 Gráficos", "📋 Dados Brutos"])
+    # Versão sem catálogo: métricas calculadas dos dados
+    if not info:
+        resumo = fatia.resumo()
+        mostrar_metricas(
+            resumo['trimestres'], resumo['primeiro_ano'],
+            resumo['ultimo_ano'], resumo['contas'], "Contas Únicas"
+        )
     
     with tab1:
-        st.subheader("Visão Geral da Empresa")
-        
-        # Métricas
-        col1, col2, col3, col4 = st.columns(4)
-        
-        with col1:
-            st.metric("Trimestres", len(df_empresa.groupby(['Ano', 'Trimestre'])))
-        
-        with col2:
-            st.metric("Primeiro Ano", int(df_empresa['Ano'].min()))
-        
-        with col3:
-            st.metric("Último Ano", int(df_empresa['Ano'].max()))
-        
-        with col4:
-            st.metric("Contas Únicas", df_empresa['Conta'].nunique())
-        
         st.markdown("---")
         
         # Tabela de contas mais recentes
         st.subheader("📋 Últimos Dados Disponíveis")
         
-        ultimo_ano = df_empresa['Ano'].max()
-        ultimo_trim = df_empresa[df_empresa['Ano'] == ultimo_ano]['Trimestre'].max()
+        ultimo_ano, ultimo_trim = fatia.ultimo_periodo()
         
-        df_recente = df_empresa[
-            (df_empresa['Ano'] == ultimo_ano) & 
-            (df_empresa['Trimestre'] == ultimo_trim)
-        ].copy()
+        colunas_recente = [c for c in ['Tipo', 'Chave_Conta', 'Nivel_Conta', 'Conta', 'Valor'] if c in fatia.colunas]
+        df_recente = fatia.filtrar(ano=ultimo_ano, trimestre=ultimo_trim).para_pandas(colunas_recente)
         
         if not df_recente.empty:
             st.markdown(f"**Período:** {ultimo_ano} - Q{ultimo_trim}")
-            
-            # Formatar valores
-            df_recente['Valor_Formatado'] = df_recente['Valor'].apply(
-                lambda x: f"R$ {x:,.0f}".replace(',', '.')
-            )
+
+            # Drill-down: contas acima do último nível, que podem ter subcontas
+            contas_pai = None
+            if 'Chave_Conta' in df_recente.columns and df_recente['Nivel_Conta'].notna().any():
+                niveis = df_recente['Nivel_Conta']
+                contas_pai = df_recente[niveis.notna() & (niveis < niveis.max())].sort_values(['Tipo', 'Chave_Conta'])
+
+            # Ordem da árvore de contas e nível de detalhe (rollup pela hierarquia)
+            if 'Chave_Conta' in df_recente.columns and df_recente['Nivel_Conta'].notna().any():
+                nivel_maximo = int(df_recente['Nivel_Conta'].max())
+
+                if nivel_maximo > 1:
+                    nivel = st.slider("Nível de detalhe", 1, nivel_maximo, min(2, nivel_maximo))
+                    df_recente = df_recente[df_recente['Nivel_Conta'] <= nivel]
+
+                df_recente = df_recente.sort_values(['Tipo', 'Chave_Conta'])
+
+            # Formatar valores (só as linhas exibidas, em mil/mi/bi)
+            df_recente = df_recente[['Conta', 'Valor']].head(20)
+            df_recente['Valor_Formatado'] = formatar_valores_brasileiros(df_recente['Valor'], escala='auto')
             
             st.dataframe(
-                df_recente[['Conta', 'Valor_Formatado']].head(20),
+                df_recente[['Conta', 'Valor_Formatado']],
                 use_container_width=True,
                 hide_index=True
             )
+            
+            if contas_pai is not None and not contas_pai.empty:
+                st.markdown("**🔎 Detalhar conta**")
+                
+                opcoes = {
+                    f"{decodificar_conta(linha.Chave_Conta, linha.Nivel_Conta)} - {linha.Conta}": linha
+                    for linha in contas_pai.itertuples()
+                }
+                escolhida = opcoes[st.selectbox("Conta", list(opcoes))]
+                codigo = decodificar_conta(escolhida.Chave_Conta, escolhida.Nivel_Conta)
+                
+                # Subárvore pelo intervalo de chaves, direto na fatia
+                df_subcontas = fatia.filtrar(
+                    ano=ultimo_ano, trimestre=ultimo_trim, tipo=escolhida.Tipo, conta_pai=codigo
+                ).para_pandas(['Chave_Conta', 'Nivel_Conta', 'Conta', 'Valor']).sort_values('Chave_Conta')
+                
+                df_subcontas['Código'] = [
+                    decodificar_conta(chave, nivel)
+                    for chave, nivel in zip(df_subcontas['Chave_Conta'], df_subcontas['Nivel_Conta'])
+                ]
+                df_subcontas['Valor_Formatado'] = formatar_valores_brasileiros(df_subcontas['Valor'], escala='auto')
+                
+                st.dataframe(
+                    df_subcontas[['Código', 'Conta', 'Valor_Formatado']],
+                    use_container_width=True,
+                    hide_index=True
+                )
     
     with tab2:
         st.subheader("📈 Evolução de Contas")
         
         # Seletor de conta
-        contas_disponiveis = sorted(df_empresa['Conta'].unique())
+        contas_disponiveis = fatia.distintos('Conta')
         conta_selecionada = st.selectbox("Selecione a Conta", contas_disponiveis)
         
         if conta_selecionada:
-            df_conta = df_empresa[df_empresa['Conta'] == conta_selecionada].copy()
+            df_conta = fatia.filtrar(conta=conta_selecionada).para_pandas(['Ano', 'Trimestre', 'Valor'])
             
             # Criar coluna de período
             df_conta['Período'] = df_conta['Ano'].astype(str) + '-Q' + df_conta['Trimestre'].astype(str)
@@ -123,9 +185,7 @@ if ticker:
             
             # Tabela de dados
             st.markdown("**Dados:**")
-            df_conta['Valor_Formatado'] = df_conta['Valor'].apply(
-                lambda x: f"R$ {x:,.0f}".replace(',', '.')
-            )
+            df_conta['Valor_Formatado'] = formatar_valores_brasileiros(df_conta['Valor'])
             st.dataframe(
                 df_conta[['Período', 'Valor_Formatado']],
                 use_container_width=True,
@@ -139,33 +199,32 @@ if ticker:
         col1, col2 = st.columns(2)
         
         with col1:
-            anos = sorted(df_empresa['Ano'].unique(), reverse=True)
+            anos = sorted(fatia.distintos('Ano'), reverse=True)
             ano_filtro = st.selectbox("Ano", ['Todos'] + list(anos))
         
         with col2:
             busca = st.text_input("Buscar Conta", "")
         
         # Aplicar filtros
-        df_filtrado = df_empresa.copy()
-        
-        if ano_filtro != 'Todos':
-            df_filtrado = df_filtrado[df_filtrado['Ano'] == ano_filtro]
-        
-        if busca:
-            df_filtrado = df_filtrado[
-                df_filtrado['Conta'].str.contains(busca, case=False, na=False)
-            ]
-        
-        # Formatar
-        df_filtrado['Valor_Formatado'] = df_filtrado['Valor'].apply(
-            lambda x: f"R$ {x:,.0f}".replace(',', '.')
+        df_filtrado = fatia.filtrar(
+            ano=None if ano_filtro == 'Todos' else ano_filtro,
+            busca=busca or None
+        ).para_pandas()
+        
+        # Texto no padrão BRL (igual às outras abas) e, ao lado, o valor numérico
+        # para ordenar clicando na coluna (texto ordenaria como string)
+        df_exibicao = df_filtrado[['Ticker', 'Conta', 'Ano', 'Trimestre', 'Valor']].sort_values(
+            ['Ano', 'Trimestre'], 
+            ascending=False
         )
+        df_exibicao.insert(4, 'Valor_Formatado', formatar_valores_brasileiros(df_exibicao['Valor']))
         
         st.dataframe(
-            df_filtrado[['Ticker', 'Conta', 'Ano', 'Trimestre', 'Valor_Formatado']].sort_values(
-                ['Ano', 'Trimestre'], 
-                ascending=False
-            ),
+            df_exibicao,
+            column_config={
+                'Valor_Formatado': st.column_config.TextColumn("Valor"),
+                'Valor': st.column_config.NumberColumn("Valor (ordenar)", format="%.0f"),
+            },
             use_container_width=True,
             hide_index=True
         )
@@ -0,0 +1,323 @@
+"""
+Armazenamento do dataset de balanços
+Interface única para o bucket 'balancos', a tabela de controle
+balancos_trimestrais, o log_atualizacoes e o cadastro empresas_ativas.
+Duas implementações: Supabase (produção) e diretório local + SQLite
+(execução e profiling offline). Escolha por BALANCOS_ARMAZENAMENTO.
+"""
+
+import io
+import os
+import json
+import sqlite3
+import threading
+
+import requests
+
+# 'supabase' (padrão) ou 'local'
+TIPO_ARMAZENAMENTO = os.environ.get('BALANCOS_ARMAZENAMENTO', 'supabase')
+
+# Raiz do armazenamento local (bucket em balancos/, catálogo em catalogo.sqlite)
+DIRETORIO_LOCAL = os.environ.get('BALANCOS_DIR_LOCAL', 'dados_locais')
+
+# Validade (segundos) das URLs assinadas usadas para leitura por faixa de bytes
+VALIDADE_URL_ASSINADA = 3600
+
+_armazenamento = None
+
+
+class ArquivoRemoto(io.RawIOBase):
+    """Arquivo somente leitura sobre HTTP: cada read vira uma requisição com Range"""
+
+    def __init__(self, url, timeout=60):
+        self.url = url
+        self.timeout = timeout
+        self.posicao = 0
+        self.bytes_lidos = 0
+
+        response = requests.get(url, headers={'Range': 'bytes=0-0'}, timeout=timeout)
+        response.raise_for_status()
+
+        content_range = response.headers.get('Content-Range', '')
+        if response.status_code == 206 and '/' in content_range:
+            self.tamanho = int(content_range.rsplit('/', 1)[-1])
+        else:
+            raise IOError("Servidor não aceita leitura por faixa de bytes")
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.posicao
+
+    def seek(self, deslocamento, origem=io.SEEK_SET):
+        if origem == io.SEEK_SET:
+            self.posicao = deslocamento
+        elif origem == io.SEEK_CUR:
+            self.posicao += deslocamento
+        else:
+            self.posicao = self.tamanho + deslocamento
+        return self.posicao
+
+    def readinto(self, buffer):
+        if self.posicao >= self.tamanho or len(buffer) == 0:
+            return 0
+
+        fim = min(self.posicao + len(buffer), self.tamanho) - 1
+        response = requests.get(
+            self.url,
+            headers={'Range': f'bytes={self.posicao}-{fim}'},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+
+        # 200 traria o arquivo inteiro a partir do byte 0, não a faixa pedida
+        if response.status_code != 206:
+            raise IOError(f"Servidor ignorou a faixa de bytes pedida (HTTP {response.status_code}): {self.url}")
+
+        dados = response.content
+        if len(dados) > len(buffer):
+            raise IOError(f"Servidor devolveu {len(dados):,} bytes para uma faixa de {len(buffer):,}: {self.url}")
+        buffer[:len(dados)] = dados
+        self.posicao += len(dados)
+        self.bytes_lidos += len(dados)
+
+        return len(dados)
+
+
+class ArmazenamentoSupabase:
+    """Bucket e tabelas no Supabase; o cliente só é criado no primeiro uso"""
+
+    nome = 'supabase'
+
+    def __init__(self, cliente=None):
+        self._cliente = cliente
+
+    @property
+    def cliente(self):
+        if self._cliente is None:
+            from config.supabase_config import get_supabase_client
+            self._cliente = get_supabase_client()
+        return self._cliente
+
+    def baixar(self, caminho):
+        """Conteúdo de um objeto do bucket"""
+        return self.cliente.storage.from_('balancos').download(caminho)
+
+    def enviar(self, caminho, conteudo, tipo_conteudo='application/octet-stream'):
+        """Grava um objeto no bucket"""
+        self.cliente.storage.from_('balancos').upload(
+            caminho,
+            conteudo,
+            file_options={"content-type": tipo_conteudo}
+        )
+
+    def url_assinada(self, caminho, validade=VALIDADE_URL_ASSINADA):
+        """URL temporária do Storage para leitura direta (aceita Range)"""
+        resposta = self.cliente.storage.from_('balancos').create_signed_url(caminho, validade)
+        return resposta.get('signedURL') or resposta.get('signedUrl')
+
+    def abrir(self, caminho):
+        """Arquivo com leitura por faixa de bytes (só o que for lido trafega)"""
+        return ArquivoRemoto(self.url_assinada(caminho))
+
+    def registro_ativo(self):
+        """Linha ativa mais recente da tabela de controle balancos_trimestrais"""
+
+        resultado = self.cliente.table('balancos_trimestrais') \
+            .select('*') \
+            .eq('status', 'ativo') \
+            .order('data_upload', desc=True) \
+            .limit(1) \
+            .execute()
+
+        return resultado.data[0] if resultado.data else None
+
+    def trocar_versao_ativa(self, novo_registro):
+        """Desativa a versão atual e insere a nova linha ativa"""
+
+        self.cliente.table('balancos_trimestrais') \
+            .update({'status': 'inativo'}) \
+            .eq('status', 'ativo') \
+            .execute()
+
+        self.cliente.table('balancos_trimestrais').insert(novo_registro).execute()
+
+    def registrar_log(self, log):
+        """Insere uma linha em log_atualizacoes"""
+        self.cliente.table('log_atualizacoes').insert(log).execute()
+
+    def nome_empresa(self, ticker):
+        """Razão social em empresas_ativas (None se não cadastrada)"""
+
+        resultado = self.cliente.table('empresas_ativas') \
+            .select('razao_social') \
+            .eq('ticker', ticker) \
+            .limit(1) \
+            .execute()
+
+        return resultado.data[0]['razao_social'] if resultado.data else None
+
+
+class ArmazenamentoLocal:
+    """
+    Bucket em diretório e tabelas em SQLite, para rodar ingestão, publicação
+    e dashboard sem rede. Colunas novas da tabela de controle são criadas
+    conforme aparecem (equivalente às migrações do Supabase).
+    """
+
+    nome = 'local'
+
+    def __init__(self, diretorio=DIRETORIO_LOCAL):
+        self.diretorio = diretorio
+        self.diretorio_bucket = os.path.join(diretorio, 'balancos')
+        self.caminho_catalogo = os.path.join(diretorio, 'catalogo.sqlite')
+        self._trava = threading.Lock()
+
+        os.makedirs(self.diretorio_bucket, exist_ok=True)
+        self._criar_tabelas()
+
+    def _conectar(self):
+        conexao = sqlite3.connect(self.caminho_catalogo)
+        conexao.row_factory = sqlite3.Row
+        return conexao
+
+    def _criar_tabelas(self):
+        with self._conectar() as conexao:
+            conexao.execute("""
+                create table if not exists balancos_trimestrais (
+                    id integer primary key autoincrement,
+                    arquivo_path text,
+                    arquivo_nome text,
+                    registros_total integer,
+                    status text,
+                    data_upload text
+                )
+            """)
+            conexao.execute("""
+                create table if not exists log_atualizacoes (
+                    id integer primary key autoincrement,
+                    tipo_atualizacao text,
+                    status text,
+                    registros_novos integer,
+                    mensagem text,
+                    data_execucao text
+                )
+            """)
+            conexao.execute("""
+                create table if not exists empresas_ativas (
+                    ticker text primary key,
+                    cnpj text,
+                    razao_social text
+                )
+            """)
+
+            # Cadastro inicial a partir do registro de empresas do repositório
+            if not conexao.execute("select 1 from empresas_ativas limit 1").fetchone():
+                from scripts.registro_empresas import obter_registro
+                registro = obter_registro()
+                conexao.executemany(
+                    "insert or replace into empresas_ativas (ticker, cnpj, razao_social) values (?, ?, ?)",
+                    [(ticker, registro.cnpj_texto(ticker), registro.nome(ticker)) for ticker in registro.tickers()]
+                )
+
+    def _caminho_objeto(self, caminho):
+        raiz = os.path.abspath(self.diretorio_bucket)
+        destino = os.path.abspath(os.path.join(raiz, caminho))
+        if not destino.startswith(raiz + os.sep):
+            raise ValueError(f"Caminho fora do bucket: {caminho}")
+        return destino
+
+    def baixar(self, caminho):
+        with open(self._caminho_objeto(caminho), 'rb') as f:
+            return f.read()
+
+    def enviar(self, caminho, conteudo, tipo_conteudo='application/octet-stream'):
+        destino = self._caminho_objeto(caminho)
+        # Como no Storage do Supabase: objeto publicado é imutável (o cache local depende disso)
+        if os.path.exists(destino):
+            raise FileExistsError(f"Objeto já existe no bucket: {caminho}")
+        os.makedirs(os.path.dirname(destino), exist_ok=True)
+
+        temporario = destino + '.tmp'
+        with open(temporario, 'wb') as f:
+            f.write(conteudo)
+        os.replace(temporario, destino)
+
+    def abrir(self, caminho):
+        return open(self._caminho_objeto(caminho), 'rb')
+
+    def _garantir_colunas(self, conexao, tabela, linha):
+        existentes = {c['name'] for c in conexao.execute(f"pragma table_info({tabela})")}
+        for coluna, valor in linha.items():
+            if coluna not in existentes:
+                tipo = 'integer' if isinstance(valor, (bool, int)) else 'real' if isinstance(valor, float) else 'text'
+                conexao.execute(f'alter table {tabela} add column "{coluna}" {tipo}')
+
+    def _inserir(self, conexao, tabela, linha):
+        # Listas/dicionários (ex.: métricas) ficam como JSON, como em colunas jsonb
+        linha = {
+            c: json.dumps(v) if isinstance(v, (dict, list)) else v
+            for c, v in linha.items()
+        }
+        self._garantir_colunas(conexao, tabela, linha)
+        colunas = ', '.join(f'"{c}"' for c in linha)
+        marcadores = ', '.join('?' for _ in linha)
+        conexao.execute(f"insert into {tabela} ({colunas}) values ({marcadores})", list(linha.values()))
+
+    def registro_ativo(self):
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "select * from balancos_trimestrais where status = 'ativo' "
+                "order by data_upload desc, id desc limit 1"
+            ).fetchone()
+        return dict(linha) if linha else None
+
+    def trocar_versao_ativa(self, novo_registro):
+        # Uma transação: leitores nunca veem zero ou duas versões ativas
+        with self._trava, self._conectar() as conexao:
+            conexao.execute("update balancos_trimestrais set status = 'inativo' where status = 'ativo'")
+            self._inserir(conexao, 'balancos_trimestrais', novo_registro)
+
+    def registrar_log(self, log):
+        with self._trava, self._conectar() as conexao:
+            self._inserir(conexao, 'log_atualizacoes', log)
+
+    def nome_empresa(self, ticker):
+        with self._conectar() as conexao:
+            linha = conexao.execute(
+                "select razao_social from empresas_ativas where ticker = ? limit 1", (ticker,)
+            ).fetchone()
+        return linha['razao_social'] if linha else None
+
+
+def criar_armazenamento(tipo=None, diretorio=None):
+    """Instancia o armazenamento pelo tipo ('supabase' ou 'local')"""
+
+    tipo = tipo or TIPO_ARMAZENAMENTO
+
+    if tipo == 'local':
+        return ArmazenamentoLocal(diretorio or DIRETORIO_LOCAL)
+    if tipo == 'supabase':
+        return ArmazenamentoSupabase()
+
+    raise ValueError(f"Armazenamento desconhecido: {tipo} (use 'supabase' ou 'local')")
+
+def obter_armazenamento():
+    """Armazenamento configurado para o processo (criado uma vez)"""
+
+    global _armazenamento
+
+    if _armazenamento is None:
+        _armazenamento = criar_armazenamento()
+
+    return _armazenamento
+
+def definir_armazenamento(armazenamento):
+    """Troca o armazenamento do processo (ex.: opção --armazenamento na linha de comando)"""
+
+    global _armazenamento
+    _armazenamento = armazenamento
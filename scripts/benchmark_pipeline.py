@@ -0,0 +1,381 @@
+"""
+Benchmark ponta a ponta do pipeline CVM → dataset → dashboard
+Gera ZIPs sintéticos (gerador_cvm_sintetico), serve-os por HTTP local no lugar
+da CVM e mede cada etapa (download, leitura, transformação, filtro, publicação,
+compactação, escrita Parquet e carga do dashboard): tempo, vazão e pico de memória.
+Tudo roda no armazenamento local, sem Supabase e sem rede.
+
+Uso:
+    python scripts/benchmark_pipeline.py --empresas 400 --anos 2021 2024 --contas 60
+    python scripts/benchmark_pipeline.py --saida atual.json --comparar base.json --tolerancia 0.2
+"""
+
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+import contextlib
+from datetime import datetime
+from functools import partial
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.metricas_pipeline import MetricasPipeline, memoria_pico_processo, novo_coletor, obter_metricas
+
+# Abaixo destes valores a comparação com a base é só ruído de medição
+PISO_COMPARACAO = {'segundos': 0.05, 'delta_memoria_mb': 10}
+
+
+class MedidorEtapas(MetricasPipeline):
+    """Etapas do benchmark: métricas do pipeline mais vazão, com a saída do pipeline suprimida"""
+
+    def __init__(self, verboso=False):
+        super().__init__()
+        self.verboso = verboso
+
+    @contextlib.contextmanager
+    def etapa(self, nome, **atributos):
+        """O dicionário devolvido aceita 'registros' e 'bytes' para o cálculo de vazão"""
+
+        saida = contextlib.nullcontext() if self.verboso else contextlib.redirect_stdout(io.StringIO())
+
+        with super().etapa(nome, registros=None, bytes=None, **atributos) as resultado:
+            with saida:
+                yield resultado
+
+        duracao = resultado['segundos']
+        if resultado['registros'] and duracao > 0:
+            resultado['registros_por_segundo'] = round(resultado['registros'] / duracao)
+        if resultado['bytes'] and duracao > 0:
+            resultado['mb_por_segundo'] = round(resultado['bytes'] / 1024 / 1024 / duracao, 1)
+
+        print(f"   ⏱️  {nome:<22} {duracao:8.2f}s")
+
+
+class _HandlerSilencioso(SimpleHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
+
+@contextlib.contextmanager
+def servidor_local(diretorio):
+    """Serve o diretório por HTTP (porta livre) e devolve a URL base, no formato da CVM"""
+
+    servidor = ThreadingHTTPServer(('127.0.0.1', 0), partial(_HandlerSilencioso, directory=diretorio))
+    thread = threading.Thread(target=servidor.serve_forever, daemon=True)
+    thread.start()
+
+    try:
+        yield f"http://127.0.0.1:{servidor.server_address[1]}/"
+    finally:
+        servidor.shutdown()
+        servidor.server_close()
+
+def aguardar_proximo_segundo():
+    """
+    Os objetos publicados levam o timestamp em segundos no nome e são imutáveis:
+    duas publicações no mesmo segundo colidiriam (fora do tempo medido)
+    """
+    time.sleep(1 - time.time() % 1 + 0.01)
+
+def preparar_ambiente(diretorio_trabalho):
+    """
+    Caches e armazenamento apontando para o diretório de trabalho. Precisa
+    rodar antes de importar os módulos do pipeline (lidos na importação).
+    """
+
+    os.environ['CVM_DOWNLOAD_DIR'] = os.path.join(diretorio_trabalho, 'downloads')
+    os.environ['CVM_CACHE_DIR'] = os.path.join(diretorio_trabalho, 'cache_cvm')
+    os.environ['BALANCOS_CACHE_DIR'] = os.path.join(diretorio_trabalho, 'cache_balancos')
+    os.environ['BALANCOS_ARMAZENAMENTO'] = 'local'
+    os.environ['BALANCOS_DIR_LOCAL'] = os.path.join(diretorio_trabalho, 'armazenamento')
+
+def executar_benchmark(args, diretorio_trabalho):
+    """Gera os dados, roda o pipeline etapa por etapa e devolve o relatório"""
+
+    preparar_ambiente(diretorio_trabalho)
+
+    # Etapas internas do pipeline (leitura, transformação, downloads) no relatório
+    novo_coletor()
+
+    import zipfile
+    import pyarrow as pa
+    from scripts import update_from_cvm as pipeline
+    from scripts import data_loader
+    from scripts.download_cvm import baixar_com_cache
+    from scripts.ingestao_arrow import ler_csv_arrow, transformar_wide_para_long_arrow, \
+        filtrar_dados_novos_arrow, tabela_para_parquet
+    from scripts.gerador_cvm_sintetico import gerar_anos
+
+    medidor = MedidorEtapas(verboso=args.verbose)
+    ano_inicial, ano_final = args.anos
+    diretorio_cvm = os.path.join(diretorio_trabalho, 'cvm')
+
+    print(f"\n🏭 Gerando ITR sintético {ano_inicial}-{ano_final} ({args.empresas} empresas)...")
+    with medidor.etapa('geracao') as etapa:
+        gerados = gerar_anos(diretorio_cvm, ano_inicial, ano_final,
+                             empresas=args.empresas, contas=args.contas, semente=args.semente)
+        etapa['registros'] = sum(sum(c.values()) for _, c in gerados.values())
+        etapa['bytes'] = sum(os.path.getsize(caminho) for caminho, _ in gerados.values())
+
+    with servidor_local(diretorio_cvm) as url_base:
+        pipeline.BASE_URL_ITR = url_base
+        print(f"\n🚀 Pipeline ({args.engine}, leitura {args.leitura}, layout {args.layout})")
+
+        # Histórico: anos anteriores publicados de uma vez, como no --backfill
+        if ano_final > ano_inicial:
+            with medidor.etapa('backfill') as etapa:
+                resultados = {}
+                for ano in range(ano_inicial, ano_final):
+                    resultados[ano] = pipeline.baixar_e_processar_itr(
+                        ano, f'itr_cia_aberta_{ano}.zip', {},
+                        leitura=args.leitura, engine=args.engine, workers_demonstracoes=1
+                    )
+                dados = pipeline.consolidar_anos(resultados)
+                etapa['registros'] = sum(info['registros'] for info in dados.values())
+                if not pipeline.atualizar_supabase(dados, substituir=True, layout=args.layout):
+                    raise RuntimeError("Falha ao publicar o backfill")
+
+        # Atualização incremental do último ano, uma etapa por vez
+        arquivo = f'itr_cia_aberta_{ano_final}.zip'
+
+        with medidor.etapa('download') as etapa:
+            caminho_zip, _ = baixar_com_cache(url_base + arquivo, forcar=True)
+            if not caminho_zip:
+                raise RuntimeError(f"Falha ao baixar {arquivo}")
+            etapa['bytes'] = os.path.getsize(caminho_zip)
+
+        with medidor.etapa('leitura') as etapa:
+            brutos = {}
+            with zipfile.ZipFile(caminho_zip) as zip_file:
+                for tipo, arquivo_interno in pipeline.ARQUIVOS_RELEVANTES.items():
+                    nome = next(n for n in zip_file.namelist() if arquivo_interno in n and n.endswith('.csv'))
+                    etapa['bytes'] = (etapa['bytes'] or 0) + zip_file.getinfo(nome).file_size
+                    with zip_file.open(nome) as f:
+                        if args.engine == 'arrow':
+                            brutos[tipo] = ler_csv_arrow(f)
+                        else:
+                            brutos[tipo] = pipeline.ler_csv_cvm(f, args.leitura)
+            etapa['registros'] = sum(len(b) for b in brutos.values())
+
+        with medidor.etapa('transformacao') as etapa:
+            longos = {}
+            for tipo, bruto in brutos.items():
+                if args.engine == 'arrow':
+                    longos[tipo] = transformar_wide_para_long_arrow(bruto, tipo, pipeline.CNPJS_MONITORADOS)
+                else:
+                    longos[tipo] = pipeline.transformar_wide_para_long(bruto, tipo)
+            longos = {tipo: longo for tipo, longo in longos.items() if longo is not None}
+            etapa['registros'] = sum(len(longo) for longo in longos.values())
+        del brutos
+
+        snapshot = pipeline.abrir_snapshot()
+
+        with medidor.etapa('filtro') as etapa:
+            ultimos = snapshot.ultimos_trimestres() if snapshot.registro else {}
+            dados = {}
+            for tipo, longo in longos.items():
+                if args.engine == 'arrow':
+                    novos = filtrar_dados_novos_arrow(longo, ultimos)
+                    dados[tipo] = {'tabela': novos, 'registros': novos.num_rows}
+                else:
+                    novos = pipeline.filtrar_dados_novos(longo, ultimos)
+                    dados[tipo] = {'dataframe': novos, 'registros': len(novos)}
+                dados[tipo].update({'formato': 'long', 'somente_novos': True})
+            etapa['registros'] = sum(len(longo) for longo in longos.values())
+        del longos
+
+        aguardar_proximo_segundo()
+        with medidor.etapa('publicacao') as etapa:
+            etapa['registros'] = sum(info['registros'] for info in dados.values())
+            if not pipeline.atualizar_supabase(dados, snapshot=snapshot, layout=args.layout):
+                raise RuntimeError("Falha ao publicar a atualização")
+        del dados
+
+    aguardar_proximo_segundo()
+    with medidor.etapa('compactacao') as etapa:
+        if not pipeline.compactar_supabase(forcar=True):
+            raise RuntimeError("Falha na compactação")
+        etapa['registros'] = pipeline.abrir_snapshot().registro.get('registros_total')
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        tabela = pipeline.abrir_snapshot().tabela()
+
+    with medidor.etapa('escrita_parquet') as etapa:
+        conteudo = tabela_para_parquet(tabela)
+        etapa['registros'] = tabela.num_rows
+        etapa['bytes'] = len(conteudo)
+    del tabela, conteudo
+
+    # Primeira empresa aberta no dashboard: lê só as partições/row groups do ticker
+    with medidor.etapa('selecao_empresa_fria') as etapa:
+        ticker = data_loader.listar_todas_empresas()[0]
+        df_empresa, _ = data_loader.selecionar_empresa(ticker)
+        etapa['registros'] = len(df_empresa) if df_empresa is not None else 0
+    del df_empresa
+
+    with medidor.etapa('carga_dashboard') as etapa:
+        df = data_loader.carregar_dados_completos()
+        if df is None:
+            raise RuntimeError("Dashboard não conseguiu carregar o dataset")
+        etapa['registros'] = len(df)
+        etapa['bytes'] = int(df.memory_usage(deep=True).sum())
+
+    del df
+
+    with medidor.etapa('selecao_empresa') as etapa:
+        df_empresa, _ = data_loader.selecionar_empresa(ticker)
+        etapa['registros'] = len(df_empresa) if df_empresa is not None else 0
+
+    # Uma sessão por empresa, todas mantidas abertas: fatias sem cópia da tabela
+    # compartilhada, convertendo só as colunas da tabela de últimos dados
+    with medidor.etapa('sessoes_dashboard') as etapa:
+        sessoes = []
+        for ticker_sessao in data_loader.listar_todas_empresas():
+            fatia, _ = data_loader.selecionar_fatia_empresa(ticker_sessao)
+            if fatia is None:
+                continue
+            ano, trimestre = fatia.ultimo_periodo()
+            fatia.filtrar(ano=ano, trimestre=trimestre).para_pandas(['Conta', 'Valor'])
+            sessoes.append(fatia)
+        etapa['registros'] = sum(len(fatia) for fatia in sessoes)
+    del sessoes
+
+    return {
+        'gerado_em': datetime.now().isoformat(),
+        'parametros': {
+            'empresas': args.empresas,
+            'anos': args.anos,
+            'contas': args.contas,
+            'engine': args.engine,
+            'leitura': args.leitura,
+            'layout': args.layout,
+            'semente': args.semente,
+        },
+        'ambiente': {
+            'python': platform.python_version(),
+            'pyarrow': pa.__version__,
+            'cpus': os.cpu_count(),
+        },
+        'pico_memoria_processo_mb': round((memoria_pico_processo() or 0) / 1024 / 1024, 1),
+        'etapas': medidor.etapas,
+        # Detalhe das etapas internas do pipeline (por demonstração, partição, upload...)
+        'metricas_pipeline': obter_metricas().resumo()['etapas'],
+    }
+
+def imprimir_relatorio(relatorio):
+    """Tabela resumo das etapas"""
+
+    print("\n" + "="*86)
+    print(f"{'Etapa':<20}{'Tempo (s)':>11}{'Registros':>13}{'Reg/s':>13}{'MB/s':>9}{'Pico MB':>10}{'Δ MB':>9}")
+    print("="*86)
+
+    for etapa in relatorio['etapas']:
+        registros = f"{etapa['registros']:,}" if etapa['registros'] else '-'
+        por_segundo = f"{etapa['registros_por_segundo']:,}" if etapa.get('registros_por_segundo') else '-'
+        mb_s = f"{etapa['mb_por_segundo']:.1f}" if etapa.get('mb_por_segundo') else '-'
+        pico = f"{etapa['pico_memoria_mb']:.0f}" if etapa['pico_memoria_mb'] is not None else '-'
+        delta = f"{etapa['delta_memoria_mb']:.0f}" if etapa['delta_memoria_mb'] is not None else '-'
+        print(f"{etapa['etapa']:<20}{etapa['segundos']:>11.2f}{registros:>13}{por_segundo:>13}{mb_s:>9}{pico:>10}{delta:>9}")
+
+    print("="*86)
+    print(f"Pico de memória do processo: {relatorio['pico_memoria_processo_mb']:.0f} MB")
+
+def comparar_relatorios(atual, base, tolerancia):
+    """
+    Etapas que ficaram mais lentas (ou usaram mais memória) que a base além
+    da tolerância relativa. Retorna a lista de regressões encontradas.
+    """
+
+    regressoes = []
+    etapas_base = {e['etapa']: e for e in base.get('etapas', [])}
+
+    for etapa in atual['etapas']:
+        anterior = etapas_base.get(etapa['etapa'])
+        if not anterior:
+            continue
+
+        for metrica in ('segundos', 'delta_memoria_mb'):
+            valor, referencia = etapa.get(metrica), anterior.get(metrica)
+            if valor is None or not referencia or referencia <= 0:
+                continue
+            if max(valor, referencia) < PISO_COMPARACAO[metrica]:
+                continue
+            if valor > referencia * (1 + tolerancia):
+                regressoes.append(
+                    f"{etapa['etapa']}.{metrica}: {referencia} → {valor} (+{(valor / referencia - 1):.0%})"
+                )
+
+    return regressoes
+
+def parse_argumentos(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark ponta a ponta do pipeline com dados sintéticos")
+    parser.add_argument('--empresas', type=int, default=400,
+                        help="empresas no arquivo sintético (as primeiras são as monitoradas)")
+    parser.add_argument('--anos', nargs=2, type=int, default=[2022, 2024], metavar=('ANO_INICIAL', 'ANO_FINAL'),
+                        help="anos gerados; o último é a atualização incremental, os demais o backfill")
+    parser.add_argument('--contas', type=int, default=0,
+                        help="contas por demonstração (0 = só as contas fixas)")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--engine', choices=['pandas', 'arrow'], default='pandas')
+    parser.add_argument('--leitura', choices=['streaming', 'completa'], default='streaming')
+    parser.add_argument('--layout', choices=['particionado', 'monolitico'], default='particionado')
+    parser.add_argument('--diretorio', default=None,
+                        help="diretório de trabalho (padrão: temporário, apagado no fim)")
+    parser.add_argument('--saida', default=None, help="grava o relatório em JSON neste arquivo")
+    parser.add_argument('--comparar', default=None, help="relatório JSON de referência")
+    parser.add_argument('--tolerancia', type=float, default=0.2,
+                        help="piora relativa aceita na comparação (0.2 = 20%%)")
+    parser.add_argument('--verbose', action='store_true', help="mostra a saída do pipeline")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_argumentos(argv)
+
+    diretorio_trabalho = args.diretorio or tempfile.mkdtemp(prefix='benchmark_cvm_')
+    os.makedirs(diretorio_trabalho, exist_ok=True)
+
+    try:
+        relatorio = executar_benchmark(args, diretorio_trabalho)
+    except Exception as e:
+        print(f"❌ Benchmark falhou: {e}")
+        import traceback
+        traceback.print_exc()
+        return 1
+    finally:
+        if not args.diretorio:
+            shutil.rmtree(diretorio_trabalho, ignore_errors=True)
+
+    imprimir_relatorio(relatorio)
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2, ensure_ascii=False)
+        print(f"💾 Relatório salvo em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            base = json.load(f)
+
+        if base.get('parametros') != relatorio['parametros']:
+            print(f"⚠️  Parâmetros diferentes da base: {base.get('parametros')}")
+
+        regressoes = comparar_relatorios(relatorio, base, args.tolerancia)
+        if regressoes:
+            print(f"\n❌ {len(regressoes)} regressão(ões) acima de {args.tolerancia:.0%}:")
+            for regressao in regressoes:
+                print(f"   • {regressao}")
+            return 1
+
+        print(f"\n✅ Sem regressões acima de {args.tolerancia:.0%} em relação a {args.comparar}")
+
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,190 @@
+"""
+Catálogo do dataset publicado
+JSON pequeno gerado na ingestão com o que o dashboard precisa antes de ler
+qualquer linha financeira: tickers, razão social, trimestres disponíveis,
+contas do último trimestre e data da atualização. Fica referenciado pela
+linha de controle (catalogo_path) e é lido em uma única requisição.
+"""
+
+import json
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+
+from scripts.dataset_balancos import VERSAO_SCHEMA
+from scripts.registro_empresas import obter_registro
+
+PREFIXO_CATALOGOS = 'dados/catalogos'
+
+
+def caminho_catalogo(timestamp):
+    return f"{PREFIXO_CATALOGOS}/catalogo_{timestamp}.json"
+
+def _colunas_resumo(dados):
+    """Tabela Arrow ou DataFrame → DataFrame só com ticker, período e identificação da conta"""
+
+    nomes = dados.column_names if isinstance(dados, pa.Table) else list(dados.columns)
+    colunas = ['Ticker', 'Ano', 'Trimestre'] + [c for c in ['Tipo', 'Chave_Conta', 'Conta'] if c in nomes]
+
+    if isinstance(dados, pa.Table):
+        # Chave_Conta com nulos como Int64, sem passar por float
+        return dados.select(colunas).to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+    return dados[colunas]
+
+def resumir_empresas(dados):
+    """
+    Por ticker: trimestres presentes ([ano, trimestre]) e quantidade de contas
+    distintas no trimestre mais recente. Aceita tabela Arrow ou DataFrame.
+    """
+
+    df = _colunas_resumo(dados)
+    colunas_conta = list(df.columns[3:])
+
+    if df.empty:
+        return {}
+
+    df = df.assign(
+        Ticker=df['Ticker'].astype(str),
+        _periodo=df['Ano'].astype('int32') * 10 + df['Trimestre'].astype('int32')
+    )
+
+    periodos = df[['Ticker', '_periodo']].drop_duplicates().sort_values(['Ticker', '_periodo'])
+    periodos_por_ticker = periodos.groupby('Ticker')['_periodo'].agg(list)
+
+    # Contas distintas no último trimestre de cada empresa
+    recentes = df[df['_periodo'] == df.groupby('Ticker')['_periodo'].transform('max')]
+    contas = recentes.drop_duplicates(['Ticker'] + colunas_conta).groupby('Ticker').size()
+
+    return {
+        ticker: {
+            'periodos': [[int(p) // 10, int(p) % 10] for p in lista],
+            'contas': int(contas.get(ticker, 0)),
+        }
+        for ticker, lista in periodos_por_ticker.items()
+    }
+
+def mesclar_empresas(anteriores, novas):
+    """
+    Junta o resumo da versão anterior com o dos dados novos: trimestres somados;
+    contas do último trimestre mais recente (no empate, o dado novo, que reapresenta)
+    """
+
+    empresas = {ticker: dict(info) for ticker, info in anteriores.items()}
+
+    for ticker, info in novas.items():
+        atual = empresas.get(ticker)
+
+        if atual is None:
+            empresas[ticker] = dict(info)
+            continue
+
+        periodos = sorted({tuple(p) for p in atual['periodos']} | {tuple(p) for p in info['periodos']})
+        mais_recente_novo = tuple(info['periodos'][-1]) >= tuple(atual['periodos'][-1])
+
+        empresas[ticker] = {
+            'periodos': [list(p) for p in periodos],
+            'contas': info['contas'] if mais_recente_novo else atual['contas'],
+        }
+
+    return empresas
+
+def recontar_ultimo_trimestre(novas, anteriores, dados, ler_publicados):
+    """
+    Empresas cujo lote reapresenta o último trimestre já publicado: as contas
+    vêm do lote somado às linhas publicadas desse trimestre (a partição
+    mesclada), não só do lote. ler_publicados(anos) devolve as linhas
+    publicadas desses anos (tabela Arrow ou DataFrame).
+    """
+
+    empates = {
+        ticker: tuple(info['periodos'][-1]) for ticker, info in novas.items()
+        if ticker in anteriores and tuple(info['periodos'][-1]) == tuple(anteriores[ticker]['periodos'][-1])
+    }
+
+    if not empates:
+        return novas
+
+    publicados = ler_publicados(sorted({ano for ano, _ in empates.values()}))
+    if publicados is None:
+        return novas
+
+    alvo = pd.DataFrame(
+        [(ticker, ano, trimestre) for ticker, (ano, trimestre) in empates.items()],
+        columns=['Ticker', 'Ano', 'Trimestre']
+    )
+
+    partes = []
+    for df in (_colunas_resumo(dados), _colunas_resumo(publicados)):
+        df = df[df['Ticker'].isin(list(empates))]
+        # Mesmos tipos nos dois lados (categorias diferentes, int16/int64) antes de juntar
+        tipos = {c: 'Int64' if c == 'Chave_Conta' else str for c in df.columns}
+        df = df.astype(dict(tipos, Ano='int64', Trimestre='int64'))
+        partes.append(df.merge(alvo, on=['Ticker', 'Ano', 'Trimestre']))
+
+    colunas = [c for c in partes[0].columns if c in partes[1].columns]
+    mescladas = resumir_empresas(pd.concat([p[colunas] for p in partes], ignore_index=True))
+
+    novas = {ticker: dict(info) for ticker, info in novas.items()}
+    for ticker, info in mescladas.items():
+        novas[ticker]['contas'] = info['contas']
+
+    return novas
+
+def gerar_catalogo(dados, anterior=None, arquivo_path=None, registros_total=None, ler_publicados=None):
+    """
+    Catálogo da nova versão: resumo dos dados (mesclado ao catálogo anterior, se
+    houver). Com ler_publicados, as contas do último trimestre reapresentado
+    contam também as linhas já publicadas (ver recontar_ultimo_trimestre).
+    """
+
+    empresas = resumir_empresas(dados)
+
+    if anterior:
+        anteriores = anterior.get('empresas', {})
+        if ler_publicados is not None:
+            empresas = recontar_ultimo_trimestre(empresas, anteriores, dados, ler_publicados)
+        empresas = mesclar_empresas(anteriores, empresas)
+
+    registro = obter_registro()
+
+    for ticker, info in empresas.items():
+        info.update(
+            nome=registro.nome(ticker) or ticker,
+            trimestres=len(info['periodos']),
+            primeiro_ano=info['periodos'][0][0],
+            ultimo_ano=info['periodos'][-1][0],
+            ultimo_trimestre=info['periodos'][-1][1],
+        )
+
+    return {
+        'versao_schema': VERSAO_SCHEMA,
+        'gerado_em': datetime.now().isoformat(),
+        'arquivo_path': arquivo_path,
+        'registros_total': registros_total,
+        'empresas': {ticker: empresas[ticker] for ticker in sorted(empresas)},
+    }
+
+def publicar_catalogo(armazenamento, catalogo, timestamp):
+    """Envia o catálogo ao bucket e devolve o caminho"""
+
+    caminho = caminho_catalogo(timestamp)
+    conteudo = json.dumps(catalogo, ensure_ascii=False).encode('utf-8')
+    armazenamento.enviar(caminho, conteudo, 'application/json')
+
+    print(f"   🗂️  Catálogo publicado: {caminho} ({len(catalogo['empresas'])} empresas, {len(conteudo) / 1024:.0f} KB)")
+
+    return caminho
+
+def carregar_catalogo(armazenamento, registro):
+    """Catálogo referenciado pela linha de controle; None se a versão não tiver catálogo"""
+
+    caminho = (registro or {}).get('catalogo_path')
+
+    if not caminho:
+        return None
+
+    try:
+        return json.loads(armazenamento.baixar(caminho))
+    except Exception:
+        return None
@@ -1,76 +1,466 @@
 """
-Módulo para carregar e processar dados do Supabase
+Módulo para carregar e processar dados do armazenamento (Supabase ou local)
 Versão simplificada e estável
 """
 
-import pandas as pd
-from io import BytesIO
-from config.supabase_config import supabase
+import os
+import time
+import threading
+from concurrent.futures import Future
 
-def carregar_dados_completos():
-    """Carrega todos os dados do Supabase sem normalização"""
-    try:
-        resultado = supabase.table('balancos_trimestrais') \
-            .select('arquivo_path') \
-            .eq('status', 'ativo') \
-            .order('data_upload', desc=True) \
-            .limit(1) \
-            .execute()
-        
-        if not resultado.data:
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+from scripts.armazenamento import obter_armazenamento
+from scripts.dataset_balancos import SnapshotDataset
+from scripts.registro_empresas import obter_registro
+from scripts.catalogo_balancos import carregar_catalogo
+from scripts.hierarquia_contas import mascara_descendentes
+from scripts.schema_balancos import (
+    aplicar_schema_arrow,
+    aplicar_schema_pandas,
+    colunas_texto,
+    remover_categorias_sem_uso,
+    tabela_para_pandas,
+    PERIODO_TRIMESTRE,
+    PERIODO_SALDO,
+    PERIODO_ACUMULADO,
+)
+
+# Um valor por trimestre no dashboard: trimestre isolado, depois saldo, depois acumulado no ano
+PRIORIDADE_PERIODO = {PERIODO_TRIMESTRE: 0, PERIODO_SALDO: 1, PERIODO_ACUMULADO: 2}
+
+# Chave de "uma linha por conta e trimestre" (sem Periodo, que define a preferida)
+CHAVES_TRIMESTRE = ['Ticker', 'Tipo', 'Chave_Conta', 'Conta', 'Ano', 'Trimestre']
+
+# Segundos entre consultas à linha de controle para saber se há versão nova
+INTERVALO_VERIFICACAO = float(os.environ.get('BALANCOS_INTERVALO_VERIFICACAO', '60'))
+
+# Versão ativa e dados já decodificados, um cache por processo (compartilhado
+# entre as sessões do Streamlit), identificado pelo arquivo_path da versão
+# ativa. Cada item (catálogo, manifesto, tabela completa, tabela de um ticker)
+# é um Future em 'carregamentos': a primeira sessão que pede lê, as demais
+# esperam o mesmo resultado. A trava protege só o dicionário, nunca uma leitura
+_cache_dados = {
+    'arquivo_path': None, 'snapshot': None, 'carregamentos': {}, 'verificado_em': None
+}
+_trava_cache = threading.Lock()
+
+class FatiaEmpresa:
+    """
+    Linhas de uma empresa como fatia sem cópia da tabela compartilhada. Filtros
+    só acumulam uma máscara; dados viram pandas em para_pandas, apenas nas
+    colunas pedidas, em um DataFrame novo que a sessão pode alterar à vontade.
+    """
+    
+    def __init__(self, tabela, mascara=None):
+        self.tabela = tabela
+        self.mascara = mascara
+    
+    def __len__(self):
+        if self.mascara is None:
+            return self.tabela.num_rows
+        return int(pc.sum(self.mascara).as_py() or 0)
+    
+    @property
+    def empty(self):
+        return len(self) == 0
+    
+    @property
+    def colunas(self):
+        return [c for c in self.tabela.column_names if c != '_preferida']
+    
+    def coluna(self, nome):
+        """Uma coluna (Arrow) das linhas visíveis"""
+        coluna = self.tabela[nome]
+        return coluna if self.mascara is None else coluna.filter(self.mascara)
+    
+    def distintos(self, nome):
+        """Valores distintos de uma coluna, ordenados"""
+        return sorted(v for v in pc.unique(self.coluna(nome)).to_pylist() if v is not None)
+    
+    def filtrar(self, ano=None, trimestre=None, conta=None, busca=None, tipo=None, conta_pai=None):
+        """
+        Nova fatia com a máscara combinada (nenhum dado é copiado). conta_pai
+        (código CVM, ex.: '1.01') mantém a conta e toda a sua subárvore
+        """
+        
+        condicoes = [] if self.mascara is None else [self.mascara]
+        
+        if tipo is not None:
+            condicoes.append(pc.is_in(self.tabela['Tipo'], value_set=pa.array([tipo])))
+        if conta_pai is not None:
+            condicoes.append(mascara_descendentes(self.tabela['Chave_Conta'], conta_pai))
+        if ano is not None:
+            condicoes.append(pc.equal(self.tabela['Ano'], ano))
+        if trimestre is not None:
+            condicoes.append(pc.equal(self.tabela['Trimestre'], trimestre))
+        if conta is not None:
+            condicoes.append(pc.is_in(self.tabela['Conta'], value_set=pa.array([conta])))
+        if busca:
+            contas = pc.cast(self.tabela['Conta'], pa.string())
+            condicoes.append(pc.fill_null(pc.match_substring(contas, busca, ignore_case=True), False))
+        
+        mascara = None
+        for condicao in condicoes:
+            mascara = condicao if mascara is None else pc.and_(mascara, condicao)
+        
+        return FatiaEmpresa(self.tabela, mascara)
+    
+    def ultimo_periodo(self):
+        """(ano, trimestre) mais recente da fatia"""
+        ultimo_ano = pc.max(self.coluna('Ano')).as_py()
+        ultimo_trimestre = pc.max(self.filtrar(ano=ultimo_ano).coluna('Trimestre')).as_py()
+        return ultimo_ano, ultimo_trimestre
+    
+    def resumo(self):
+        """Trimestres, primeiro/último ano e contas distintas (mesmas métricas do catálogo)"""
+        anos = self.coluna('Ano')
+        periodos = pc.add(pc.multiply(pc.cast(anos, pa.int32()), 10), pc.cast(self.coluna('Trimestre'), pa.int32()))
+        return {
+            'trimestres': len(pc.unique(periodos)),
+            'primeiro_ano': pc.min(anos).as_py(),
+            'ultimo_ano': pc.max(anos).as_py(),
+            'contas': len(self.distintos('Conta')),
+        }
+    
+    def para_pandas(self, colunas=None):
+        """DataFrame só das colunas pedidas (todas, sem as auxiliares, se None)"""
+        
+        tabela = self.tabela.select(colunas or self.colunas)
+        if self.mascara is not None:
+            tabela = tabela.filter(self.mascara)
+        
+        return remover_categorias_sem_uso(tabela_para_pandas(tabela))
+
+
+class TabelaEmpresas:
+    """
+    Dataset como uma tabela Arrow imutável, ordenada por ticker, com índice
+    ticker → [início, fim). Compartilhada entre as sessões: cada empresa é
+    entregue como fatia sem cópia. A coluna _preferida marca a linha usada no
+    dashboard em cada conta/trimestre (trimestre isolado, saldo, acumulado).
+    """
+    
+    def __init__(self, tabela):
+        tabela = aplicar_schema_arrow(tabela)
+        
+        chaves = [c for c in CHAVES_TRIMESTRE if c in tabela.column_names]
+        
+        # Ordenação pelos textos/valores (sort_indices não aceita dicionário);
+        # chave de conta nula ordena junto, antes das demais
+        ordenacao = colunas_texto(tabela.select(chaves))
+        if 'Chave_Conta' in chaves:
+            ordenacao = ordenacao.set_column(
+                chaves.index('Chave_Conta'), 'Chave_Conta', pc.fill_null(ordenacao['Chave_Conta'], -1)
+            )
+        
+        if 'Periodo' in tabela.column_names:
+            prioridade = pc.index_in(pc.cast(tabela['Periodo'], pa.string()), value_set=pa.array(list(PRIORIDADE_PERIODO)))
+            prioridade = pc.fill_null(prioridade, len(PRIORIDADE_PERIODO))
+        else:
+            prioridade = pa.array(np.zeros(tabela.num_rows, dtype='int32'))
+        ordenacao = ordenacao.append_column('_prioridade', prioridade)
+        
+        indices = pc.sort_indices(
+            ordenacao, sort_keys=[(c, 'ascending') for c in chaves] + [('_prioridade', 'ascending')]
+        )
+        ordenacao = ordenacao.take(indices)
+        
+        # Preferida: primeira linha de cada conta/trimestre (menor prioridade de período)
+        total = tabela.num_rows
+        preferida = np.ones(total, dtype=bool)
+        if total > 1:
+            mudou = np.zeros(total - 1, dtype=bool)
+            for c in chaves:
+                coluna = ordenacao[c].combine_chunks()
+                mudou |= pc.not_equal(coluna.slice(1), coluna.slice(0, total - 1)).to_numpy(zero_copy_only=False)
+            preferida[1:] = mudou
+        
+        # Uma só sequência de buffers: as fatias apontam para ela sem copiar
+        self.tabela = tabela.take(indices).append_column('_preferida', pa.array(preferida)).combine_chunks()
+        
+        # Índice ticker → [início, fim)
+        tickers = ordenacao['Ticker'].combine_chunks()
+        inicios = [0]
+        if total > 1:
+            inicios += (np.flatnonzero(
+                pc.not_equal(tickers.slice(1), tickers.slice(0, total - 1)).to_numpy(zero_copy_only=False)
+            ) + 1).tolist()
+        fins = inicios[1:] + [total]
+        
+        self.indice = {tickers[inicio].as_py(): (inicio, fim) for inicio, fim in zip(inicios, fins)} if total else {}
+    
+    def tickers(self):
+        return sorted(self.indice)
+    
+    def fatia(self, ticker, todos_periodos=False):
+        """
+        Linhas do ticker sem cópia (None se o ticker não estiver na tabela):
+        uma por conta e trimestre, ou todas as linhas de Periodo com todos_periodos
+        """
+        
+        if ticker not in self.indice:
             return None
         
-        arquivo_path = resultado.data[0]['arquivo_path']
-        response = supabase.storage.from_('balancos').download(arquivo_path)
-        df = pd.read_parquet(BytesIO(response))
+        inicio, fim = self.indice[ticker]
+        fatia = self.tabela.slice(inicio, fim - inicio)
+        
+        return FatiaEmpresa(fatia, None if todos_periodos else fatia['_preferida'])
+    
+    def para_pandas(self):
+        """Dataset completo como DataFrame novo (sem as colunas auxiliares)"""
+        return tabela_para_pandas(self.tabela.drop_columns(['_preferida']))
+
+
+def _ler_dataset(snapshot, anos=None, tipos=None):
+    df = snapshot.dataframe(anos=anos, tipos=tipos)
+    return aplicar_schema_pandas(df) if df is not None else None
+
+def _snapshot_ativo():
+    """
+    Snapshot da versão ativa. Dentro do intervalo de verificação não há nenhuma
+    consulta; depois dele, só a linha de controle é consultada (fora da trava,
+    enquanto as outras sessões seguem com a versão carregada), e os dados em
+    cache são descartados só se o arquivo_path mudou.
+    """
+    
+    with _trava_cache:
+        atual = _cache_dados['snapshot']
+        verificado_em = _cache_dados['verificado_em']
+        agora = time.monotonic()
         
-        return df
+        if atual is not None and verificado_em is not None and agora - verificado_em < INTERVALO_VERIFICACAO:
+            return atual
         
+        # Uma sessão consulta; as outras usam a versão carregada até a resposta
+        if atual is not None:
+            _cache_dados['verificado_em'] = agora
+    
+    snapshot = SnapshotDataset(obter_armazenamento())
+    
+    try:
+        arquivo_path = snapshot.arquivo_path
     except Exception as e:
-        print(f"Erro ao carregar dados: {e}")
+        # Falha na consulta: segue com a versão em memória, se houver
+        if atual is None:
+            raise
+        print(f"⚠️  Não foi possível verificar a versão ativa, usando a carregada: {e}")
+        return atual
+    
+    with _trava_cache:
+        if arquivo_path != _cache_dados['arquivo_path'] or _cache_dados['snapshot'] is None:
+            print(f"🔄 Versão ativa do dataset: {arquivo_path}")
+            _cache_dados.update(arquivo_path=arquivo_path, snapshot=snapshot, carregamentos={})
+        
+        _cache_dados['verificado_em'] = time.monotonic()
+        return _cache_dados['snapshot']
+
+def _carregar_uma_vez(chave, carregar):
+    """
+    Resultado de carregar(snapshot) para a versão ativa, lido uma vez por
+    chave e versão. Sessões que pedem a mesma chave durante a leitura esperam
+    o mesmo Future; chaves diferentes são lidas em paralelo. Em caso de erro
+    a chave é liberada para a próxima tentativa.
+    """
+    
+    _snapshot_ativo()
+    
+    with _trava_cache:
+        snapshot = _cache_dados['snapshot']
+        carregamentos = _cache_dados['carregamentos']
+        futuro = carregamentos.get(chave)
+        dono = futuro is None
+        if dono:
+            futuro = carregamentos[chave] = Future()
+    
+    if dono:
+        try:
+            futuro.set_result(carregar(snapshot))
+        except BaseException as e:
+            with _trava_cache:
+                if carregamentos.get(chave) is futuro:
+                    del carregamentos[chave]
+            futuro.set_exception(e)
+    
+    return futuro.result()
+
+def _carregado(chave):
+    """Resultado já disponível de uma chave (sem esperar nem ler); None se não houver"""
+    with _trava_cache:
+        futuro = _cache_dados['carregamentos'].get(chave)
+    
+    if futuro is None or not futuro.done() or futuro.exception() is not None:
         return None
+    
+    return futuro.result()
 
-def selecionar_empresa(ticker):
-    """Seleciona dados de uma empresa específica"""
+def _ler_tabela_completa(snapshot):
+    if not snapshot.registro:
+        return None
+    
+    print("📦 Carregando dataset completo em memória (tabela compartilhada)...")
+    tabela = TabelaEmpresas(snapshot.tabela())
+    snapshot.descartar_decodificados()
+    
+    # Empresas lidas uma a uma ficam redundantes com a tabela completa
+    with _trava_cache:
+        carregamentos = _cache_dados['carregamentos']
+        for chave in [c for c in carregamentos if isinstance(c, tuple) and c[0] == 'empresa']:
+            if carregamentos[chave].done():
+                del carregamentos[chave]
+    
+    return tabela
+
+def _tabela_em_cache():
+    """Tabela compartilhada do dataset completo (lida de novo só quando há versão nova)"""
+    return _carregar_uma_vez('tabela', _ler_tabela_completa)
+
+def carregar_catalogo_ativo():
+    """
+    Catálogo da versão ativa (tickers, nomes, trimestres, contas, data da
+    atualização), lido uma vez por versão; None se a versão não tiver catálogo
+    """
     try:
-        df_completo = carregar_dados_completos()
+        # {} marca "versão sem catálogo" para não consultar de novo
+        catalogo = _carregar_uma_vez(
+            'catalogo',
+            lambda snapshot: (carregar_catalogo(snapshot.armazenamento, snapshot.registro) or {}) if snapshot.registro else {}
+        )
+        return catalogo or None
         
-        if df_completo is None or df_completo.empty:
-            return None, None
-        
-        df_empresa = df_completo[df_completo['Ticker'] == ticker].copy()
+    except Exception as e:
+        print(f"Erro ao carregar catálogo: {e}")
+        return None
+
+def informacoes_empresa(ticker):
+    """Resumo de uma empresa no catálogo (nome, trimestres, primeiro/último ano, contas); None sem catálogo"""
+    catalogo = carregar_catalogo_ativo()
+    return catalogo['empresas'].get(ticker) if catalogo else None
+
+def _ler_tabela_ticker(snapshot, ticker):
+    if not snapshot.registro:
+        return None
+    
+    tabela = snapshot.tabela_ticker(ticker)
+    return TabelaEmpresas(tabela) if tabela is not None else None
+
+def carregar_fatia_empresa(ticker):
+    """
+    Linhas de uma empresa como FatiaEmpresa (sem cópia). Com a tabela completa
+    já em memória, fatia dela; senão lê só as partições/row groups do ticker
+    (custo proporcional ao histórico da empresa) e guarda a tabela no cache.
+    """
+    
+    _snapshot_ativo()
+    
+    tabela = _carregado('tabela')
+    if tabela is not None:
+        return tabela.fatia(ticker)
+    
+    tabela_empresa = _carregar_uma_vez(('empresa', ticker), lambda snapshot: _ler_tabela_ticker(snapshot, ticker))
+    return tabela_empresa.fatia(ticker) if tabela_empresa is not None else None
+
+def invalidar_cache_dados():
+    """Força a próxima carga a consultar a versão ativa (ex.: logo após publicar)"""
+    with _trava_cache:
+        _cache_dados['verificado_em'] = None
+
+def carregar_dados_completos(anos=None, tipos=None):
+    """
+    Carrega os dados do Supabase sem normalização, no schema compacto
+    (Ticker/Conta/Tipo como categoria, Ano int16, Trimestre int8).
+    Sem filtros, converte a tabela compartilhada do processo (DataFrame novo,
+    que não fica em cache). No layout particionado, anos/tipos limitam quais
+    partições são baixadas.
+    """
+    try:
+        if anos is None and tipos is None:
+            tabela = _tabela_em_cache()
+            return tabela.para_pandas() if tabela is not None else None
         
-        if df_empresa.empty:
-            return None, None
+        return _ler_dataset(SnapshotDataset(obter_armazenamento()), anos=anos, tipos=tipos)
         
-        # Buscar nome da empresa
+    except Exception as e:
+        print(f"Erro ao carregar dados: {e}")
+        return None
+
+def _nome_empresa(ticker):
+    """Nome pelo registro local (sem consulta a empresas_ativas); ticker fora do registro ainda consulta o armazenamento"""
+    nome = obter_registro().nome(ticker)
+    if nome is None:
         try:
-            resultado_empresa = supabase.table('empresas_ativas') \
-                .select('razao_social') \
-                .eq('ticker', ticker) \
-                .limit(1) \
-                .execute()
-            
-            nome = resultado_empresa.data[0]['razao_social'] if resultado_empresa.data else ticker
+            nome = obter_armazenamento().nome_empresa(ticker) or ticker
         except:
             nome = ticker
+    return nome
+
+def selecionar_fatia_empresa(ticker):
+    """
+    Fatia (sem cópia) de uma empresa, já com um valor por trimestre, e o nome.
+    Widgets pedem só as colunas/linhas que exibem com fatia.filtrar(...).para_pandas([...])
+    """
+    try:
+        fatia = carregar_fatia_empresa(ticker)
         
-        return df_empresa, nome
+        if fatia is None or fatia.empty:
+            return None, None
+        
+        return fatia, _nome_empresa(ticker)
         
     except Exception as e:
         print(f"Erro ao selecionar empresa: {e}")
         return None, None
 
+def selecionar_empresa(ticker):
+    """Seleciona dados de uma empresa específica (DataFrame com todas as colunas)"""
+    fatia, nome = selecionar_fatia_empresa(ticker)
+    
+    if fatia is None:
+        return None, None
+    
+    return fatia.para_pandas(), nome
+
 def listar_todas_empresas():
-    """Retorna lista de tickers disponíveis"""
+    """Retorna lista de tickers disponíveis (do catálogo ou do manifesto, sem ler o dataset, quando existem)"""
     try:
-        df = carregar_dados_completos()
+        catalogo = carregar_catalogo_ativo()
+        if catalogo:
+            return list(catalogo['empresas'])
+        
+        manifesto = _carregar_uma_vez('manifesto', lambda snapshot: snapshot.manifesto if snapshot.registro else None)
+        
+        if manifesto and manifesto.get('tickers'):
+            return sorted(manifesto['tickers'])
         
-        if df is None or df.empty:
-            return []
+        tabela = _tabela_em_cache()
         
-        return sorted(df['Ticker'].unique().tolist())
+        return tabela.tickers() if tabela is not None else []
         
     except Exception as e:
         print(f"Erro ao listar empresas: {e}")
         return []
+
+def testar_conexao():
+    """Confere se o armazenamento responde e se há uma versão ativa do dataset"""
+    try:
+        armazenamento = obter_armazenamento()
+        registro = armazenamento.registro_ativo()
+        
+        if not registro:
+            print(f"⚠️  Armazenamento '{armazenamento.nome}' sem versão ativa do dataset")
+            return False
+        
+        print(f"✅ Armazenamento '{armazenamento.nome}' conectado")
+        print(f"   • Versão ativa: {registro['arquivo_path']}")
+        print(f"   • Registros: {registro.get('registros_total') or 0:,}")
+        
+        snapshot = SnapshotDataset(armazenamento)
+        ultimos = snapshot.ultimos_trimestres()
+        print(f"   • Empresas: {len(ultimos)}")
+        
+        return True
+        
+    except Exception as e:
+        print(f"❌ Erro ao conectar: {e}")
+        return False
@@ -0,0 +1,840 @@
+"""
+Dataset de balanços publicado no armazenamento (Supabase ou local)
+Manifesto com marcas d'água por ticker, leitura de metadados do Parquet remoto
+sem baixar o arquivo inteiro, snapshot local da versão ativa e layout
+particionado por Ano/Tipo
+"""
+
+import io
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import threading
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.armazenamento import ArquivoRemoto
+from scripts.ingestao_arrow import deduplicar_arrow, mesclar_tabelas_arrow, tabela_para_parquet
+from scripts.schema_balancos import aplicar_schema_arrow, aplicar_schema_pandas, tabela_para_pandas
+from scripts.metricas_pipeline import medir_etapa
+
+# Versão do schema do dataset (incrementar quando colunas mudarem)
+VERSAO_SCHEMA = 3
+
+# Cópias locais dos Parquets publicados, uma subpasta por versão ativa
+# (arquivo_path da linha de controle). Dashboard e atualizador compartilham a pasta
+DIRETORIO_SNAPSHOTS = os.environ.get(
+    'BALANCOS_CACHE_DIR',
+    os.path.join(tempfile.gettempdir(), 'balancos_cache')
+)
+
+# Versões mantidas no cache: a ativa e as anteriores mais recentes (um processo
+# que ainda não viu a troca de versão continua lendo a sua)
+VERSOES_EM_CACHE = int(os.environ.get('BALANCOS_VERSOES_CACHE', '3'))
+
+# Downloads simultâneos de partições
+DOWNLOADS_PARALELOS = 8
+
+# Layout particionado: um Parquet por (Ano, Tipo) e um manifesto listando as partições vivas
+LAYOUT_PARTICIONADO = 'particionado'
+LAYOUT_MONOLITICO = 'monolitico'
+PREFIXO_PARTICOES = 'dados/particoes'
+PREFIXO_MANIFESTOS = 'dados/manifestos'
+PREFIXO_DELTAS = 'dados/deltas'
+
+# Limites de segmentos delta pendentes antes de compactar na base particionada
+MAX_DELTAS_PENDENTES = 8
+MAX_BYTES_DELTAS = 64 * 1024 * 1024
+
+# Chave de um registro do dataset (merge mantém o mais recente por chave)
+CHAVES_REGISTRO = ['Ticker', 'Chave_Conta', 'Conta', 'Ano', 'Trimestre', 'Tipo', 'Periodo']
+
+
+def caminho_manifesto(arquivo_path):
+    """Caminho do manifesto publicado ao lado de um Parquet"""
+    if arquivo_path.endswith('.parquet'):
+        return arquivo_path[:-len('.parquet')] + '.manifest.json'
+    return arquivo_path + '.manifest.json'
+
+def calcular_marcas_dagua(dados):
+    """
+    Último (Ano, Trimestre) e número de registros por ticker.
+    Aceita DataFrame pandas ou tabela Arrow; retorna DataFrame indexado por Ticker.
+    """
+
+    if isinstance(dados, pa.Table):
+        dados = dados.select(['Ticker', 'Ano', 'Trimestre']).to_pandas()
+
+    periodo = dados['Ano'].astype('int64') * 4 + dados['Trimestre'].astype('int64')
+
+    marcas = (
+        pd.DataFrame({'Ticker': dados['Ticker'].astype(str), 'periodo': periodo})
+        .groupby('Ticker')['periodo']
+        .agg(['max', 'size'])
+    )
+
+    # Trimestre vai de 1 a 4: Ano*4+Trimestre volta para (Ano, Trimestre) com (p-1)//4 e (p-1)%4+1
+    marcas['ultimo_ano'] = (marcas['max'] - 1) // 4
+    marcas['ultimo_trimestre'] = (marcas['max'] - 1) % 4 + 1
+    marcas = marcas.rename(columns={'size': 'registros'})
+
+    return marcas[['ultimo_ano', 'ultimo_trimestre', 'registros']]
+
+def gerar_manifesto(dados, arquivo_path, conteudo_parquet):
+    """Monta o manifesto (alguns KB) que descreve um Parquet publicado"""
+
+    marcas = calcular_marcas_dagua(dados)
+
+    return {
+        'versao_schema': VERSAO_SCHEMA,
+        'arquivo_path': arquivo_path,
+        'registros_total': len(dados),
+        'tamanho_bytes': len(conteudo_parquet),
+        'sha256': hashlib.sha256(conteudo_parquet).hexdigest(),
+        'colunas': list(dados.column_names if isinstance(dados, pa.Table) else dados.columns),
+        'gerado_em': datetime.now().isoformat(),
+        'tickers': {
+            ticker: {
+                'ultimo_ano': int(linha.ultimo_ano),
+                'ultimo_trimestre': int(linha.ultimo_trimestre),
+                'registros': int(linha.registros),
+            }
+            for ticker, linha in marcas.iterrows()
+        },
+    }
+
+def ultimos_trimestres_do_manifesto(manifesto):
+    """Converte o manifesto no formato usado por filtrar_dados_novos"""
+    return {
+        ticker: {'ultimo_ano': info['ultimo_ano'], 'ultimo_trimestre': info['ultimo_trimestre']}
+        for ticker, info in manifesto.get('tickers', {}).items()
+    }
+
+def ultimos_trimestres_do_parquet(arquivo_parquet):
+    """
+    Marcas d'água a partir do rodapé do Parquet.
+    Grupos de linhas com um único Ticker e um único Ano são resolvidos só pelas
+    estatísticas min/max; os demais leem apenas as colunas Ticker/Ano/Trimestre.
+    """
+
+    pf = arquivo_parquet if isinstance(arquivo_parquet, pq.ParquetFile) else pq.ParquetFile(arquivo_parquet)
+    nomes = pf.schema_arrow.names
+    indice = {nome: nomes.index(nome) for nome in ('Ticker', 'Ano', 'Trimestre')}
+
+    por_estatistica = []
+    grupos_a_ler = []
+
+    for i in range(pf.metadata.num_row_groups):
+        grupo = pf.metadata.row_group(i)
+        stats = {nome: grupo.column(j).statistics for nome, j in indice.items()}
+
+        resolvido = all(st is not None and st.has_min_max for st in stats.values()) \
+            and stats['Ticker'].min == stats['Ticker'].max \
+            and stats['Ano'].min == stats['Ano'].max
+
+        if resolvido:
+            por_estatistica.append({
+                'Ticker': stats['Ticker'].min,
+                'Ano': stats['Ano'].max,
+                'Trimestre': stats['Trimestre'].max,
+                'registros': grupo.num_rows,
+            })
+        else:
+            grupos_a_ler.append(i)
+
+    partes = []
+
+    if grupos_a_ler:
+        colunas = pf.read_row_groups(grupos_a_ler, columns=['Ticker', 'Ano', 'Trimestre']).to_pandas()
+        partes.append(calcular_marcas_dagua(colunas))
+
+    if por_estatistica:
+        df_stats = pd.DataFrame(por_estatistica)
+        marcas = calcular_marcas_dagua(df_stats)
+        marcas['registros'] = df_stats.groupby('Ticker')['registros'].sum()
+        partes.append(marcas)
+
+    if not partes:
+        return {}
+
+    # Um ticker pode aparecer nas duas partes: ficar com o maior período
+    marcas = pd.concat(partes)
+    marcas['periodo'] = marcas['ultimo_ano'] * 4 + marcas['ultimo_trimestre']
+    marcas = marcas.sort_values('periodo').groupby(level=0).last()
+
+    return {
+        str(ticker): {'ultimo_ano': int(linha.ultimo_ano), 'ultimo_trimestre': int(linha.ultimo_trimestre)}
+        for ticker, linha in marcas.iterrows()
+    }
+
+
+def carregar_manifesto(armazenamento, registro):
+    """Baixa o manifesto referenciado pela linha de controle; None se não existir"""
+
+    caminho = registro.get('manifesto_path') or caminho_manifesto(registro['arquivo_path'])
+
+    try:
+        return json.loads(armazenamento.baixar(caminho))
+    except Exception:
+        return None
+
+def ultimos_trimestres_remotos(armazenamento, arquivo_path):
+    """
+    Fallback sem manifesto: lê o rodapé do Parquet por faixa de bytes
+    (URL assinada no Supabase, arquivo direto no armazenamento local); se não
+    for possível, baixa o arquivo e usa o mesmo cálculo.
+    """
+
+    try:
+        arquivo = armazenamento.abrir(arquivo_path)
+        if isinstance(arquivo, ArquivoRemoto):
+            ultimos = ultimos_trimestres_do_parquet(io.BufferedReader(arquivo, buffer_size=1024 * 1024))
+            print(f"   📑 Rodapé do Parquet lido ({arquivo.bytes_lidos / 1024:.0f} KB de {arquivo.tamanho / 1024 / 1024:.1f} MB)")
+        else:
+            with arquivo:
+                ultimos = ultimos_trimestres_do_parquet(arquivo)
+        return ultimos
+    except Exception as e:
+        print(f"   ⚠️  Leitura por faixa indisponível ({e}); baixando arquivo completo")
+
+    conteudo = armazenamento.baixar(arquivo_path)
+    return ultimos_trimestres_do_parquet(io.BytesIO(conteudo))
+
+
+class SnapshotDataset:
+    """
+    Versão ativa do dataset, resolvida uma única vez por execução.
+    A linha de controle é consultada uma vez; cada Parquet (arquivo único ou
+    partição) é baixado uma vez e guardado na pasta da versão no cache local,
+    sendo reaproveitado por todas as etapas (marcas d'água, merge), por
+    execuções seguintes na mesma máquina e, se não mudou, pela versão seguinte.
+    """
+
+    def __init__(self, armazenamento, diretorio=DIRETORIO_SNAPSHOTS):
+        self.armazenamento = armazenamento
+        self.diretorio = diretorio
+        self._registro = None
+        self._resolvido = False
+        self._manifesto = None
+        self._manifesto_carregado = False
+        self._dataframe = None
+        self._tabela = None
+
+    @property
+    def registro(self):
+        """Linha ativa da tabela de controle (None se ainda não há dados)"""
+        if not self._resolvido:
+            self._registro = self.armazenamento.registro_ativo()
+            self._resolvido = True
+        return self._registro
+
+    @property
+    def arquivo_path(self):
+        return self.registro['arquivo_path'] if self.registro else None
+
+    @property
+    def manifesto(self):
+        if not self._manifesto_carregado and self.registro:
+            self._manifesto = carregar_manifesto(self.armazenamento, self.registro)
+            self._manifesto_carregado = True
+        return self._manifesto
+
+    @property
+    def particionado(self):
+        return bool(self.registro) and eh_particionado(self.registro, self.manifesto)
+
+    def particoes(self, anos=None, tipos=None):
+        """Partições vivas da versão ativa, opcionalmente só as de certos anos/tipos"""
+        if not self.particionado:
+            return []
+        return filtrar_particoes(self.manifesto['particoes'], anos, tipos)
+
+    def deltas(self, anos=None, tipos=None):
+        """Segmentos delta ainda não compactados, na ordem em que foram publicados"""
+        if not self.particionado:
+            return []
+        return filtrar_deltas(self.manifesto.get('deltas', []), anos, tipos)
+
+    @property
+    def diretorio_versao(self):
+        """Subpasta do cache da versão ativa"""
+        chave = hashlib.sha256(self.arquivo_path.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.diretorio, f"versao_{chave}")
+
+    def _caminho_cache(self, arquivo_path):
+        chave = hashlib.sha256(arquivo_path.encode('utf-8')).hexdigest()[:16]
+        return os.path.join(self.diretorio_versao, f"{chave}_{os.path.basename(arquivo_path)}")
+
+    def _em_cache(self, arquivo_path):
+        """
+        Indica se o arquivo está na pasta da versão ativa. Partições que não
+        mudaram entre versões são reaproveitadas da pasta de outra versão por
+        link (ou cópia), sem novo download.
+        """
+
+        caminho = self._caminho_cache(arquivo_path)
+
+        if os.path.exists(caminho):
+            return True
+
+        nome = os.path.basename(caminho)
+        outras = [
+            os.path.join(self.diretorio, pasta, nome)
+            for pasta in (os.listdir(self.diretorio) if os.path.isdir(self.diretorio) else [])
+            if pasta.startswith('versao_')
+        ]
+
+        for origem in outras:
+            if origem == caminho or not os.path.exists(origem):
+                continue
+            try:
+                os.makedirs(self.diretorio_versao, exist_ok=True)
+                temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+                try:
+                    os.link(origem, temporario)
+                except OSError:
+                    shutil.copyfile(origem, temporario)
+                os.replace(temporario, caminho)
+                return True
+            except OSError:
+                # Versão removida por outro processo no meio da cópia: tenta a próxima
+                continue
+
+        return False
+
+    def _baixar_para_cache(self, arquivo_path, sha256_esperado=None):
+        """Baixa um Parquet imutável para o cache local (se ainda não estiver lá)"""
+
+        caminho = self._caminho_cache(arquivo_path)
+
+        if self._em_cache(arquivo_path):
+            return caminho
+
+        conteudo = self.armazenamento.baixar(arquivo_path)
+
+        # Conferir integridade quando o manifesto traz o hash
+        if sha256_esperado and hashlib.sha256(conteudo).hexdigest() != sha256_esperado:
+            raise IOError(f"Hash do arquivo {arquivo_path} não confere com o manifesto")
+
+        os.makedirs(self.diretorio_versao, exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, 'wb') as f:
+            f.write(conteudo)
+        os.replace(temporario, caminho)
+
+        return caminho
+
+    def caminho_local(self):
+        """Caminho do Parquet ativo (layout monolítico) em disco"""
+
+        if not self.registro:
+            return None
+
+        caminho = self._caminho_cache(self.arquivo_path)
+
+        if self._em_cache(self.arquivo_path):
+            print(f"   💾 Snapshot local reaproveitado: {os.path.basename(caminho)}")
+        else:
+            print(f"   📥 Baixando snapshot {self.arquivo_path}...")
+            with medir_etapa('download_snapshot', arquivos=1) as etapa:
+                self._baixar_para_cache(self.arquivo_path, (self.manifesto or {}).get('sha256'))
+                etapa['bytes'] = os.path.getsize(caminho)
+            self._limpar_versoes_antigas()
+
+        return caminho
+
+    def caminhos_particoes(self, particoes):
+        """Baixa em paralelo as partições (ou deltas) que ainda não estão no cache local"""
+
+        faltando = [p for p in particoes if not self._em_cache(p['caminho'])]
+
+        if faltando:
+            print(f"   📥 Baixando {len(faltando)} de {len(particoes)} partições...")
+            with medir_etapa('download_snapshot', arquivos=len(faltando)) as etapa, \
+                    ThreadPoolExecutor(max_workers=DOWNLOADS_PARALELOS) as executor:
+                locais = list(executor.map(lambda p: self._baixar_para_cache(p['caminho'], p.get('sha256')), faltando))
+                etapa['bytes'] = sum(os.path.getsize(c) for c in locais)
+            self._limpar_versoes_antigas()
+        else:
+            print(f"   💾 {len(particoes)} partições reaproveitadas do cache local")
+
+        return [self._caminho_cache(p['caminho']) for p in particoes]
+
+    def _limpar_versoes_antigas(self):
+        """
+        Remove pastas de versões antigas, mantendo a ativa e as VERSOES_EM_CACHE
+        mais recentes. Nunca apaga arquivos de uma versão mantida, nem da ativa.
+        """
+
+        os.utime(self.diretorio_versao)
+
+        pastas = []
+        for nome in os.listdir(self.diretorio):
+            caminho = os.path.join(self.diretorio, nome)
+            if nome.startswith('versao_') and os.path.isdir(caminho) and caminho != self.diretorio_versao:
+                try:
+                    pastas.append((os.path.getmtime(caminho), caminho))
+                except OSError:
+                    continue
+            elif nome.endswith('.parquet'):
+                # Cache do formato anterior (arquivos soltos na raiz)
+                try:
+                    os.remove(caminho)
+                except OSError:
+                    pass
+
+        for _, caminho in sorted(pastas, reverse=True)[max(VERSOES_EM_CACHE - 1, 0):]:
+            shutil.rmtree(caminho, ignore_errors=True)
+
+    def tabela_particao(self, particao):
+        """Uma partição como tabela Arrow"""
+        return pq.read_table(self.caminhos_particoes([particao])[0])
+
+    def _ler_ticker(self, entrada, ticker):
+        """
+        Linhas do ticker em um Parquet da versão ativa: do cache local se já
+        baixado; senão por faixas de bytes no armazenamento (rodapé + row groups
+        do ticker), baixando o arquivo inteiro só se a leitura por faixa falhar
+        """
+
+        if self._em_cache(entrada['caminho']):
+            try:
+                return ler_ticker_parquet(self._caminho_cache(entrada['caminho']), ticker)
+            except FileNotFoundError:
+                # Pasta removida por outro processo depois da consulta: lê do armazenamento
+                pass
+
+        try:
+            arquivo = self.armazenamento.abrir(entrada['caminho'])
+            if isinstance(arquivo, ArquivoRemoto):
+                return ler_ticker_parquet(io.BufferedReader(arquivo, buffer_size=1024 * 1024), ticker)
+            with arquivo:
+                return ler_ticker_parquet(arquivo, ticker)
+        except Exception as e:
+            print(f"   ⚠️  Leitura por faixa indisponível ({e}); baixando {entrada['caminho']}")
+
+        return ler_ticker_parquet(self._baixar_para_cache(entrada['caminho'], entrada.get('sha256')), ticker)
+
+    def tabela_ticker(self, ticker):
+        """
+        Só as linhas de um ticker, sem baixar o dataset: partições e deltas sem
+        o ticker (segundo o manifesto) são pulados e, nos demais arquivos, só
+        os row groups cujas estatísticas de Ticker o incluem são lidos
+        """
+
+        if not self.registro:
+            return None
+
+        # Caminho de leitura do dashboard: sem métricas (medido no benchmark, etapa selecao_empresa_fria)
+        if self.particionado:
+            # Manifestos antigos não listam tickers por partição: lê todas
+            particoes = [p for p in self.particoes() if ticker in p.get('tickers', [ticker])]
+            deltas = [d for d in self.deltas() if ticker in d.get('tickers', {ticker: None})]
+
+            tabela = concatenar_tabelas([self._ler_ticker(p, ticker) for p in particoes])
+            if deltas:
+                tabela_deltas = concatenar_tabelas([self._ler_ticker(d, ticker) for d in deltas])
+                tabela = tabela_deltas if tabela is None else mesclar_tabelas_arrow(tabela, tabela_deltas, CHAVES_REGISTRO)
+        else:
+            tabela = self._ler_ticker({'caminho': self.arquivo_path, 'sha256': (self.manifesto or {}).get('sha256')}, ticker)
+
+        if tabela is not None:
+            tabela = aplicar_schema_arrow(tabela)
+
+        return tabela
+
+    def tabela(self, anos=None, tipos=None):
+        """
+        Dataset ativo como tabela Arrow. No layout particionado lê só as
+        partições dos anos/tipos pedidos; a leitura completa é decodificada uma vez.
+        """
+
+        if not self.registro:
+            return None
+
+        completo = anos is None and tipos is None
+
+        if completo and self._tabela is not None:
+            return self._tabela
+
+        if self.particionado:
+            particoes = self.particoes(anos, tipos)
+            deltas = self.deltas(anos, tipos)
+            caminhos = self.caminhos_particoes(particoes + deltas)
+            tabelas = [pq.read_table(c) for c in caminhos]
+            tabela = concatenar_tabelas(tabelas[:len(particoes)])
+            if deltas:
+                # Base + deltas com last-writer-wins pela chave do registro
+                tabela_deltas = filtrar_tabela(concatenar_tabelas(tabelas[len(particoes):]), anos, tipos)
+                tabela = tabela_deltas if tabela is None else mesclar_tabelas_arrow(tabela, tabela_deltas, CHAVES_REGISTRO)
+        else:
+            tabela = filtrar_tabela(pq.read_table(self.caminho_local()), anos, tipos)
+
+        # Arquivos gravados antes do schema compacto são convertidos na leitura
+        if tabela is not None:
+            tabela = aplicar_schema_arrow(tabela)
+
+        if completo:
+            self._tabela = tabela
+
+        return tabela
+
+    def dataframe(self, anos=None, tipos=None):
+        """Dataset ativo como DataFrame (a leitura completa é decodificada uma vez)"""
+
+        if not self.registro:
+            return None
+
+        if anos is None and tipos is None:
+            if self._dataframe is None:
+                if self.particionado:
+                    self._dataframe = tabela_para_pandas(self.tabela())
+                else:
+                    self._dataframe = aplicar_schema_pandas(pd.read_parquet(self.caminho_local()))
+            return self._dataframe
+
+        return tabela_para_pandas(self.tabela(anos, tipos))
+
+    def descartar_decodificados(self):
+        """Libera as cópias decodificadas guardadas pelo snapshot (quem já as recebeu continua com elas)"""
+        self._tabela = None
+        self._dataframe = None
+
+    def ultimos_trimestres(self):
+        """
+        Marcas d'água por ticker: manifesto; sem manifesto, rodapé do snapshot
+        local (se já em cache) ou do Parquet remoto por faixa de bytes
+        """
+
+        if not self.registro:
+            return {}
+
+        if self.manifesto:
+            print(f"📄 Manifesto carregado ({self.manifesto['registros_total']:,} registros descritos)")
+            return ultimos_trimestres_do_manifesto(self.manifesto)
+
+        print("⚠️  Manifesto não encontrado, usando rodapé do Parquet...")
+
+        if self._em_cache(self.arquivo_path):
+            return ultimos_trimestres_do_parquet(self._caminho_cache(self.arquivo_path))
+
+        return ultimos_trimestres_remotos(self.armazenamento, self.arquivo_path)
+
+
+def eh_particionado(registro, manifesto=None):
+    """Indica se a versão descrita pela linha de controle usa o layout particionado"""
+    if registro.get('formato') == LAYOUT_PARTICIONADO:
+        return True
+    return bool(manifesto) and 'particoes' in manifesto
+
+def filtrar_particoes(particoes, anos=None, tipos=None):
+    """Seleciona partições pelos valores de Ano/Tipo (poda antes de qualquer download)"""
+    return [
+        p for p in particoes
+        if (anos is None or p['Ano'] in anos) and (tipos is None or p['Tipo'] in tipos)
+    ]
+
+def filtrar_deltas(deltas, anos=None, tipos=None):
+    """Seleciona deltas que têm linhas de algum dos anos/tipos pedidos"""
+    return [
+        d for d in deltas
+        if (anos is None or set(d['anos']) & set(anos)) and (tipos is None or set(d['tipos']) & set(tipos))
+    ]
+
+def row_groups_com_valor(metadados, coluna, valor):
+    """Row groups cujas estatísticas (mín/máx) da coluna podem conter o valor; sem estatísticas, todos"""
+
+    indice = metadados.schema.names.index(coluna)
+    grupos = []
+
+    for i in range(metadados.num_row_groups):
+        estatisticas = metadados.row_group(i).column(indice).statistics
+        if estatisticas is None or not estatisticas.has_min_max or estatisticas.min <= valor <= estatisticas.max:
+            grupos.append(i)
+
+    return grupos
+
+def ler_ticker_parquet(fonte, ticker):
+    """Lê de um Parquet (caminho ou arquivo) só os row groups que podem ter o ticker e filtra as linhas"""
+
+    arquivo = pq.ParquetFile(fonte)
+    grupos = row_groups_com_valor(arquivo.metadata, 'Ticker', ticker)
+
+    if not grupos:
+        return arquivo.schema_arrow.empty_table()
+
+    tabela = arquivo.read_row_groups(grupos)
+    return tabela.filter(pc.is_in(tabela['Ticker'], value_set=pa.array([ticker])))
+
+def filtrar_tabela(tabela, anos=None, tipos=None):
+    """Mesmo filtro de filtrar_particoes aplicado às linhas de uma tabela"""
+    if anos is not None:
+        tabela = tabela.filter(pc.is_in(tabela['Ano'], value_set=pa.array(list(anos), tabela.schema.field('Ano').type)))
+    if tipos is not None:
+        tabela = tabela.filter(pc.is_in(tabela['Tipo'], value_set=pa.array(list(tipos))))
+    return tabela
+
+def concatenar_tabelas(tabelas):
+    """Concatena tabelas gravadas em momentos diferentes (tipos podem variar, ex.: int32/int64)"""
+    if not tabelas:
+        return None
+    try:
+        return pa.concat_tables(tabelas, promote_options='permissive')
+    except TypeError:
+        # pyarrow antigo: sem promote_options
+        return pa.concat_tables([t.cast(tabelas[0].schema) for t in tabelas])
+
+def caminho_particao(ano, tipo, timestamp):
+    """Caminho no bucket de um arquivo de partição (layout estilo Hive)"""
+    return f"{PREFIXO_PARTICOES}/Ano={ano}/Tipo={tipo}/parte_{timestamp}.parquet"
+
+def caminho_delta(timestamp):
+    """Caminho no bucket de um segmento delta"""
+    return f"{PREFIXO_DELTAS}/delta_{timestamp}.parquet"
+
+def dividir_em_particoes(tabela):
+    """Separa uma tabela long em {(Ano, Tipo): subtabela}"""
+
+    tabela = tabela.unify_dictionaries()
+
+    combinacoes = tabela.group_by(['Ano', 'Tipo']).aggregate([]).to_pylist()
+    particoes = {}
+
+    for combinacao in combinacoes:
+        mascara = pc.and_(
+            pc.equal(tabela['Ano'], combinacao['Ano']),
+            pc.equal(tabela['Tipo'], combinacao['Tipo'])
+        )
+        particoes[(int(combinacao['Ano']), combinacao['Tipo'])] = tabela.filter(mascara)
+
+    return particoes
+
+def _somar_marcas(marcas_base, marcas_removidas, marcas_adicionadas):
+    """
+    Atualiza {ticker: {ultimo_ano, ultimo_trimestre, registros}} trocando o
+    conteúdo antigo das partições reescritas pelo novo
+    """
+
+    resultado = {ticker: dict(info) for ticker, info in marcas_base.items()}
+
+    if marcas_removidas is not None:
+        for ticker, linha in marcas_removidas.iterrows():
+            if ticker in resultado:
+                resultado[ticker]['registros'] -= int(linha.registros)
+
+    for ticker, linha in marcas_adicionadas.iterrows():
+        info = resultado.setdefault(ticker, {'ultimo_ano': 0, 'ultimo_trimestre': 0, 'registros': 0})
+        info['registros'] += int(linha.registros)
+        # Merge nunca remove períodos: a marca d'água só avança
+        if (int(linha.ultimo_ano), int(linha.ultimo_trimestre)) > (info['ultimo_ano'], info['ultimo_trimestre']):
+            info['ultimo_ano'] = int(linha.ultimo_ano)
+            info['ultimo_trimestre'] = int(linha.ultimo_trimestre)
+
+    return resultado
+
+def _enviar_parquet(armazenamento, caminho, tabela, opcoes_parquet=None):
+    """
+    Grava a tabela em Parquet no bucket; devolve a entrada do manifesto.
+    opcoes_parquet: argumentos de tabela_para_parquet (compression, compression_level)
+    """
+
+    with medir_etapa('serializacao') as etapa:
+        conteudo = tabela_para_parquet(tabela, **(opcoes_parquet or {}))
+        etapa.update(registros_entrada=tabela.num_rows, bytes=len(conteudo))
+
+    with medir_etapa('upload', arquivo=caminho) as etapa:
+        armazenamento.enviar(caminho, conteudo)
+        etapa['bytes'] = len(conteudo)
+
+    return {
+        'caminho': caminho,
+        'registros': tabela.num_rows,
+        'tamanho_bytes': len(conteudo),
+        'sha256': hashlib.sha256(conteudo).hexdigest(),
+    }
+
+def _reescrever_particoes(armazenamento, snapshot, particoes, tabela_nova, timestamp, opcoes_parquet=None):
+    """
+    Grava as partições Ano/Tipo tocadas por tabela_nova, mesclando com a
+    partição atual quando ela existe. Retorna (partições, marcas removidas,
+    marcas adicionadas), com as partições não tocadas mantidas como estão.
+    """
+
+    particoes = dict(particoes)
+    novas = dividir_em_particoes(tabela_nova)
+    marcas_removidas = []
+    marcas_adicionadas = []
+
+    for (ano, tipo), tabela_particao in sorted(novas.items()):
+        if (ano, tipo) in particoes:
+            atual = snapshot.tabela_particao(particoes[(ano, tipo)])
+            marcas_removidas.append(calcular_marcas_dagua(atual))
+            with medir_etapa('mesclagem', particao=f'Ano={ano}/Tipo={tipo}') as etapa:
+                etapa['registros_entrada'] = atual.num_rows + tabela_particao.num_rows
+                tabela_particao = mesclar_tabelas_arrow(atual, tabela_particao, CHAVES_REGISTRO)
+                etapa['registros_saida'] = tabela_particao.num_rows
+
+        entrada = _enviar_parquet(
+            armazenamento, caminho_particao(ano, tipo, timestamp), tabela_particao, opcoes_parquet
+        )
+        marcas = calcular_marcas_dagua(tabela_particao)
+        # Tickers presentes: leitura de uma empresa pula as partições sem ela
+        particoes[(ano, tipo)] = dict(entrada, Ano=ano, Tipo=tipo, tickers=sorted(marcas.index))
+        marcas_adicionadas.append(marcas)
+
+    print(f"   📤 {len(novas)} partições reescritas, {len(particoes) - len(novas)} mantidas")
+
+    vazio = pd.DataFrame(columns=['ultimo_ano', 'ultimo_trimestre', 'registros'])
+
+    return (
+        particoes,
+        pd.concat(marcas_removidas) if marcas_removidas else vazio,
+        pd.concat(marcas_adicionadas) if marcas_adicionadas else vazio,
+    )
+
+def _publicar_manifesto(armazenamento, timestamp, particoes, tickers_base, deltas, colunas):
+    """
+    Monta e envia o manifesto de uma versão particionada.
+    'tickers_base' descreve só as partições; 'tickers' inclui os deltas
+    pendentes (contagens aproximadas até a próxima compactação).
+    """
+
+    tickers = _somar_marcas(
+        tickers_base,
+        None,
+        pd.DataFrame(
+            [dict(marca, Ticker=ticker) for d in deltas for ticker, marca in d['tickers'].items()],
+            columns=['Ticker', 'ultimo_ano', 'ultimo_trimestre', 'registros']
+        ).set_index('Ticker')
+    )
+
+    caminho = f"{PREFIXO_MANIFESTOS}/balancos_{timestamp}.manifest.json"
+
+    manifesto = {
+        'versao_schema': VERSAO_SCHEMA,
+        'layout': LAYOUT_PARTICIONADO,
+        'arquivo_path': caminho,
+        'registros_base': sum(p['registros'] for p in particoes.values()),
+        'registros_total': sum(p['registros'] for p in particoes.values()) + sum(d['registros'] for d in deltas),
+        'colunas': colunas,
+        'gerado_em': datetime.now().isoformat(),
+        'tickers': tickers,
+        'tickers_base': tickers_base,
+        'particoes': [particoes[chave] for chave in sorted(particoes)],
+        'deltas': deltas,
+    }
+
+    conteudo = json.dumps(manifesto).encode('utf-8')
+
+    with medir_etapa('upload', arquivo=caminho) as etapa:
+        armazenamento.enviar(caminho, conteudo, 'application/json')
+        etapa['bytes'] = len(conteudo)
+
+    return caminho, manifesto
+
+def publicar_particionado(armazenamento, tabela_nova, snapshot, timestamp, substituir=False, opcoes_parquet=None):
+    """
+    Publica uma nova versão no layout particionado (Ano=/Tipo=).
+    Sobre uma versão particionada, os dados novos entram como um segmento delta
+    (só ele é enviado); a base é reescrita por compactar_deltas. Backfill,
+    primeira carga e conversão de um Parquet único gravam a base diretamente.
+    Retorna (caminho do manifesto, manifesto).
+    """
+
+    if snapshot.registro and not substituir and snapshot.particionado:
+        return publicar_delta(armazenamento, tabela_nova, snapshot, timestamp, opcoes_parquet)
+
+    if snapshot.registro and not substituir:
+        # Conversão única: o arquivo monolítico inteiro vira partições
+        print("   ♻️  Convertendo arquivo único para layout particionado...")
+        tabela_atual = snapshot.tabela()
+        with medir_etapa('mesclagem') as etapa:
+            etapa['registros_entrada'] = tabela_atual.num_rows + tabela_nova.num_rows
+            tabela_nova = mesclar_tabelas_arrow(tabela_atual, tabela_nova, CHAVES_REGISTRO)
+            etapa['registros_saida'] = tabela_nova.num_rows
+
+    particoes, _, marcas = _reescrever_particoes(
+        armazenamento, snapshot, {}, tabela_nova, timestamp, opcoes_parquet
+    )
+
+    return _publicar_manifesto(
+        armazenamento, timestamp, particoes, _somar_marcas({}, None, marcas), [],
+        tabela_nova.column_names
+    )
+
+def publicar_delta(armazenamento, tabela_nova, snapshot, timestamp, opcoes_parquet=None):
+    """
+    Acrescenta um segmento delta à versão particionada ativa: custo proporcional
+    ao volume novo, sem baixar nem regravar a base
+    """
+
+    manifesto_atual = snapshot.manifesto
+
+    entrada = _enviar_parquet(armazenamento, caminho_delta(timestamp), tabela_nova, opcoes_parquet)
+    entrada['anos'] = sorted(int(a) for a in pc.unique(tabela_nova['Ano']).to_pylist())
+    entrada['tipos'] = sorted(pc.unique(tabela_nova['Tipo']).to_pylist())
+    entrada['tickers'] = _somar_marcas({}, None, calcular_marcas_dagua(tabela_nova))
+    entrada['criado_em'] = datetime.now().isoformat()
+
+    deltas = manifesto_atual.get('deltas', []) + [entrada]
+
+    print(f"   📤 Delta publicado: {entrada['caminho']} ({entrada['registros']:,} registros, "
+          f"{len(deltas)} delta(s) pendente(s))")
+
+    return _publicar_manifesto(
+        armazenamento, timestamp,
+        {(p['Ano'], p['Tipo']): p for p in manifesto_atual['particoes']},
+        manifesto_atual.get('tickers_base', manifesto_atual['tickers']),
+        deltas,
+        manifesto_atual.get('colunas', tabela_nova.column_names)
+    )
+
+def precisa_compactar(manifesto, max_deltas=MAX_DELTAS_PENDENTES, max_bytes=MAX_BYTES_DELTAS):
+    """Indica se os deltas pendentes passaram do limite de quantidade ou tamanho"""
+    deltas = (manifesto or {}).get('deltas', [])
+    return len(deltas) >= max_deltas or sum(d['tamanho_bytes'] for d in deltas) >= max_bytes
+
+def compactar_deltas(armazenamento, snapshot, timestamp, opcoes_parquet=None):
+    """
+    Incorpora os deltas pendentes à base: só as partições Ano/Tipo que
+    aparecem nos deltas são mescladas e regravadas.
+    Retorna (caminho do manifesto, manifesto), ou None se não há deltas.
+    """
+
+    manifesto_atual = snapshot.manifesto
+    deltas = snapshot.deltas()
+
+    if not deltas:
+        return None
+
+    print(f"   🗜️  Compactando {len(deltas)} delta(s)...")
+
+    # Deltas em ordem de publicação: o último vence em chaves repetidas
+    caminhos = snapshot.caminhos_particoes(deltas)
+    with medir_etapa('mesclagem', deltas=len(deltas)) as etapa:
+        tabela_deltas = concatenar_tabelas([pq.read_table(c) for c in caminhos])
+        etapa['registros_entrada'] = tabela_deltas.num_rows
+        tabela_deltas = deduplicar_arrow(tabela_deltas, CHAVES_REGISTRO)
+        etapa['registros_saida'] = tabela_deltas.num_rows
+
+    particoes, removidas, adicionadas = _reescrever_particoes(
+        armazenamento, snapshot,
+        {(p['Ano'], p['Tipo']): p for p in manifesto_atual['particoes']},
+        tabela_deltas, timestamp, opcoes_parquet
+    )
+
+    tickers_base = _somar_marcas(
+        manifesto_atual.get('tickers_base', manifesto_atual['tickers']), removidas, adicionadas
+    )
+
+    return _publicar_manifesto(
+        armazenamento, timestamp, particoes, tickers_base, [],
+        manifesto_atual.get('colunas', tabela_deltas.column_names)
+    )
@@ -0,0 +1,279 @@
+"""
+Download de arquivos da CVM
+Grava em blocos direto no disco, retoma downloads interrompidos via HTTP Range
+e mantém um cache local com GET condicional (ETag / Last-Modified)
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+from datetime import datetime
+import requests
+
+# Tamanho de cada bloco lido da conexão (memória fica limitada a isso)
+TAMANHO_BLOCO = 1024 * 1024
+
+# Quantas vezes tentar retomar um download que caiu no meio
+TENTATIVAS_DOWNLOAD = 5
+
+# Diretório onde os arquivos baixados (e os parciais) ficam guardados
+DIRETORIO_DOWNLOADS = os.environ.get(
+    'CVM_DOWNLOAD_DIR',
+    os.path.join(tempfile.gettempdir(), 'cvm_downloads')
+)
+
+# Cache de downloads (no GitHub Actions aponta para um diretório salvo com actions/cache)
+DIRETORIO_CACHE = os.environ.get(
+    'CVM_CACHE_DIR',
+    os.path.join(DIRETORIO_DOWNLOADS, 'cache')
+)
+
+
+def _ler_json(caminho):
+    """Lê um JSON pequeno de metadados; {} se não existir ou estiver corrompido"""
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _salvar_json(caminho, dados):
+    """Grava JSON de metadados de forma atômica"""
+    temporario = caminho + '.tmp'
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(dados, f, indent=2)
+    os.replace(temporario, caminho)
+
+
+def _salvar_validadores(caminho_meta, response):
+    """Guarda ETag/Last-Modified para garantir que a retomada é do mesmo arquivo"""
+    _salvar_json(caminho_meta, {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified'),
+    })
+
+
+def _descartar_parcial(caminho_parcial, caminho_meta):
+    """Remove arquivo parcial e seus metadados"""
+    for caminho in (caminho_parcial, caminho_meta):
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+
+def _ler_content_range(valor):
+    """'bytes inicio-fim/total' → (inicio, total); None se ausente ou inválido ('*' no total vira None)"""
+    try:
+        unidade, faixa = valor.split(' ', 1)
+        intervalo, total = faixa.split('/', 1)
+        inicio = int(intervalo.split('-', 1)[0])
+    except (AttributeError, ValueError):
+        return None
+    if unidade != 'bytes':
+        return None
+    return inicio, int(total) if total.isdigit() else None
+
+
+def _baixar_para(url, destino, timeout, tentativas, headers_condicionais=None, sessao=None):
+    """
+    Núcleo do download em blocos com retomada.
+    sessao: objeto com get() no formato do requests (padrão: o próprio módulo requests).
+    Retorna (status, validadores), com status 'ok', 'nao_modificado' (HTTP 304) ou None (falha).
+    """
+
+    sessao = sessao or requests
+
+    os.makedirs(os.path.dirname(os.path.abspath(destino)), exist_ok=True)
+
+    caminho_parcial = destino + '.part'
+    caminho_meta = destino + '.part.json'
+
+    for tentativa in range(1, tentativas + 1):
+        ja_baixado = os.path.getsize(caminho_parcial) if os.path.exists(caminho_parcial) else 0
+
+        headers = {}
+        if ja_baixado:
+            headers['Range'] = f'bytes={ja_baixado}-'
+            # If-Range: se o arquivo mudou no servidor, ele responde 200 com o arquivo inteiro
+            validadores = _ler_json(caminho_meta)
+            validador = validadores.get('etag') or validadores.get('last_modified')
+            if validador:
+                headers['If-Range'] = validador
+            print(f"   ↪️  Retomando download a partir de {ja_baixado / 1024 / 1024:.1f} MB")
+        elif headers_condicionais:
+            headers.update(headers_condicionais)
+
+        try:
+            with sessao.get(url, headers=headers, timeout=timeout, stream=True) as response:
+
+                if response.status_code == 304:
+                    return 'nao_modificado', {}
+
+                if response.status_code == 416:
+                    # Range fora do arquivo: ou o parcial já está completo, ou o arquivo mudou
+                    content_range = response.headers.get('Content-Range', '')
+                    tamanho_remoto = content_range.rsplit('/', 1)[-1]
+                    if tamanho_remoto.isdigit() and int(tamanho_remoto) == ja_baixado:
+                        break
+                    _descartar_parcial(caminho_parcial, caminho_meta)
+                    continue
+
+                if response.status_code == 200:
+                    # Servidor ignorou o Range (ou o arquivo mudou): recomeçar do zero
+                    ja_baixado = 0
+                    modo = 'wb'
+                    _salvar_validadores(caminho_meta, response)
+                elif response.status_code == 206:
+                    # Só acrescenta se a faixa devolvida começa onde o parcial termina
+                    faixa = _ler_content_range(response.headers.get('Content-Range'))
+                    if faixa is None or faixa[0] != ja_baixado:
+                        print(f"   ⚠️  Content-Range inesperado ({response.headers.get('Content-Range')}), "
+                              f"baixando do início")
+                        _descartar_parcial(caminho_parcial, caminho_meta)
+                        continue
+                    modo = 'ab'
+                else:
+                    print(f"❌ Erro no download: HTTP {response.status_code}")
+                    return None, {}
+
+                tamanho_esperado = response.headers.get('Content-Length')
+                tamanho_esperado = ja_baixado + int(tamanho_esperado) if tamanho_esperado else None
+
+                with open(caminho_parcial, modo) as arquivo:
+                    for bloco in response.iter_content(chunk_size=TAMANHO_BLOCO):
+                        if bloco:
+                            arquivo.write(bloco)
+
+            tamanho_atual = os.path.getsize(caminho_parcial)
+            if tamanho_esperado is None or tamanho_atual >= tamanho_esperado:
+                break
+
+            print(f"⚠️  Download incompleto ({tamanho_atual:,} de {tamanho_esperado:,} bytes)")
+
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            print(f"⚠️  Conexão interrompida (tentativa {tentativa}/{tentativas}): {e}")
+
+        if tentativa < tentativas:
+            time.sleep(min(2 ** tentativa, 30))
+    else:
+        print(f"❌ Download falhou após {tentativas} tentativas")
+        return None, {}
+
+    validadores = _ler_json(caminho_meta)
+
+    os.replace(caminho_parcial, destino)
+    if os.path.exists(caminho_meta):
+        os.remove(caminho_meta)
+
+    return 'ok', validadores
+
+
+def baixar_arquivo(url, destino=None, timeout=300, tentativas=TENTATIVAS_DOWNLOAD, sessao=None):
+    """
+    Baixa arquivo em blocos para o disco, sem carregar tudo em memória.
+    Se a conexão cair, retoma do último byte gravado usando HTTP Range.
+    Retorna o caminho do arquivo completo, ou None em caso de falha.
+    """
+
+    if destino is None:
+        destino = os.path.join(DIRETORIO_DOWNLOADS, os.path.basename(url))
+
+    status, _ = _baixar_para(url, destino, timeout, tentativas, sessao=sessao)
+
+    return destino if status == 'ok' else None
+
+
+def _caminhos_cache(url):
+    """Arquivo de conteúdo e de metadados do cache para uma URL"""
+    chave = hashlib.sha256(url.encode('utf-8')).hexdigest()[:32]
+    base = os.path.join(DIRETORIO_CACHE, chave)
+    return base + '.bin', base + '.json'
+
+
+def _sha256_arquivo(caminho):
+    """Hash do conteúdo, lido em blocos"""
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+def baixar_com_cache(url, timeout=300, tentativas=TENTATIVAS_DOWNLOAD, forcar=False, sessao=None):
+    """
+    Baixa uma URL passando pelo cache local.
+    Se já existe cópia, envia If-None-Match / If-Modified-Since e, em caso de
+    304 Not Modified, reaproveita o arquivo em disco sem baixar nada.
+    Retorna (caminho, modificado); caminho é None em caso de falha.
+    """
+
+    caminho_conteudo, caminho_meta = _caminhos_cache(url)
+    meta = _ler_json(caminho_meta)
+
+    headers_condicionais = {}
+    cache_valido = (
+        not forcar
+        and os.path.exists(caminho_conteudo)
+        and os.path.getsize(caminho_conteudo) == meta.get('tamanho')
+    )
+
+    if cache_valido:
+        if meta.get('etag'):
+            headers_condicionais['If-None-Match'] = meta['etag']
+        if meta.get('last_modified'):
+            headers_condicionais['If-Modified-Since'] = meta['last_modified']
+
+    status, validadores = _baixar_para(
+        url, caminho_conteudo, timeout, tentativas,
+        headers_condicionais=headers_condicionais, sessao=sessao
+    )
+
+    if status == 'nao_modificado':
+        print(f"   💾 Cache válido (304 Not Modified): {os.path.basename(url) or url}")
+        return caminho_conteudo, False
+
+    if status != 'ok':
+        return None, False
+
+    _salvar_json(caminho_meta, {
+        'url': url,
+        'etag': validadores.get('etag'),
+        'last_modified': validadores.get('last_modified'),
+        'tamanho': os.path.getsize(caminho_conteudo),
+        'sha256': _sha256_arquivo(caminho_conteudo),
+        'baixado_em': datetime.now().isoformat(),
+        'processado': False,
+    })
+
+    return caminho_conteudo, True
+
+
+def ler_texto_com_cache(url, timeout=30, encoding='utf-8'):
+    """Versão de baixar_com_cache para páginas pequenas (ex.: listagem de diretório)"""
+
+    caminho, _ = baixar_com_cache(url, timeout=timeout)
+
+    if not caminho:
+        return None
+
+    with open(caminho, 'r', encoding=encoding, errors='replace') as f:
+        return f.read()
+
+
+def arquivo_ja_processado(url):
+    """Indica se a cópia em cache desta URL já passou por um pipeline concluído"""
+    _, caminho_meta = _caminhos_cache(url)
+    return bool(_ler_json(caminho_meta).get('processado'))
+
+
+def marcar_processado(url):
+    """Marca a cópia em cache como processada (chamar só após publicação bem-sucedida)"""
+    _, caminho_meta = _caminhos_cache(url)
+    meta = _ler_json(caminho_meta)
+    if meta:
+        meta['processado'] = True
+        meta['processado_em'] = datetime.now().isoformat()
+        _salvar_json(caminho_meta, meta)
@@ -1,184 +1,166 @@
 """
-Lista das 133 empresas monitoradas com CNPJs corretos
+Lista das empresas monitoradas com CNPJs corretos
 Fonte: Google Sheets - Base B3
+Consultas e validação ficam em scripts/registro_empresas.py
 """
 
-EMPRESAS_B3 = {
-    'ABEV3': ('07526557000100', 'AMBEV S/A'),
-    'ALPA4': ('61079117000105', 'ALPARGATAS S.A.'),
-    'ALUP3': ('08364948000138', 'ALUPAR INVESTIMENTO S/A'),
-    'AMAR3': ('61189288000189', 'MARISA LOJAS S.A.'),
-    'AMBP3': ('12648266000124', 'AMBIPAR PARTICIPAÇÕES E EMPREENDIMENTOS S/A'),
-    'ANIM3': ('09288252000132', 'ANIMA HOLDING S.A.'),
-    'AZUL4': ('09305994000129', 'AZUL S.A.'),
-    'AZZA3': ('16590234000176', 'AREZZO INDÚSTRIA E COMÉRCIO S.A.'),
-    'BBAS3': ('00000000000191', 'BANCO DO BRASIL S.A'),
-    'BBDC4': ('60746948000112', 'BANCO BRADESCO S.A.'),
-    'BEEF3': ('67620377000114', 'MINERVA S.A.'),
-    'BHIA3': ('33041260065290', 'GRUPO CASAS BAHIA S.A.'),
-    'BPAC3': ('30306294000145', 'BANCO BTG PACTUAL S.A.'),
-    'BPAN4': ('59285411000113', 'BANCO PAN'),
-    'BRFS3': ('01838723000127', 'BRF S.A.'),
-    'BRKM5': ('42150391000170', 'BRASKEM S.A.'),
-    'BRSR6': ('92702067000196', 'BANCO DO ESTADO DO RIO GRANDE DO SUL S.A. – BANRISUL'),
-    'CMIG4': ('17155730000164', 'COMPANHIA ENERGÉTICA DE MINAS GERAIS – CEMIG'),
-    'CMIN3': ('08902291000115', 'CSN MINERAÇÃO S.A.'),
-    'COGN3': ('02800026000140', 'COGNA EDUCAÇÃO S.A.'),
-    'CPFE3': ('02429144000193', 'CPFL ENERGIA S.A.'),
-    'CPLE3': ('76483817000120', 'COMPANHIA PARAENSE DE ENERGIA – COPEL'),
-    'CSAN3': ('50746577000115', 'COSAN S.A.'),
-    'CSMG3': ('17281106000103', 'COMPANHIA DE SANEAMENTO DE MINAS GERAIS – COPASA MG'),
-    'CSNA3': ('33042730000104', 'CIA SIDERURGICA NACIONAL'),
-    'CURY3': ('08797760000183', 'CURY CONSTRUTORA E INCORPORADORA S.A.'),
-    'CYRE3': ('73178600000118', 'CYRELA BRAZIL REALTY S.A. EMPREENDIMENTOS E PARTICIPAÇÕES'),
-    'DASA3': ('61486650000183', 'DIAGNÓSTICOS DA AMÉRICA S.A.'),
-    'DESK3': ('08170849000115', 'DESKTOP – SIGMANET COMUNICAÇÃO MULTIMÍDIA S.A.'),
-    'DESK3': ('08170849000115', 'DESKTOP – SIGMANET COMUNICAÇÃO MULTIMÍDIA S.A.'),
-    'DESK3': ('08170849000115', 'DESKTOP – SIGMANET COMUNICAÇÃO MULTIMÍDIA S.A.'),
-    'DESK3': ('08170849000115', 'DESKTOP – SIGMANET COMUNICAÇÃO MULTIMÍDIA S.A.'),
-    'DESK3': ('08170849000115', 'DESKTOP – SIGMANET COMUNICAÇÃO MULTIMÍDIA S.A.'),
-    'DESK3': ('08170849000115', 'DESKTOP – SIGMANET COMUNICAÇÃO MULTIMÍDIA S.A.'),
-    'DESK3': ('08170849000115', 'DESKTOP – SIGMANET COMUNICAÇÃO MULTIMÍDIA S.A.'),
-    'DESK3': ('08170849000115', 'DESKTOP – SIGMANET COMUNICAÇÃO MULTIMÍDIA S.A.'),
-    'DIRR3': ('16614075000100', 'DIRECIONAL ENGENHARIA S.A.'),
-    'DMVF3': ('12108897000150', 'D1000 VAREJO FARMA PARTICIPAÇÕES S.A.'),
-    'DXCO3': ('97837181000147', 'DEXCO S.A.'),
-    'ECOR3': ('04149454000180', 'ECORODOVIAS INFRAESTRUTURA E LOGÍSTICA S.A.'),
-    'EGIE3': ('02474103000119', 'ENGIE BRASIL ENERGIA S.A.'),
-    'ELET3': ('00001180000126', 'CENTRAIS ELÉTRICAS BRASILEIRAS S.A. – ELETROBRAS'),
-    'EMBR3': ('07689002000189', 'EMBRAER S.A.'),
-    'ENEV3': ('04423567000121', 'ENEVA S.A.'),
-    'ENGI3': ('00864214000106', 'ENERGISA S.A.'),
-    'EPAR3': ('42331462000131', 'EMBPAR PARTICIPACOES S.A.'),
-    'ETER3': ('61092037000181', 'ETERNIT S.A.'),
-    'EUCA4': ('56643018000166', 'EUCATEX S.A. INDÚSTRIA E COMÉRCIO'),
-    'EVEN3': ('43470988000165', 'EVEN CONSTRUTORA E INCORPORADORA S.A.'),
-    'EZTC3': ('08312229000173', 'EZ TEC EMPREENDIMENTOS E PARTICIPAÇÕES S.A.'),
-    'FESA4': ('15141799000103', 'CIA FERRO LIGAS DA BAHIA – FERBASA'),
-    'FLRY3': ('60840055000131', 'FLEURY S.A.'),
-    'FRAS3': ('88610126000129', 'FRAS-LE S.A.'),
-    'GGBR4': ('33611500000119', 'GERDAU S.A.'),
-    'GFSA3': ('01545826000107', 'GAFISA S.A.'),
-    'GMAT3': ('24990777000109', 'GRUPO MATEUS S.A.'),
-    'GOAU4': ('92690783000109', 'METALÚRGICA GERDAU S.A.'),
-    'GOLL4': ('06164253000187', 'GOL LINHAS AÉREAS INTELIGENTES S.A.'),
-    'GUAR3': ('08402943000152', 'GUARARAPES CONFECÇÕES S.A.'),
-    'HAPV3': ('05197443000138', 'HAPVIDA PARTICIPAÇÕES E INVESTIMENTOS SA'),
-    'HBOR3': ('49263189000102', 'HELBOR EMPREENDIMENTOS S.A.'),
-    'HYPE3': ('02932074000191', 'HYPERA S.A.'),
-    'IGTI3': ('60543816000193', 'IGUATEMI S.A.'),
-    'INTB3': ('82901000000127', 'INTELBRAS S.A. INDÚSTRIA DE TELECOMUNICAÇÕES ELETRÔNICA BRASILEIRA'),
-    'ITSA4': ('61532644000115', 'ITAUSA S.A.'),
-    'ITUB4': ('60872504000123', 'ITAÚ UNIBANCO HOLDING S.A.'),
-    'JHSF3': ('08294224000165', 'JHSF PARTICIPAÇÕES S.A.'),
-    'JSLG3': ('52548435000179', 'JSL S.A.'),
-    'KEPL3': ('91983056000169', 'KEPLER WEBER S.A.'),
-    'KLBN3': ('89637490000145', 'KLABIN S.A.'),
-    'LEVE3': ('60476884000187', 'MAHLE-METAL LEVE S.A.'),
-    'LOGG3': ('09041168000110', 'LOG COMMERCIAL PROPERTIES'),
-    'LOGN3': ('42278291000124', 'LOG-IN LOGÍSTICA INTERMODAL S.A.'),
-    'LJQQ3': ('96418264021802', 'LOJAS QUERO-QUERO S.A.'),
-    'LPSB3': ('08078847000109', 'LPS BRASIL – CONSULTORIA DE IMÓVEIS S.A.'),
-    'LREN3': ('92754738000162', 'LOJAS RENNER S.A.'),
-    'MDIA3': ('07206816000115', 'M. DIAS BRANCO S.A. INDÚSTRIA E COMÉRCIO DE ALIMENTOS'),
-    'MGLU3': ('47960950000121', 'MAGAZINE LUIZA S.A.'),
-    'MILS3': ('27093558000115', 'MILLS ESTRUTURAS E SERVIÇOS DE ENGENHARIA S.A.'),
-    'MLAS3': ('59717553000102', 'MULTILASER INDUSTRIAL S.A.'),
-    'MOVI3': ('21314559000166', 'MOVIDA PARTICIPAÇÕES S.A.'),
-    'MRFG3': ('03853896000140', 'MARFRIG GLOBAL FOODS S.A.'),
-    'MULT3': ('07816890000153', 'MULTIPLAN – EMPREENDIMENTOS IMOBILIÁRIOS S.A.'),
-    'MYPK3': ('61156113000175', 'IOCHPE MAXION S.A.'),
-    'NATU3': ('32785497000197', 'NATURA & CO HOLDING S.A.'),
-    'NEOE3': ('01083200000118', 'NEOENERGIA S.A.'),
-    'ODPV3': ('58119199000151', 'ODONTOPREV S.A.'),
-    'ONCO3': ('12104241000402', 'ONCOCLÍNICAS DO BRASIL SERVIÇOS MÉDICOS S.A.'),
-    'PCAR3': ('47508411000156', 'COMPANHIA BRASILEIRA DE DISTRIBUIÇÃO'),
-    'PETR4': ('33000167000101', 'PETRÓLEO BRASILEIRO S.A. PETROBRAS'),
-    'PETZ3': ('18328118000109', 'PET CENTER COMÉRCIO E PARTICIPAÇÕES S.A.'),
-    'PFRM3': ('45453214000151', 'PROFARMA DISTRIBUIDORA DE PRODUTOS FARMACÊUTICOS S.A.'),  # se preferir a chave 'PFRM3'
-    'PLPL3': ('24230275000180', 'PLANO E PLANO DESENVOLVIMENTO IMOBILIÁRIO S.A.'),
-    'POMO4': ('88611835000129', 'MARCOPOLO S.A.'),
-    'PORT3': ('33130691000105', 'WILSON SONS HOLDINGS BRASIL S.A.'),
-    'PRIO3': ('10629105000168', 'PRIO S.A. – PETRORIO'),
-    'PSSA3': ('02149205000169', 'PORTO SEGURO S.A.'),
-    'PTBL3': ('83475913000191', 'PBG S/A – PORTOBELLO'),
-    'QUAL3': ('11992680000193', 'QUALICORP CONSULTORIA E CORRETORA DE SEGUROS S.A.'),
-    'RAIL3': ('02387241000160', 'RUMO S.A.'),
-    'RADL3': ('61585865000151', 'RAIA DROGASIL S.A.'),
-    'RAPT4': ('89086144000116', 'RANDON S.A. IMPLEMENTOS E PARTICIPAÇÕES'),
-    'RDOR3': ('06047087000139', 'REDE DOR SÃO LUIZ S.A.'),
-    'RENT3': ('16670085000155', 'LOCALIZA RENT A CAR S.A.'),
-    'RANI3': ('92791243000103', 'IRANI PAPEL E EMBALAGEM S.A.'),
-    'ROMI3': ('56720428000163', 'INDÚSTRIAS ROMI S.A.'),
-    'SANB3': ('90400888000142', 'BANCO SANTANDER (BRASIL) S.A.'),
-    'SBFG3': ('13217485000111', 'GRUPO SBF SA'),
-    'SCAR3': ('29780061000109', 'SÃO CARLOS EMPREENDIMENTOS E PARTICIPAÇÕES S.A.'),
-    'SEER3': ('04986320000113', 'SER EDUCACIONAL S.A.'),
-    'SEQL3': ('01599101000193', 'SEQUOIA LOGÍSTICA E TRANSPORTES S.A.'),
-    'SHUL4': ('84693183000168', 'SCHULZ S.A.'),
-    'SIMH3': ('07415333000120', 'SIMPAR S.A.'),
-    'SLCE3': ('89096457000155', 'SLC AGRÍCOLA S.A.'),
-    'SOJA3': ('10807374000177', 'BOA SAFRA SEMENTES S.A.'),
-    'STBP3': ('02762121000104', 'SANTOS BRASIL PARTICIPAÇÕES S.A.'),
-    'SUZB3': ('16404287000155', 'SUZANO S.A.'),
-    'TAEE3': ('07859971000130', 'TRANSMISSORA ALIANÇA DE ENERGIA ELÉTRICA S.A – TAESA'),
-    'TEND3': ('71476527000135', 'CONSTRUTORA TENDA S.A.'),
-    'TFCO4': ('59418806000147', 'TRACK & FIELDS CO S.A.'),
-    'TGMA3': ('02351144000118', 'TEGMA GESTÃO LOGÍSTICA S.A.'),
-    'TOTS3': ('53113791000122', 'TOTVS S.A.'),
-    'TUPY3': ('84683374000149', 'TUPY S.A.'),
-    'UGPA3': ('33256439000139', 'ULTRAPAR PARTICIPAÇÕES S.A.'),
-    'UNIP6': ('33958695000178', 'UNIPAR CARBOCLORO S.A.'),
-    'USIM5': ('60894730000105', 'USINAS SID DE MINAS GERAIS S.A. – USIMINAS'),
-    'VALE3': ('33592510000154', 'VALE S.A.'),
-    'VAMO3': ('23373000000132', 'VAMOS LOCAÇÃO DE CAMINHÕES, MÁQUINAS E EQUIPAMENTOS S.A.'),
-    'VBBR3': ('34274233000102', 'VIBRA ENERGIA S.A.'),
-    'VIVA3': ('33839910000111', 'VIVARA PARTICIPAÇÕES S.A.'),
-    'VIVT3': ('02558157000162', 'TELEFÔNICA BRASIL S.A'),
-    'VLID3': ('33113309000147', 'VALID SOLUÇÕES S.A.'),
-    'VULC3': ('50926955000142', 'VULCABRAS S.A.'),
-    'WEGE3': ('84429695000111', 'WEG S.A.'),
-    'WIZC3': ('42278473000103', 'WIZ CO PARTICIPAÇÕES E CORRETAGEM DE SEGUROS S.A.'),
-    'YDUQ3': ('08807432000110', 'YDUQS PARTICIPAÇÕES S.A.'),
-    'LOGN3': ('42278291000124', 'LOG-IN LOGÍSTICA INTERMODAL S.A.'),
-    'PORT3': ('33130691000105', 'WILSON SONS HOLDINGS BRASIL S.A.'),
-    'INTB3': ('82901000000127', 'INTELBRAS S.A. INDÚSTRIA DE TELECOMUNICAÇÕES ELETRÔNICA BRASILEIRA'),
-    'NEOE3': ('01083200000118', 'NEOENERGIA S.A.'),
-    'EQTL3': ('03220438000173', 'EQUATORIAL ENERGIA S.A.'),
-    'NEOE3': ('01083200000118', 'NEOENERGIA S.A.'),
-    'TAEE3': ('07859971000130', 'TRANSMISSORA ALIANÇA DE ENERGIA ELÉTRICA S.A – TAESA'),
-    'AMBP3': ('12648266000124', 'AMBIPAR PARTICIPAÇÕES E EMPREENDIMENTOS S/A'),
-    'CSMG3': ('17281106000103', 'COMPANHIA DE SANEAMENTO DE MINAS GERAIS – COPASA MG'),
-    'BPAN4': ('59285411000113', 'BANCO PAN'),
-    'BRSR6': ('92702067000196', 'BANCO DO ESTADO DO RIO GRANDE DO SUL S.A. – BANRISUL'),
-    'BBDC4': ('60746948000112', 'BANCO BRADESCO S.A.'),
-    'BBAS3': ('00000000000191', 'BANCO DO BRASIL S.A'),
-    'BPAC3': ('30306294000145', 'BANCO BTG PACTUAL S.A.'),
-    'ITUB4': ('60872504000123', 'ITAÚ UNIBANCO HOLDING S.A.'),
-    'SANB3': ('90400888000142', 'BANCO SANTANDER (BRASIL) S.A.'),
-    'PSSA3': ('02149205000169', 'PORTO SEGURO S.A.'),
-    'WIZC3': ('42278473000103', 'WIZ CO PARTICIPAÇÕES E CORRETAGEM DE SEGUROS S.A.'),
-    'IGTI3': ('60543816000193', 'IGUATEMI S.A.'),
-    'LOGG3': ('09041168000110', 'LOG COMMERCIAL PROPERTIES'),
-    'MULT3': ('07816890000153', 'MULTIPLAN – EMPREENDIMENTOS IMOBILIÁRIOS S.A.'),
-    'SCAR3': ('29780061000109', 'SÃO CARLOS EMPREENDIMENTOS E PARTICIPAÇÕES S.A.'),
-    'LPSB3': ('08078847000109', 'LPS BRASIL – CONSULTORIA DE IMÓVEIS S.A.'),
-    'ITSA4': ('61532644000115', 'ITAUSA S.A.'),
-    'SIMH3': ('07415333000120', 'SIMPAR S.A.'),  
-}
+# (ticker, CNPJ, razão social): lista, e não dicionário, para que um ticker
+# repetido seja apontado pelo registro em vez de sobrescrito em silêncio
+CADASTRO_B3 = [
+    ('ABEV3', '07526557000100', 'AMBEV S/A'),
+    ('ALPA4', '61079117000105', 'ALPARGATAS S.A.'),
+    ('ALUP3', '08364948000138', 'ALUPAR INVESTIMENTO S/A'),
+    ('AMAR3', '61189288000189', 'MARISA LOJAS S.A.'),
+    ('AMBP3', '12648266000124', 'AMBIPAR PARTICIPAÇÕES E EMPREENDIMENTOS S/A'),
+    ('ANIM3', '09288252000132', 'ANIMA HOLDING S.A.'),
+    ('AZUL4', '09305994000129', 'AZUL S.A.'),
+    ('AZZA3', '16590234000176', 'AREZZO INDÚSTRIA E COMÉRCIO S.A.'),
+    ('BBAS3', '00000000000191', 'BANCO DO BRASIL S.A'),
+    ('BBDC4', '60746948000112', 'BANCO BRADESCO S.A.'),
+    ('BEEF3', '67620377000114', 'MINERVA S.A.'),
+    ('BHIA3', '33041260065290', 'GRUPO CASAS BAHIA S.A.'),
+    ('BPAC3', '30306294000145', 'BANCO BTG PACTUAL S.A.'),
+    ('BPAN4', '59285411000113', 'BANCO PAN'),
+    ('BRFS3', '01838723000127', 'BRF S.A.'),
+    ('BRKM5', '42150391000170', 'BRASKEM S.A.'),
+    ('BRSR6', '92702067000196', 'BANCO DO ESTADO DO RIO GRANDE DO SUL S.A. – BANRISUL'),
+    ('CEAB3', '45242914000105', 'C&A MODAS S.A.'),
+    ('CMIG4', '17155730000164', 'COMPANHIA ENERGÉTICA DE MINAS GERAIS – CEMIG'),
+    ('CMIN3', '08902291000115', 'CSN MINERAÇÃO S.A.'),
+    ('COGN3', '02800026000140', 'COGNA EDUCAÇÃO S.A.'),
+    ('CPFE3', '02429144000193', 'CPFL ENERGIA S.A.'),
+    ('CPLE3', '76483817000120', 'COMPANHIA PARAENSE DE ENERGIA – COPEL'),
+    ('CSAN3', '50746577000115', 'COSAN S.A.'),
+    ('CSMG3', '17281106000103', 'COMPANHIA DE SANEAMENTO DE MINAS GERAIS – COPASA MG'),
+    ('CSNA3', '33042730000104', 'CIA SIDERURGICA NACIONAL'),
+    ('CURY3', '08797760000183', 'CURY CONSTRUTORA E INCORPORADORA S.A.'),
+    ('CVCB3', '10760260000119', 'CVC BRASIL OPERADORA E AGÊNCIA DE VIAGENS S.A.'),
+    ('CYRE3', '73178600000118', 'CYRELA BRAZIL REALTY S.A. EMPREENDIMENTOS E PARTICIPAÇÕES'),
+    ('DASA3', '61486650000183', 'DIAGNÓSTICOS DA AMÉRICA S.A.'),
+    ('DESK3', '08170849000115', 'DESKTOP – SIGMANET COMUNICAÇÃO MULTIMÍDIA S.A.'),
+    ('DIRR3', '16614075000100', 'DIRECIONAL ENGENHARIA S.A.'),
+    ('DMVF3', '12108897000150', 'D1000 VAREJO FARMA PARTICIPAÇÕES S.A.'),
+    ('DXCO3', '97837181000147', 'DEXCO S.A.'),
+    ('ECOR3', '04149454000180', 'ECORODOVIAS INFRAESTRUTURA E LOGÍSTICA S.A.'),
+    ('EGIE3', '02474103000119', 'ENGIE BRASIL ENERGIA S.A.'),
+    ('ELET3', '00001180000126', 'CENTRAIS ELÉTRICAS BRASILEIRAS S.A. – ELETROBRAS'),
+    ('EMBR3', '07689002000189', 'EMBRAER S.A.'),
+    ('ENEV3', '04423567000121', 'ENEVA S.A.'),
+    ('ENGI3', '00864214000106', 'ENERGISA S.A.'),
+    ('EPAR3', '42331462000131', 'EMBPAR PARTICIPACOES S.A.'),
+    ('EQTL3', '03220438000173', 'EQUATORIAL ENERGIA S.A.'),
+    ('ETER3', '61092037000181', 'ETERNIT S.A.'),
+    ('EUCA4', '56643018000166', 'EUCATEX S.A. INDÚSTRIA E COMÉRCIO'),
+    ('EVEN3', '43470988000165', 'EVEN CONSTRUTORA E INCORPORADORA S.A.'),
+    ('EZTC3', '08312229000173', 'EZ TEC EMPREENDIMENTOS E PARTICIPAÇÕES S.A.'),
+    ('FESA4', '15141799000103', 'CIA FERRO LIGAS DA BAHIA – FERBASA'),
+    ('FLRY3', '60840055000131', 'FLEURY S.A.'),
+    ('FRAS3', '88610126000129', 'FRAS-LE S.A.'),
+    ('GFSA3', '01545826000107', 'GAFISA S.A.'),
+    ('GGBR4', '33611500000119', 'GERDAU S.A.'),
+    ('GMAT3', '24990777000109', 'GRUPO MATEUS S.A.'),
+    ('GOAU4', '92690783000109', 'METALÚRGICA GERDAU S.A.'),
+    ('GOLL4', '06164253000187', 'GOL LINHAS AÉREAS INTELIGENTES S.A.'),
+    ('GRND3', '89850341000160', 'GRENDENE S.A.'),
+    ('GUAR3', '08402943000152', 'GUARARAPES CONFECÇÕES S.A.'),
+    ('HAPV3', '05197443000138', 'HAPVIDA PARTICIPAÇÕES E INVESTIMENTOS SA'),
+    ('HBOR3', '49263189000102', 'HELBOR EMPREENDIMENTOS S.A.'),
+    ('HYPE3', '02932074000191', 'HYPERA S.A.'),
+    ('IGTI3', '60543816000193', 'IGUATEMI S.A.'),
+    ('INTB3', '82901000000127', 'INTELBRAS S.A. INDÚSTRIA DE TELECOMUNICAÇÕES ELETRÔNICA BRASILEIRA'),
+    ('ITSA4', '61532644000115', 'ITAUSA S.A.'),
+    ('ITUB4', '60872504000123', 'ITAÚ UNIBANCO HOLDING S.A.'),
+    ('JHSF3', '08294224000165', 'JHSF PARTICIPAÇÕES S.A.'),
+    ('JSLG3', '52548435000179', 'JSL S.A.'),
+    ('KEPL3', '91983056000169', 'KEPLER WEBER S.A.'),
+    ('KLBN3', '89637490000145', 'KLABIN S.A.'),
+    ('LEVE3', '60476884000187', 'MAHLE-METAL LEVE S.A.'),
+    ('LJQQ3', '96418264021802', 'LOJAS QUERO-QUERO S.A.'),
+    ('LOGG3', '09041168000110', 'LOG COMMERCIAL PROPERTIES'),
+    ('LOGN3', '42278291000124', 'LOG-IN LOGÍSTICA INTERMODAL S.A.'),
+    ('LPSB3', '08078847000109', 'LPS BRASIL – CONSULTORIA DE IMÓVEIS S.A.'),
+    ('LREN3', '92754738000162', 'LOJAS RENNER S.A.'),
+    ('MDIA3', '07206816000115', 'M. DIAS BRANCO S.A. INDÚSTRIA E COMÉRCIO DE ALIMENTOS'),
+    ('MGLU3', '47960950000121', 'MAGAZINE LUIZA S.A.'),
+    ('MILS3', '27093558000115', 'MILLS ESTRUTURAS E SERVIÇOS DE ENGENHARIA S.A.'),
+    ('MLAS3', '59717553000102', 'MULTILASER INDUSTRIAL S.A.'),
+    ('MOVI3', '21314559000166', 'MOVIDA PARTICIPAÇÕES S.A.'),
+    ('MRFG3', '03853896000140', 'MARFRIG GLOBAL FOODS S.A.'),
+    ('MULT3', '07816890000153', 'MULTIPLAN – EMPREENDIMENTOS IMOBILIÁRIOS S.A.'),
+    ('MYPK3', '61156113000175', 'IOCHPE MAXION S.A.'),
+    ('NATU3', '32785497000197', 'NATURA & CO HOLDING S.A.'),
+    ('NEOE3', '01083200000118', 'NEOENERGIA S.A.'),
+    ('ODPV3', '58119199000151', 'ODONTOPREV S.A.'),
+    ('ONCO3', '12104241000402', 'ONCOCLÍNICAS DO BRASIL SERVIÇOS MÉDICOS S.A.'),
+    ('PCAR3', '47508411000156', 'COMPANHIA BRASILEIRA DE DISTRIBUIÇÃO'),
+    ('PETR4', '33000167000101', 'PETRÓLEO BRASILEIRO S.A. PETROBRAS'),
+    ('PETZ3', '18328118000109', 'PET CENTER COMÉRCIO E PARTICIPAÇÕES S.A.'),
+    ('PFRM3', '45453214000151', 'PROFARMA DISTRIBUIDORA DE PRODUTOS FARMACÊUTICOS S.A.'),
+    ('PGMN3', '06626253000151', 'EMPREENDIMENTOS PAGUE MENOS S.A.'),
+    ('PLPL3', '24230275000180', 'PLANO E PLANO DESENVOLVIMENTO IMOBILIÁRIO S.A.'),
+    ('POMO4', '88611835000129', 'MARCOPOLO S.A.'),
+    ('PORT3', '33130691000105', 'WILSON SONS HOLDINGS BRASIL S.A.'),
+    ('PRIO3', '10629105000168', 'PRIO S.A. – PETRORIO'),
+    ('PSSA3', '02149205000169', 'PORTO SEGURO S.A.'),
+    ('PTBL3', '83475913000191', 'PBG S/A – PORTOBELLO'),
+    ('QUAL3', '11992680000193', 'QUALICORP CONSULTORIA E CORRETORA DE SEGUROS S.A.'),
+    ('RADL3', '61585865000151', 'RAIA DROGASIL S.A.'),
+    ('RAIL3', '02387241000160', 'RUMO S.A.'),
+    ('RANI3', '92791243000103', 'IRANI PAPEL E EMBALAGEM S.A.'),
+    ('RAPT4', '89086144000116', 'RANDON S.A. IMPLEMENTOS E PARTICIPAÇÕES'),
+    ('RDOR3', '06047087000139', 'REDE DOR SÃO LUIZ S.A.'),
+    ('RENT3', '16670085000155', 'LOCALIZA RENT A CAR S.A.'),
+    ('ROMI3', '56720428000163', 'INDÚSTRIAS ROMI S.A.'),
+    ('SANB3', '90400888000142', 'BANCO SANTANDER (BRASIL) S.A.'),
+    ('SBFG3', '13217485000111', 'GRUPO SBF SA'),
+    ('SCAR3', '29780061000109', 'SÃO CARLOS EMPREENDIMENTOS E PARTICIPAÇÕES S.A.'),
+    ('SEER3', '04986320000113', 'SER EDUCACIONAL S.A.'),
+    ('SEQL3', '01599101000193', 'SEQUOIA LOGÍSTICA E TRANSPORTES S.A.'),
+    ('SHUL4', '84693183000168', 'SCHULZ S.A.'),
+    ('SIMH3', '07415333000120', 'SIMPAR S.A.'),
+    ('SLCE3', '89096457000155', 'SLC AGRÍCOLA S.A.'),
+    ('SOJA3', '10807374000177', 'BOA SAFRA SEMENTES S.A.'),
+    ('STBP3', '02762121000104', 'SANTOS BRASIL PARTICIPAÇÕES S.A.'),
+    ('SUZB3', '16404287000155', 'SUZANO S.A.'),
+    ('TAEE3', '07859971000130', 'TRANSMISSORA ALIANÇA DE ENERGIA ELÉTRICA S.A – TAESA'),
+    ('TEND3', '71476527000135', 'CONSTRUTORA TENDA S.A.'),
+    ('TFCO4', '59418806000147', 'TRACK & FIELDS CO S.A.'),
+    ('TGMA3', '02351144000118', 'TEGMA GESTÃO LOGÍSTICA S.A.'),
+    ('TOTS3', '53113791000122', 'TOTVS S.A.'),
+    ('TUPY3', '84683374000149', 'TUPY S.A.'),
+    ('UGPA3', '33256439000139', 'ULTRAPAR PARTICIPAÇÕES S.A.'),
+    ('UNIP6', '33958695000178', 'UNIPAR CARBOCLORO S.A.'),
+    ('USIM5', '60894730000105', 'USINAS SID DE MINAS GERAIS S.A. – USIMINAS'),
+    ('VALE3', '33592510000154', 'VALE S.A.'),
+    ('VAMO3', '23373000000132', 'VAMOS LOCAÇÃO DE CAMINHÕES, MÁQUINAS E EQUIPAMENTOS S.A.'),
+    ('VBBR3', '34274233000102', 'VIBRA ENERGIA S.A.'),
+    ('VIVA3', '33839910000111', 'VIVARA PARTICIPAÇÕES S.A.'),
+    ('VIVT3', '02558157000162', 'TELEFÔNICA BRASIL S.A'),
+    ('VLID3', '33113309000147', 'VALID SOLUÇÕES S.A.'),
+    ('VULC3', '50926955000142', 'VULCABRAS S.A.'),
+    ('WEGE3', '84429695000111', 'WEG S.A.'),
+    ('WIZC3', '42278473000103', 'WIZ CO PARTICIPAÇÕES E CORRETAGEM DE SEGUROS S.A.'),
+    ('YDUQ3', '08807432000110', 'YDUQS PARTICIPAÇÕES S.A.'),
+]
+
+# Formato antigo (ticker → (CNPJ, razão social)), mantido para compatibilidade
+EMPRESAS_B3 = {ticker: (cnpj, nome) for ticker, cnpj, nome in CADASTRO_B3}
 
 
 def obter_mapeamento_cnpj_ticker():
     """Retorna dicionário CNPJ → Ticker"""
-    return {cnpj: ticker for ticker, (cnpj, _) in EMPRESAS_B3.items()}
+    from scripts.registro_empresas import obter_registro
+    return obter_registro().mapeamento_cnpj_ticker()
 
 def obter_lista_tickers():
     """Retorna lista de tickers"""
-    return list(EMPRESAS_B3.keys())
+    from scripts.registro_empresas import obter_registro
+    return obter_registro().tickers()
 
 def obter_info_empresa(ticker):
     """Retorna informações da empresa"""
-    if ticker in EMPRESAS_B3:
-        cnpj, nome = EMPRESAS_B3[ticker]
-        return {'cnpj': cnpj, 'nome': nome}
+    from scripts.registro_empresas import obter_registro
+    registro = obter_registro()
+    if ticker in registro:
+        return {'cnpj': registro.cnpj_texto(ticker), 'nome': registro.nome(ticker)}
     return None
@@ -0,0 +1,281 @@
+"""
+Gerador de arquivos ITR sintéticos no formato da CVM
+Produz itr_cia_aberta_AAAA.zip com os mesmos CSVs, colunas, encoding (latin1)
+e separador (;) dos arquivos publicados em dados.cvm.gov.br, em escala
+configurável (empresas × anos × contas), para testes e benchmarks offline.
+
+Uso:
+    python scripts/gerador_cvm_sintetico.py --saida /tmp/cvm --anos 2022 2024 --empresas 400 --contas 60
+"""
+
+import os
+import io
+import sys
+import random
+import zipfile
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.update_from_cvm import CNPJS_MONITORADOS
+
+# Colunas dos CSVs de demonstração do ITR (DT_INI_EXERC só em DRE/DFC/DVA)
+COLUNAS_ITR = [
+    'CNPJ_CIA', 'DT_REFER', 'VERSAO', 'DENOM_CIA', 'CD_CVM', 'GRUPO_DFP',
+    'MOEDA', 'ESCALA_MOEDA', 'ORDEM_EXERC', 'DT_INI_EXERC', 'DT_FIM_EXERC',
+    'CD_CONTA', 'DS_CONTA', 'VL_CONTA', 'ST_CONTA_FIXA',
+]
+
+# Colunas do CSV de cadastro que acompanha cada ZIP
+COLUNAS_CADASTRO = [
+    'CNPJ_CIA', 'DT_REFER', 'VERSAO', 'DENOM_CIA', 'CD_CVM', 'CATEG_DOC',
+    'ID_DOC', 'DT_RECEB', 'LINK_DOC',
+]
+
+# Contas fixas de cada demonstração (código, descrição), como no plano de contas da CVM
+CONTAS_BASE = {
+    'DRE': [
+        ('3.01', 'Receita de Venda de Bens e/ou Serviços'),
+        ('3.02', 'Custo dos Bens e/ou Serviços Vendidos'),
+        ('3.03', 'Resultado Bruto'),
+        ('3.04', 'Despesas/Receitas Operacionais'),
+        ('3.04.01', 'Despesas com Vendas'),
+        ('3.04.02', 'Despesas Gerais e Administrativas'),
+        ('3.05', 'Resultado Antes do Resultado Financeiro e dos Tributos'),
+        ('3.06', 'Resultado Financeiro'),
+        ('3.06.01', 'Receitas Financeiras'),
+        ('3.06.02', 'Despesas Financeiras'),
+        ('3.07', 'Resultado Antes dos Tributos sobre o Lucro'),
+        ('3.08', 'Imposto de Renda e Contribuição Social sobre o Lucro'),
+        ('3.09', 'Resultado Líquido das Operações Continuadas'),
+        ('3.11', 'Lucro/Prejuízo Consolidado do Período'),
+    ],
+    'BPA': [
+        ('1', 'Ativo Total'),
+        ('1.01', 'Ativo Circulante'),
+        ('1.01.01', 'Caixa e Equivalentes de Caixa'),
+        ('1.01.02', 'Aplicações Financeiras'),
+        ('1.01.03', 'Contas a Receber'),
+        ('1.01.04', 'Estoques'),
+        ('1.02', 'Ativo Não Circulante'),
+        ('1.02.01', 'Ativo Realizável a Longo Prazo'),
+        ('1.02.03', 'Imobilizado'),
+        ('1.02.04', 'Intangível'),
+    ],
+    'BPP': [
+        ('2', 'Passivo Total'),
+        ('2.01', 'Passivo Circulante'),
+        ('2.01.04', 'Empréstimos e Financiamentos'),
+        ('2.02', 'Passivo Não Circulante'),
+        ('2.02.01', 'Empréstimos e Financiamentos'),
+        ('2.03', 'Patrimônio Líquido Consolidado'),
+        ('2.03.01', 'Capital Social Realizado'),
+        ('2.03.04', 'Reservas de Lucros'),
+    ],
+    'DFC_MI': [
+        ('6.01', 'Caixa Líquido Atividades Operacionais'),
+        ('6.01.01', 'Caixa Gerado nas Operações'),
+        ('6.02', 'Caixa Líquido Atividades de Investimento'),
+        ('6.03', 'Caixa Líquido Atividades de Financiamento'),
+        ('6.05', 'Aumento (Redução) de Caixa e Equivalentes'),
+    ],
+    'DFC_MD': [
+        ('6.01', 'Caixa Líquido Atividades Operacionais'),
+        ('6.02', 'Caixa Líquido Atividades de Investimento'),
+        ('6.03', 'Caixa Líquido Atividades de Financiamento'),
+    ],
+    'DVA': [
+        ('7.01', 'Receitas'),
+        ('7.02', 'Insumos Adquiridos de Terceiros'),
+        ('7.03', 'Valor Adicionado Bruto'),
+        ('7.08', 'Distribuição do Valor Adicionado'),
+    ],
+}
+
+# Demonstrações de resultado/fluxo têm período (DT_INI_EXERC); balanço é posição
+DEMONSTRACOES_COM_PERIODO = {'DRE', 'DFC_MI', 'DFC_MD', 'DVA'}
+
+# Fim de cada trimestre do ITR (o 4º trimestre sai na DFP, não no ITR)
+FIM_TRIMESTRE = {1: '03-31', 2: '06-30', 3: '09-30'}
+INICIO_TRIMESTRE = {1: '01-01', 2: '04-01', 3: '07-01'}
+
+
+def formatar_cnpj(cnpj):
+    """14 dígitos → 00.000.000/0000-00 (formato dos arquivos da CVM)"""
+    return f"{cnpj[:2]}.{cnpj[2:5]}.{cnpj[5:8]}/{cnpj[8:12]}-{cnpj[12:]}"
+
+def gerar_empresas(quantidade, semente=42):
+    """
+    Lista de (cnpj formatado, denominação, código CVM). As primeiras são as
+    empresas monitoradas pelo pipeline; o restante são CNPJs fictícios (que
+    o pipeline deve descartar), como acontece no arquivo real.
+    """
+
+    aleatorio = random.Random(semente)
+    empresas = []
+
+    for i, (cnpj, ticker) in enumerate(list(CNPJS_MONITORADOS.items())[:quantidade]):
+        empresas.append((formatar_cnpj(cnpj), f'CIA {ticker} S.A.', 1000 + i))
+
+    while len(empresas) < quantidade:
+        cnpj = f"{aleatorio.randrange(10**13, 10**14):014d}"
+        if cnpj in CNPJS_MONITORADOS:
+            continue
+        empresas.append((formatar_cnpj(cnpj), f'COMPANHIA SINTETICA {len(empresas)} S.A.', 1000 + len(empresas)))
+
+    return empresas
+
+def gerar_contas(demonstracao, quantidade):
+    """Contas fixas da demonstração completadas com subcontas até 'quantidade'"""
+
+    contas = list(CONTAS_BASE[demonstracao])
+    raiz = contas[0][0].split('.')[0]
+
+    i = 1
+    while len(contas) < quantidade:
+        contas.append((f'{raiz}.99.{i:02d}', f'Outras Contas {demonstracao} {i}'))
+        i += 1
+
+    return contas[:quantidade] if quantidade else contas
+
+def _linhas_demonstracao(demonstracao, ano, empresas, contas, versoes, aleatorio):
+    """Gera as linhas (listas de campos) de uma demonstração em um ano"""
+
+    com_periodo = demonstracao in DEMONSTRACOES_COM_PERIODO
+
+    for cnpj, nome, cd_cvm in empresas:
+        escala = aleatorio.choice([1_000, 10_000, 100_000, 1_000_000])
+
+        # Algumas empresas reapresentam o trimestre (VERSAO 2, 3...)
+        versao_final = 1
+        if versoes > 1 and aleatorio.random() < 0.1:
+            versao_final = aleatorio.randint(2, versoes)
+
+        for trimestre, fim in FIM_TRIMESTRE.items():
+            dt_refer = f'{ano}-{fim}'
+
+            for versao in range(1, versao_final + 1):
+                # Último exercício e o comparativo (ano anterior para DRE, 31/12 anterior para balanço)
+                exercicios = [('ÚLTIMO', ano), ('PENÚLTIMO', ano - 1)]
+
+                for ordem, ano_exercicio in exercicios:
+                    if com_periodo:
+                        # DRE do ITR traz o trimestre isolado e o acumulado no ano
+                        periodos = [(f'{ano_exercicio}-{INICIO_TRIMESTRE[trimestre]}', f'{ano_exercicio}-{fim}')]
+                        if trimestre > 1:
+                            periodos.append((f'{ano_exercicio}-01-01', f'{ano_exercicio}-{fim}'))
+                    elif ordem == 'ÚLTIMO':
+                        periodos = [('', f'{ano}-{fim}')]
+                    else:
+                        periodos = [('', f'{ano - 1}-12-31')]
+
+                    for inicio, fim_exercicio in periodos:
+                        for cd_conta, ds_conta in contas:
+                            valor = aleatorio.uniform(-0.2, 1.0) * escala
+                            yield [
+                                cnpj, dt_refer, str(versao), nome, str(cd_cvm), f'DF Consolidado - {demonstracao}',
+                                'REAL', 'MIL', ordem, inicio, fim_exercicio,
+                                cd_conta, ds_conta, f'{valor:.10f}', 'S',
+                            ]
+
+def escrever_csv(zip_file, nome, colunas, linhas):
+    """Grava um CSV ';' latin1 direto dentro do ZIP, sem montar o arquivo em memória"""
+
+    with zip_file.open(nome, 'w') as destino:
+        texto = io.TextIOWrapper(destino, encoding='latin1', newline='')
+        texto.write(';'.join(colunas) + '\n')
+        total = 0
+        for campos in linhas:
+            texto.write(';'.join(campos) + '\n')
+            total += 1
+        texto.flush()
+        texto.detach()
+
+    return total
+
+def gerar_zip_itr(diretorio, ano, empresas, contas_por_demonstracao=0, versoes=2, semente=42):
+    """
+    Gera itr_cia_aberta_{ano}.zip com cadastro e demonstrações consolidadas
+    (_con_) e individuais (_ind_). Retorna (caminho, linhas por CSV).
+    """
+
+    os.makedirs(diretorio, exist_ok=True)
+    caminho = os.path.join(diretorio, f'itr_cia_aberta_{ano}.zip')
+    aleatorio = random.Random(f'{semente}-{ano}')
+    contagem = {}
+
+    with zipfile.ZipFile(caminho, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+        cadastro = (
+            [cnpj, f'{ano}-{fim}', '1', nome, str(cd_cvm), 'ITR', str(cd_cvm * 10 + t),
+             f'{ano}-{fim}', f'https://www.rad.cvm.gov.br/ENET/frmExibirArquivoIPEExterno.aspx?NumeroProtocoloEntrega={cd_cvm}']
+            for cnpj, nome, cd_cvm in empresas
+            for t, fim in FIM_TRIMESTRE.items()
+        )
+        contagem[f'itr_cia_aberta_{ano}.csv'] = escrever_csv(
+            zip_file, f'itr_cia_aberta_{ano}.csv', COLUNAS_CADASTRO, cadastro
+        )
+
+        for demonstracao in CONTAS_BASE:
+            contas = gerar_contas(demonstracao, contas_por_demonstracao)
+            colunas = COLUNAS_ITR if demonstracao in DEMONSTRACOES_COM_PERIODO else \
+                [c for c in COLUNAS_ITR if c != 'DT_INI_EXERC']
+
+            for consolidacao in ('con', 'ind'):
+                nome = f'itr_cia_aberta_{demonstracao}_{consolidacao}_{ano}.csv'
+                linhas = _linhas_demonstracao(demonstracao, ano, empresas, contas, versoes, aleatorio)
+                if 'DT_INI_EXERC' not in colunas:
+                    indice = COLUNAS_ITR.index('DT_INI_EXERC')
+                    linhas = (campos[:indice] + campos[indice + 1:] for campos in linhas)
+                contagem[nome] = escrever_csv(zip_file, nome, colunas, linhas)
+
+    return caminho, contagem
+
+def gerar_indice_html(diretorio):
+    """Página de listagem no formato do diretório da CVM (lida por listar_arquivos_itr_disponiveis)"""
+
+    arquivos = sorted(f for f in os.listdir(diretorio) if f.startswith('itr_cia_aberta_') and f.endswith('.zip'))
+    links = ''.join(f'<a href="{f}">{f}</a><br>\n' for f in arquivos)
+
+    with open(os.path.join(diretorio, 'index.html'), 'w', encoding='utf-8') as f:
+        f.write(f'<html><body>\n{links}</body></html>\n')
+
+def gerar_anos(diretorio, ano_inicial, ano_final, empresas=400, contas=0, versoes=2, semente=42):
+    """Gera um ZIP por ano e a página de índice; retorna {ano: (caminho, linhas por CSV)}"""
+
+    lista_empresas = gerar_empresas(empresas, semente)
+    resultado = {}
+
+    for ano in range(ano_inicial, ano_final + 1):
+        resultado[ano] = gerar_zip_itr(diretorio, ano, lista_empresas, contas, versoes, semente)
+
+    gerar_indice_html(diretorio)
+
+    return resultado
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gera arquivos ITR sintéticos no formato da CVM")
+    parser.add_argument('--saida', required=True, help="diretório de destino dos ZIPs")
+    parser.add_argument('--anos', nargs=2, type=int, metavar=('ANO_INICIAL', 'ANO_FINAL'), required=True)
+    parser.add_argument('--empresas', type=int, default=400,
+                        help="total de empresas (as primeiras são as monitoradas)")
+    parser.add_argument('--contas', type=int, default=0,
+                        help="contas por demonstração (0 = só as contas fixas)")
+    parser.add_argument('--versoes', type=int, default=2,
+                        help="versão máxima de reapresentação de um trimestre")
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    print(f"🏭 Gerando ITR sintético {args.anos[0]}-{args.anos[1]} "
+          f"({args.empresas} empresas, {args.contas or 'contas fixas'} contas)...")
+
+    resultado = gerar_anos(
+        args.saida, args.anos[0], args.anos[1],
+        empresas=args.empresas, contas=args.contas, versoes=args.versoes, semente=args.semente
+    )
+
+    for ano, (caminho, contagem) in resultado.items():
+        tamanho = os.path.getsize(caminho) / 1024 / 1024
+        print(f"   ✅ {os.path.basename(caminho)}: {sum(contagem.values()):,} linhas, {tamanho:.1f} MB")
+
+if __name__ == "__main__":
+    main()
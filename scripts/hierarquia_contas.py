@@ -0,0 +1,106 @@
+"""
+Hierarquia das contas da CVM (CD_CONTA) codificada em inteiros
+Cada nível do código ('1.01.02') ocupa 2 dígitos decimais de um int64,
+alinhado à esquerda (0101020000000000). A ordem numérica é a ordem da árvore
+(pai antes dos filhos) e os descendentes de uma conta formam um intervalo
+contíguo: drill-down e rollup viram comparações de inteiros, não de textos.
+"""
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Profundidade máxima do código e valores por nível (2 dígitos: 00-99)
+NIVEIS_MAXIMOS = 8
+BASE_NIVEL = 100
+
+
+def codificar_conta(codigo):
+    """'1.01.02' → (chave int64, nível); (None, None) se o código não couber no formato"""
+
+    if codigo is None or pd.isna(codigo):
+        return None, None
+
+    partes = str(codigo).strip().split('.')
+
+    if not 1 <= len(partes) <= NIVEIS_MAXIMOS:
+        return None, None
+
+    # 1º nível com 1 ou 2 dígitos ('1', '3'); demais com exatamente 2 ('01'),
+    # para '1.001' não virar a mesma chave de '1.01'
+    chave = 0
+    for posicao, parte in enumerate(partes):
+        if not parte.isdigit() or int(parte) >= BASE_NIVEL or (posicao > 0 and len(parte) != 2):
+            return None, None
+        chave = chave * BASE_NIVEL + int(parte)
+
+    return chave * BASE_NIVEL ** (NIVEIS_MAXIMOS - len(partes)), len(partes)
+
+def decodificar_conta(chave, nivel):
+    """Chave e nível → código no formato da CVM ('1.01.02')"""
+
+    if chave is None or pd.isna(chave):
+        return None
+
+    chave, nivel = int(chave), int(nivel)
+    partes = []
+
+    for posicao in range(nivel):
+        divisor = BASE_NIVEL ** (NIVEIS_MAXIMOS - 1 - posicao)
+        partes.append((chave // divisor) % BASE_NIVEL)
+
+    return '.'.join([str(partes[0])] + [f'{p:02d}' for p in partes[1:]])
+
+def intervalo_descendentes(chave, nivel):
+    """[início, fim) das chaves da conta e de todas as suas subcontas"""
+    return chave, chave + BASE_NIVEL ** (NIVEIS_MAXIMOS - nivel)
+
+def _codificar_valores(valores):
+    chaves, niveis = zip(*(codificar_conta(v) for v in valores)) if len(valores) else ((), ())
+    return pa.array(chaves, pa.int64()), pa.array(niveis, pa.int8())
+
+def codificar_contas_arrow(coluna):
+    """
+    Coluna CD_CONTA → (Chave_Conta int64, Nivel_Conta int8). Só os códigos
+    distintos passam pelo Python; as linhas recebem o resultado por índice.
+    """
+
+    if isinstance(coluna, pa.ChunkedArray):
+        coluna = coluna.combine_chunks()
+
+    if not pa.types.is_dictionary(coluna.type):
+        coluna = pc.dictionary_encode(coluna)
+
+    chaves, niveis = _codificar_valores(coluna.dictionary.to_pylist())
+
+    return pc.take(chaves, coluna.indices), pc.take(niveis, coluna.indices)
+
+def codificar_contas_pandas(serie):
+    """Versão pandas de codificar_contas_arrow: (Chave_Conta Int64, Nivel_Conta Int8)"""
+
+    categorias = serie.astype('category')
+    chaves, niveis = _codificar_valores(categorias.cat.categories.tolist())
+    codigos = categorias.cat.codes.to_numpy()
+
+    # Código -1 (nulo no CSV) vira nulo
+    chaves = pd.array(chaves.to_pylist() + [None], dtype='Int64')[codigos]
+    niveis = pd.array(niveis.to_pylist() + [None], dtype='Int8')[codigos]
+
+    return pd.Series(chaves, index=serie.index), pd.Series(niveis, index=serie.index)
+
+def mascara_descendentes(chaves, codigo, incluir_conta=True):
+    """
+    Máscara Arrow das linhas da conta (código CVM) e de todas as suas
+    subcontas, por intervalo de chaves: drill-down sem comparar textos
+    """
+
+    chave, nivel = codificar_conta(codigo)
+
+    if chave is None:
+        raise ValueError(f"Código de conta inválido: {codigo}")
+
+    inicio, fim = intervalo_descendentes(chave, nivel)
+    if not incluir_conta:
+        inicio += 1
+
+    return pc.fill_null(pc.and_(pc.greater_equal(chaves, inicio), pc.less(chaves, fim)), False)
@@ -0,0 +1,369 @@
+"""
+Motor de ingestão baseado em PyArrow
+Lê os CSVs da CVM com pyarrow.csv (multithread), filtra e transforma com
+Arrow compute e grava Parquet sem passar por pandas
+"""
+
+import inspect
+from io import BytesIO
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from scripts.hierarquia_contas import codificar_contas_arrow
+from scripts.schema_balancos import (
+    aplicar_schema_arrow,
+    colunas_texto,
+    PERIODO_TRIMESTRE,
+    PERIODO_ACUMULADO,
+    PERIODO_SALDO,
+)
+
+# Bloco de leitura do pyarrow.csv (cada bloco é convertido em paralelo)
+TAMANHO_BLOCO_ARROW = 16 * 1024 * 1024
+
+# Colunas lidas do CSV e seus tipos (strings repetitivas viram dicionário)
+TIPOS_CSV_ARROW = {
+    'CNPJ_CIA': pa.dictionary(pa.int32(), pa.string()),
+    'DT_REFER': pa.dictionary(pa.int32(), pa.string()),
+    'VERSAO': pa.int32(),
+    'ORDEM_EXERC': pa.dictionary(pa.int32(), pa.string()),
+    'DT_INI_EXERC': pa.dictionary(pa.int32(), pa.string()),
+    'DT_FIM_EXERC': pa.dictionary(pa.int32(), pa.string()),
+    'CD_CONTA': pa.dictionary(pa.int32(), pa.string()),
+    'DS_CONTA': pa.dictionary(pa.int32(), pa.string()),
+    'VL_CONTA': pa.float64(),
+}
+
+
+# Exercício corrente no ORDEM_EXERC (o outro é o comparativo, 'PENÚLTIMO')
+ORDEM_EXERCICIO_CORRENTE = 'ÚLTIMO'
+
+# Colunas auxiliares da deduplicação, na ordem de desempate (todas decrescentes)
+AUXILIARES_DEDUPLICACAO = ['DT_REFER', 'VERSAO', 'Corrente']
+
+# Formato das datas nos CSVs da CVM (DT_REFER, DT_INI_EXERC, DT_FIM_EXERC)
+FORMATO_DATA_CVM = '%Y-%m-%d'
+
+# Escrita Parquet: ordem das linhas, tamanho dos row groups e codec padrão
+ORDEM_PARQUET = ['Ticker', 'Tipo', 'Chave_Conta', 'Conta', 'Ano', 'Trimestre', 'Periodo']
+TAMANHO_ROW_GROUP = 32_768
+COMPRESSAO_PARQUET = 'zstd'
+
+# Bloom filters (distintos esperados, falso positivo) para buscas por igualdade
+FILTROS_BLOOM = {
+    'Ticker': {'ndv': 256, 'fpp': 0.01},
+    'Conta': {'ndv': 8192, 'fpp': 0.05},
+}
+
+# pyarrow antigo não grava bloom filters: verificado uma vez, com aviso no primeiro uso
+SUPORTA_FILTROS_BLOOM = 'bloom_filter_options' in inspect.signature(pq.write_table).parameters
+_aviso_bloom_emitido = False
+
+
+def ler_csv_arrow(arquivo):
+    """Lê CSV da CVM (latin1, ';') só com as colunas necessárias, usando várias threads"""
+
+    return pacsv.read_csv(
+        arquivo,
+        read_options=pacsv.ReadOptions(
+            encoding='latin1',
+            use_threads=True,
+            block_size=TAMANHO_BLOCO_ARROW
+        ),
+        parse_options=pacsv.ParseOptions(delimiter=';'),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=list(TIPOS_CSV_ARROW),
+            include_missing_columns=True,
+            column_types=TIPOS_CSV_ARROW
+        )
+    )
+
+def deduplicar_arrow(tabela, chaves):
+    """Remove duplicatas pelas chaves mantendo a última ocorrência (como keep='last')"""
+
+    if tabela.num_rows == 0:
+        return tabela
+
+    # group_by exige um único dicionário por coluna (tabelas concatenadas têm vários)
+    tabela = tabela.unify_dictionaries()
+    tabela = tabela.append_column('_linha', pa.array(range(tabela.num_rows), pa.int64()))
+
+    ultimas = tabela.group_by(chaves).aggregate([('_linha', 'max')])
+    indices = pc.sort_indices(ultimas['_linha_max'])
+    indices = pc.take(ultimas['_linha_max'], indices)
+
+    return tabela.take(indices).drop_columns(['_linha'])
+
+def _por_valores_distintos(coluna, funcao):
+    """
+    Aplica 'funcao' só aos valores distintos da coluna (o dicionário) e
+    devolve o resultado linha a linha pelos índices
+    """
+
+    if isinstance(coluna, pa.ChunkedArray):
+        coluna = coluna.combine_chunks()
+
+    if not pa.types.is_dictionary(coluna.type):
+        coluna = pc.dictionary_encode(coluna)
+
+    return pc.take(funcao(coluna.dictionary), coluna.indices)
+
+def _cnpj_numerico(valores):
+    # Remove pontos, barras e traços; sem dígitos vira nulo
+    digitos = pc.replace_substring_regex(pc.cast(valores, pa.string()), r'[^\d]', '')
+    digitos = pc.if_else(pc.equal(digitos, ''), pa.scalar(None, pa.string()), digitos)
+    return pc.cast(digitos, pa.int64())
+
+def limpar_cnpj_arrow(coluna):
+    """CNPJ como int64, limpando cada CNPJ distinto uma única vez"""
+    return _por_valores_distintos(coluna, _cnpj_numerico)
+
+def converter_datas_arrow(coluna, formato=FORMATO_DATA_CVM):
+    """Datas da CVM em timestamp, convertendo cada data distinta uma única vez (inválidas viram nulo)"""
+    return _por_valores_distintos(
+        coluna, lambda valores: pc.strptime(valores, format=formato, unit='s', error_is_null=True)
+    )
+
+def classificar_periodo_arrow(data_inicio, data_fim):
+    """
+    Periodo de cada linha: SALDO sem data de início (balanço), TRIMESTRE
+    para até 3 meses, ACUMULADO para períodos maiores (desde janeiro)
+    """
+
+    meses = pc.add(
+        pc.multiply(pc.subtract(pc.year(data_fim), pc.year(data_inicio)), 12),
+        pc.add(pc.subtract(pc.month(data_fim), pc.month(data_inicio)), 1)
+    )
+
+    return pc.if_else(
+        pc.is_null(data_inicio),
+        pa.scalar(PERIODO_SALDO),
+        pc.if_else(pc.less_equal(meses, 3), pa.scalar(PERIODO_TRIMESTRE), pa.scalar(PERIODO_ACUMULADO))
+    )
+
+def _indices_ordenaveis(coluna):
+    """Códigos inteiros de uma coluna (dicionário → índices) para ordenar sem comparar textos"""
+
+    coluna = coluna.combine_chunks() if isinstance(coluna, pa.ChunkedArray) else coluna
+    if pa.types.is_dictionary(coluna.type):
+        return coluna.indices
+
+    # Nulos (ex.: conta sem código) ordenam juntos, antes dos demais
+    return pc.fill_null(coluna, -1) if pa.types.is_integer(coluna.type) else coluna
+
+def deduplicar_por_versao_arrow(tabela, chaves):
+    """
+    Uma linha por chave, independente da ordem do arquivo: ordena pela chave,
+    entrega mais recente (DT_REFER), VERSAO decrescente e exercício corrente
+    primeiro, e fica com a primeira linha de cada chave. Remove as colunas
+    auxiliares DT_REFER, VERSAO e Corrente.
+    """
+
+    if tabela.num_rows == 0:
+        return tabela.drop_columns(AUXILIARES_DEDUPLICACAO)
+
+    tabela = tabela.unify_dictionaries()
+
+    colunas = {c: _indices_ordenaveis(tabela[c]) for c in chaves}
+    colunas['DT_REFER'] = pc.fill_null(pc.cast(tabela['DT_REFER'], pa.int64()), 0)
+    colunas['VERSAO'] = pc.fill_null(tabela['VERSAO'], 0)
+    colunas['Corrente'] = pc.fill_null(tabela['Corrente'], False)
+    ordenacao = pa.table(colunas)
+
+    indices = pc.sort_indices(
+        ordenacao,
+        sort_keys=[(c, 'ascending') for c in chaves] + [(c, 'descending') for c in AUXILIARES_DEDUPLICACAO]
+    )
+    ordenada = ordenacao.select(chaves).take(indices)
+
+    # Primeira linha de cada chave: alguma coluna da chave difere da linha anterior
+    nova_chave = None
+    for c in chaves:
+        coluna = ordenada[c].combine_chunks()
+        diferente = pc.not_equal(coluna.slice(1), coluna.slice(0, len(coluna) - 1))
+        nova_chave = diferente if nova_chave is None else pc.or_(nova_chave, diferente)
+
+    primeiras = pa.concat_arrays([pa.array([True]), nova_chave])
+
+    return tabela.take(indices.filter(primeiras)).drop_columns(AUXILIARES_DEDUPLICACAO)
+
+def transformar_wide_para_long_arrow(tabela, tipo_demonstracao, cnpjs_monitorados):
+    """Versão Arrow de transformar_wide_para_long: filtra CNPJs, extrai período e deduplica"""
+
+    print(f"   🔄 Transformando {tipo_demonstracao} para formato long (Arrow)...")
+
+    try:
+        # Limpar CNPJ (remover pontos, barras, traços) e guardar como inteiro
+        cnpj = limpar_cnpj_arrow(tabela['CNPJ_CIA'])
+
+        # FILTRAR APENAS EMPRESAS MONITORADAS
+        print(f"   🔍 Filtrando por {len(cnpjs_monitorados)} CNPJs monitorados...")
+        lista_cnpjs = pa.array([int(c) for c in cnpjs_monitorados], pa.int64())
+        lista_tickers = pa.array(list(cnpjs_monitorados.values()), pa.string())
+
+        mascara = pc.is_in(cnpj, value_set=lista_cnpjs)
+        tabela = tabela.filter(mascara)
+        cnpj = cnpj.filter(mascara)
+
+        print(f"   ✅ Após filtro por CNPJ: {tabela.num_rows:,} registros")
+
+        if tabela.num_rows == 0:
+            print(f"   ⚠️  Nenhum registro das empresas monitoradas")
+            return None
+
+        # Mapear CNPJ para Ticker
+        ticker = pc.take(lista_tickers, pc.index_in(cnpj, value_set=lista_cnpjs))
+
+        # Extrair Ano e Trimestre da data (datas inválidas viram nulo)
+        data_fim = converter_datas_arrow(tabela['DT_FIM_EXERC'])
+        data_inicio = converter_datas_arrow(tabela['DT_INI_EXERC'])
+
+        chave_conta, nivel_conta = codificar_contas_arrow(tabela['CD_CONTA'])
+
+        df_long = pa.table({
+            'Ticker': ticker,
+            'Conta': pc.cast(tabela['DS_CONTA'], pa.string()),
+            'Chave_Conta': chave_conta,
+            'Nivel_Conta': nivel_conta,
+            'Ano': pc.year(data_fim),
+            'Trimestre': pc.quarter(data_fim),
+            'Valor': tabela['VL_CONTA'],
+            'Periodo': classificar_periodo_arrow(data_inicio, data_fim),
+            'DT_REFER': converter_datas_arrow(tabela['DT_REFER']),
+            'VERSAO': tabela['VERSAO'],
+            'Corrente': pc.equal(pc.cast(tabela['ORDEM_EXERC'], pa.string()), ORDEM_EXERCICIO_CORRENTE),
+        })
+
+        # Limpar registros sem conta, data ou valor
+        df_long = df_long.filter(
+            pc.and_(
+                pc.and_(pc.is_valid(df_long['Conta']), pc.is_valid(df_long['Ano'])),
+                pc.is_valid(df_long['Valor'])
+            )
+        )
+
+        # Schema compacto: Ticker/Conta como dicionário, Ano int16, Trimestre int8
+        df_long = aplicar_schema_arrow(df_long)
+
+        # Remover duplicatas: entrega e versão mais recentes, exercício corrente, um valor por tipo de período
+        df_long = deduplicar_por_versao_arrow(
+            df_long, ['Ticker', 'Chave_Conta', 'Conta', 'Ano', 'Trimestre', 'Periodo']
+        )
+
+        print(f"   ✅ Transformado: {df_long.num_rows:,} registros únicos")
+        print(f"   📊 Tickers únicos: {len(pc.unique(df_long['Ticker']))}")
+
+        return df_long
+
+    except Exception as e:
+        print(f"   ❌ Erro na transformação: {e}")
+        import traceback
+        traceback.print_exc()
+        return None
+
+def filtrar_dados_novos_arrow(tabela, ultimos_trimestres):
+    """Mantém só registros posteriores ao último trimestre de cada empresa"""
+
+    print(f"\n🔍 Filtrando apenas dados novos...")
+    print(f"   Total antes do filtro: {tabela.num_rows:,} registros")
+
+    if not ultimos_trimestres:
+        print(f"   ⚠️  Sem informação de últimos trimestres, mantendo todos os dados")
+        return tabela
+
+    tickers = pa.array(list(ultimos_trimestres.keys()), pa.string())
+    limites = pa.array(
+        [info['ultimo_ano'] * 4 + info['ultimo_trimestre'] for info in ultimos_trimestres.values()],
+        pa.int64()
+    )
+
+    # Limite de cada linha (nulo para empresas novas, que entram inteiras)
+    limite = pc.take(limites, pc.index_in(tabela['Ticker'], value_set=tickers))
+    periodo = pc.add(
+        pc.multiply(pc.cast(tabela['Ano'], pa.int64()), 4),
+        pc.cast(tabela['Trimestre'], pa.int64())
+    )
+
+    mascara = pc.or_kleene(pc.is_null(limite), pc.greater(periodo, limite))
+    tabela_final = tabela.filter(mascara)
+
+    print(f"   ✅ Dados novos encontrados: {tabela_final.num_rows:,} registros")
+
+    return tabela_final
+
+def adicionar_tipo_arrow(tabela, tipo):
+    """Adiciona coluna Tipo (demonstração) a uma tabela long"""
+    return aplicar_schema_arrow(
+        tabela.append_column('Tipo', pa.repeat(pa.scalar(tipo, pa.string()), tabela.num_rows))
+    )
+
+def mesclar_tabelas_arrow(tabela_atual, tabela_nova, chaves):
+    """Junta dados atuais e novos mantendo o registro mais recente por chave"""
+
+    # Normalizar para o schema da tabela nova (o Parquet atual pode vir do pandas ou de um schema antigo)
+    tabela_nova = aplicar_schema_arrow(tabela_nova)
+    tabela_atual = aplicar_schema_arrow(tabela_atual).select(tabela_nova.column_names).cast(tabela_nova.schema)
+
+    tabela = pa.concat_tables([tabela_atual, tabela_nova])
+
+    return deduplicar_arrow(tabela, chaves)
+
+def ordenar_para_parquet(tabela):
+    """Ordena pelas colunas de filtro para que as estatísticas min/max de cada row group sejam seletivas"""
+
+    colunas = [c for c in ORDEM_PARQUET if c in tabela.column_names]
+
+    if not colunas or tabela.num_rows == 0:
+        return tabela
+
+    # sort_indices não aceita dicionário: ordenar pelos textos, aplicar na tabela original
+    chaves = colunas_texto(tabela.select(colunas))
+
+    return tabela.take(pc.sort_indices(chaves, sort_keys=[(c, 'ascending') for c in colunas]))
+
+def tabela_para_parquet(tabela, compression=COMPRESSAO_PARQUET, compression_level=None, ordenar=True):
+    """
+    Serializa tabela Arrow em bytes Parquet, sem pandas.
+    Linhas ordenadas por Ticker/Tipo/Conta/Ano/Trimestre, row groups pequenos,
+    page index e bloom filters em Ticker/Conta: leitores que filtram um ticker
+    pulam o restante do arquivo.
+    """
+
+    tabela = aplicar_schema_arrow(tabela)
+
+    if ordenar:
+        tabela = ordenar_para_parquet(tabela)
+
+    colunas_ordenadas = [c for c in ORDEM_PARQUET if c in tabela.column_names] if ordenar else []
+
+    opcoes = dict(
+        compression=compression,
+        compression_level=compression_level,
+        row_group_size=TAMANHO_ROW_GROUP,
+        write_page_index=True,
+        sorting_columns=[
+            pq.SortingColumn(tabela.column_names.index(c)) for c in colunas_ordenadas
+        ] or None,
+    )
+
+    filtros_bloom = {c: cfg for c, cfg in FILTROS_BLOOM.items() if c in tabela.column_names}
+
+    if SUPORTA_FILTROS_BLOOM:
+        opcoes['bloom_filter_options'] = filtros_bloom or None
+    elif filtros_bloom:
+        _avisar_sem_bloom()
+
+    buffer = BytesIO()
+    pq.write_table(tabela, buffer, **opcoes)
+
+    return buffer.getvalue()
+
+def _avisar_sem_bloom():
+    """Avisa uma única vez por processo que os Parquet saem sem bloom filters"""
+    global _aviso_bloom_emitido
+    if not _aviso_bloom_emitido:
+        print(f"   ⚠️  pyarrow {pa.__version__} não grava bloom filters: Parquet publicado sem eles")
+        _aviso_bloom_emitido = True
@@ -0,0 +1,184 @@
+"""
+Métricas por etapa do pipeline
+Tempo de parede, tempo de CPU, registros de entrada/saída, bytes trafegados e
+pico de memória (RSS) de cada etapa. Saem como JSON no stdout e na coluna
+'metricas' do log_atualizacoes, para acompanhar a evolução entre execuções.
+"""
+
+import sys
+import json
+import time
+import threading
+import contextlib
+from datetime import datetime
+
+# Intervalo (segundos) entre amostras de memória durante uma etapa
+INTERVALO_AMOSTRAGEM = 0.01
+
+# Prefixo da linha JSON no stdout (facilita extrair dos logs do GitHub Actions)
+PREFIXO_SAIDA = 'METRICAS_PIPELINE'
+
+_metricas = None
+
+
+def memoria_rss():
+    """Memória residente atual do processo em bytes (None fora do Linux)"""
+
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmRSS:'):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+
+    return None
+
+def memoria_pico_processo():
+    """Pico de memória residente do processo inteiro desde o início"""
+
+    try:
+        import resource
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux informa em KB, macOS em bytes
+        return pico if sys.platform == 'darwin' else pico * 1024
+    except ImportError:
+        return None
+
+def tempo_cpu_filhos():
+    """CPU (s) dos subprocessos já encerrados (pools de processos da ingestão)"""
+
+    try:
+        import resource
+        uso = resource.getrusage(resource.RUSAGE_CHILDREN)
+        return uso.ru_utime + uso.ru_stime
+    except ImportError:
+        return 0.0
+
+def _mb(valor):
+    return round(valor / 1024 / 1024, 1) if valor is not None else None
+
+
+class MetricasPipeline:
+    """Coleta as etapas de uma execução; etapas podem se aninhar e vir de subprocessos"""
+
+    def __init__(self):
+        self.inicio = datetime.now()
+        self.etapas = []
+        self._trava = threading.Lock()
+
+    @contextlib.contextmanager
+    def etapa(self, nome, **atributos):
+        """
+        Mede o bloco 'with'. O dicionário devolvido aceita 'registros_entrada',
+        'registros_saida' e 'bytes', preenchidos dentro do bloco.
+        """
+
+        registro = {'etapa': nome, **atributos}
+        inicial = memoria_rss()
+        pico = [inicial or 0]
+        parar = threading.Event()
+
+        def amostrar():
+            while not parar.wait(INTERVALO_AMOSTRAGEM):
+                atual = memoria_rss()
+                if atual is not None and atual > pico[0]:
+                    pico[0] = atual
+
+        amostrador = threading.Thread(target=amostrar, daemon=True)
+        amostrador.start()
+
+        cpu_inicio = time.process_time()
+        cpu_filhos_inicio = tempo_cpu_filhos()
+        inicio = time.perf_counter()
+
+        try:
+            yield registro
+        except BaseException as e:
+            registro['erro'] = f"{type(e).__name__}: {str(e)[:200]}"
+            raise
+        finally:
+            registro['segundos'] = round(time.perf_counter() - inicio, 4)
+            registro['cpu_segundos'] = round(time.process_time() - cpu_inicio, 4)
+
+            cpu_filhos = tempo_cpu_filhos() - cpu_filhos_inicio
+            if cpu_filhos > 0:
+                registro['cpu_filhos_segundos'] = round(cpu_filhos, 4)
+
+            parar.set()
+            amostrador.join()
+
+            final = memoria_rss()
+            if final is not None and final > pico[0]:
+                pico[0] = final
+
+            if inicial is not None:
+                registro['pico_memoria_mb'] = _mb(pico[0])
+                registro['delta_memoria_mb'] = _mb(pico[0] - inicial)
+
+            with self._trava:
+                self.etapas.append(registro)
+
+    def incorporar(self, etapas, **atributos):
+        """Acrescenta etapas medidas em outro processo (ex.: uma demonstração no pool)"""
+        with self._trava:
+            self.etapas.extend(dict(etapa, **atributos) for etapa in etapas)
+
+    def resumo(self):
+        """Métricas da execução como dicionário serializável em JSON"""
+
+        with self._trava:
+            etapas = list(self.etapas)
+
+        return {
+            'inicio': self.inicio.isoformat(),
+            'segundos_total': round((datetime.now() - self.inicio).total_seconds(), 4),
+            'pico_memoria_processo_mb': _mb(memoria_pico_processo()),
+            'etapas': etapas,
+        }
+
+    def emitir(self):
+        """Imprime o resumo em uma linha JSON no stdout"""
+        print(f"{PREFIXO_SAIDA} {json.dumps(self.resumo(), ensure_ascii=False)}")
+
+
+class ColetorNulo:
+    """
+    Coletor usado quando nenhuma execução pediu métricas (ex.: dashboard):
+    mesma interface, sem guardar etapas nem iniciar a thread de amostragem
+    """
+
+    @contextlib.contextmanager
+    def etapa(self, nome, **atributos):
+        yield {'etapa': nome, **atributos}
+
+    def incorporar(self, etapas, **atributos):
+        pass
+
+    def resumo(self):
+        return {'etapas': []}
+
+    def emitir(self):
+        pass
+
+
+_COLETOR_NULO = ColetorNulo()
+
+
+def obter_metricas():
+    """Coletor de métricas do processo; o nulo se nenhum foi iniciado com novo_coletor"""
+    return _metricas if _metricas is not None else _COLETOR_NULO
+
+def novo_coletor():
+    """
+    Inicia um coletor para o processo. Só o pipeline (update_from_cvm.main,
+    processos do pool, benchmark) coleta; quem apenas importa os módulos não
+    """
+
+    global _metricas
+    _metricas = MetricasPipeline()
+    return _metricas
+
+def medir_etapa(nome, **atributos):
+    """Atalho: etapa no coletor do processo (sem efeito se nenhum foi iniciado)"""
+    return obter_metricas().etapa(nome, **atributos)
@@ -3,13 +3,20 @@ Processador de dados financeiros
 Anualiza trimestres e formata valores
 """
 
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from scripts.mapeamento_contas import normalizar_nome_conta, classificar_tipo_conta
+from scripts.schema_balancos import PERIODO_TRIMESTRE, PERIODO_SALDO
+
+# Escalas de exibição: sufixo → divisor
+ESCALAS_VALOR = {'mil': 1e3, 'mi': 1e6, 'bi': 1e9}
 
 def anualizar_trimestres(df, ticker=None):
     """
     Converte dados trimestrais em anuais
-    DRE: soma dos 4 trimestres
+    DRE: soma dos 4 trimestres (só valores do trimestre isolado)
     Balanço: último trimestre do ano
     """
     
@@ -19,8 +26,15 @@ def anualizar_trimestres(df, ticker=None):
     if not all(col in df.columns for col in ['Ticker', 'Conta', 'Ano', 'Trimestre', 'Valor']):
         return df
     
+    # Trimestre isolado e saldo: o acumulado no ano (mesmo trimestre) contaria duas vezes na soma
+    if 'Periodo' in df.columns:
+        df_work = df[df['Periodo'].astype(str).isin([PERIODO_TRIMESTRE, PERIODO_SALDO])].copy()
+        if df_work.empty:
+            return pd.DataFrame()
+    else:
+        df_work = df.copy()
+    
     # Adicionar tipo de conta
-    df_work = df.copy()
     df_work['Tipo'] = df_work.apply(
         lambda row: classificar_tipo_conta(row['Conta'], row['Ticker']),
         axis=1
@@ -29,7 +43,7 @@ def anualizar_trimestres(df, ticker=None):
     # DRE: somar trimestres
     df_dre = df_work[df_work['Tipo'] == 'DRE'].copy()
     if not df_dre.empty:
-        df_dre_anual = df_dre.groupby(['Ticker', 'Conta', 'Ano'], as_index=False)['Valor'].sum()
+        df_dre_anual = df_dre.groupby(['Ticker', 'Conta', 'Ano'], as_index=False, observed=True)['Valor'].sum()
         df_dre_anual['Trimestre'] = 'Anual'
     else:
         df_dre_anual = pd.DataFrame()
@@ -37,7 +51,7 @@ def anualizar_trimestres(df, ticker=None):
     # Balanço: último trimestre
     df_balanco = df_work[df_work['Tipo'].isin(['Ativo', 'Passivo'])].copy()
     if not df_balanco.empty:
-        idx = df_balanco.groupby(['Ticker', 'Conta', 'Ano'])['Trimestre'].idxmax()
+        idx = df_balanco.groupby(['Ticker', 'Conta', 'Ano'], observed=True)['Trimestre'].idxmax()
         df_balanco_anual = df_balanco.loc[idx].copy()
         df_balanco_anual['Trimestre'] = 'Anual'
     else:
@@ -55,8 +69,93 @@ def anualizar_trimestres(df, ticker=None):
     
     return df_anual
 
+def _agrupar_milhares(inteiros):
+    """
+    Inteiros não negativos (numpy) → texto Arrow com ponto a cada 3 dígitos.
+    Junta os grupos de baixo para cima: com k grupos o texto tem 4k-1
+    caracteres, então o preenchimento com zeros só afeta o grupo que era o
+    mais alto. Um passo por grupo de dígitos, não por linha.
+    """
+    
+    texto = pc.cast(pa.array(inteiros % 1000), pa.string())
+    restante = inteiros // 1000
+    grupos = 1
+    
+    while (restante > 0).any():
+        acima = pc.cast(pa.array(restante % 1000), pa.string())
+        texto = pc.if_else(
+            pa.array(restante > 0),
+            pc.binary_join_element_wise(acima, pc.utf8_lpad(texto, 4 * grupos - 1, '0'), '.'),
+            texto
+        )
+        restante = restante // 1000
+        grupos += 1
+    
+    return texto
+
+def formatar_valores_brasileiros(valores, escala=None, casas=None, valor_nulo="R$ 0"):
+    """
+    Formata uma coluna inteira: R$ 2.483.044.000, -R$ 15.300 ou, com escala
+    ('mil', 'mi', 'bi' ou 'auto', que escolhe por valor), R$ 2,5 bi.
+    Operações vetorizadas do Arrow; nulos/NaN viram valor_nulo.
+    """
+    
+    serie = valores if isinstance(valores, pd.Series) else pd.Series(valores)
+    numeros = pd.to_numeric(serie, errors='coerce').to_numpy(dtype='float64', na_value=np.nan)
+    absolutos = np.abs(numeros)
+    
+    if casas is None:
+        casas = 1 if escala else 0
+    
+    # Divisor por linha. No 'auto' a escala sai do valor já arredondado:
+    # 999.950 vira R$ 1,0 mi (não R$ 1.000,0 mil)
+    if escala == 'auto':
+        divisores = np.ones(len(absolutos))
+        for sufixo in ['mil', 'mi', 'bi']:
+            divisores[absolutos >= ESCALAS_VALOR[sufixo]] = ESCALAS_VALOR[sufixo]
+        
+        for _ in ESCALAS_VALOR:
+            fatores = np.where(divisores > 1, 10 ** casas, 1)
+            subir = (np.rint(absolutos / divisores * fatores) >= 1000 * fatores) & (divisores < ESCALAS_VALOR['bi'])
+            if not subir.any():
+                break
+            divisores = np.where(subir, divisores * 1000, divisores)
+        
+        sufixos = pa.scalar('')
+        for sufixo, divisor in ESCALAS_VALOR.items():
+            sufixos = pc.if_else(pa.array(divisores == divisor), pa.scalar(f' {sufixo}'), sufixos)
+    elif escala:
+        divisores = ESCALAS_VALOR[escala]
+        sufixos = pa.scalar(f' {escala}')
+    else:
+        divisores = 1.0
+        sufixos = pa.scalar('')
+    
+    # Casas decimais só nos valores em escala (no 'auto', abaixo de mil não há)
+    fatores = np.where(divisores > 1, 10 ** casas, 1) if escala == 'auto' else 10 ** casas
+    
+    # Valor em unidades da última casa decimal, inteiro (NaN fica 0 e é tratado no fim)
+    unidades = np.nan_to_num(np.rint(absolutos / divisores * fatores)).astype('int64')
+    
+    texto = _agrupar_milhares(unidades // fatores)
+    
+    if casas:
+        decimais = pc.utf8_lpad(pc.cast(pa.array(unidades % fatores), pa.string()), casas, '0')
+        com_decimais = pc.binary_join_element_wise(texto, decimais, ',')
+        texto = pc.if_else(pa.array(np.broadcast_to(fatores, unidades.shape) > 1), com_decimais, texto)
+    
+    prefixos = pc.if_else(pa.array((numeros < 0) & (unidades > 0)), pa.scalar('-R$ '), pa.scalar('R$ '))
+    texto = pc.binary_join_element_wise(prefixos, texto, sufixos, '')
+    
+    # Zero (inclusive arredondado) e nulos
+    zero = (unidades == 0) | np.isnan(numeros)
+    texto = pc.if_else(pa.array(zero), pa.scalar("R$ 0"), texto)
+    texto = pc.if_else(pa.array(np.isnan(numeros)), pa.scalar(valor_nulo, pa.string()), texto)
+    
+    return pd.Series(pd.arrays.ArrowStringArray(texto), index=serie.index, name=serie.name)
+
 def formatar_valor_brasileiro(valor):
-    """Formata valor: R$ 2.483.044.000"""
+    """Formata valor: R$ 2.483.044.000 (um valor; colunas: formatar_valores_brasileiros)"""
     try:
         if pd.isna(valor) or valor == 0:
             return "R$ 0"
@@ -68,7 +167,7 @@ def formatar_valor_brasileiro(valor):
         # Formatar com pontos como separadores de milhar
         valor_fmt = f"{valor_abs:,.0f}".replace(',', '.')
         
-        if negativo:
+        if negativo and valor_fmt != '0':
             return f"-R$ {valor_fmt}"
         else:
             return f"R$ {valor_fmt}"
@@ -0,0 +1,157 @@
+"""
+Registro único das empresas monitoradas
+Índice CNPJ ↔ ticker ↔ razão social montado uma vez a partir do cadastro
+(scripts/empresas_b3.py), com CNPJ inteiro e sem duplicatas. O índice
+compilado fica em cache local junto com a versão do cadastro: consultas de
+nome, filtro da ingestão e mapeamento para ticker viram acesso a dicionário.
+"""
+
+import os
+import json
+import hashlib
+import tempfile
+from collections import Counter
+from types import MappingProxyType
+
+from scripts.empresas_b3 import CADASTRO_B3
+
+# Índice compilado (regerado quando a versão do cadastro muda)
+ARQUIVO_CACHE_REGISTRO = os.environ.get(
+    'REGISTRO_EMPRESAS_CACHE',
+    os.path.join(tempfile.gettempdir(), 'registro_empresas.json')
+)
+
+_registro = None
+
+
+def versao_cadastro(cadastro):
+    """Carimbo do cadastro: hash do conteúdo (muda com qualquer ticker, CNPJ ou nome)"""
+    conteudo = json.dumps(sorted(cadastro), ensure_ascii=False)
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()[:16]
+
+def validar_cadastro(cadastro):
+    """Confere tickers e CNPJs únicos e CNPJs com 14 dígitos; ValueError com todos os problemas"""
+
+    problemas = []
+
+    tickers = Counter(ticker for ticker, _, _ in cadastro)
+    cnpjs = Counter(cnpj for _, cnpj, _ in cadastro)
+
+    for ticker, vezes in tickers.items():
+        if vezes > 1:
+            problemas.append(f"ticker {ticker} repetido {vezes}x")
+
+    for cnpj, vezes in cnpjs.items():
+        if vezes > 1:
+            repetidos = sorted(t for t, c, _ in cadastro if c == cnpj)
+            problemas.append(f"CNPJ {cnpj} em {', '.join(repetidos)}")
+
+    for ticker, cnpj, _ in cadastro:
+        if len(cnpj) != 14 or not cnpj.isdigit():
+            problemas.append(f"CNPJ inválido para {ticker}: {cnpj!r}")
+
+    if problemas:
+        raise ValueError("Cadastro de empresas inválido: " + '; '.join(problemas))
+
+def compilar_registro(cadastro):
+    """Valida o cadastro e devolve o índice serializável (CNPJ como inteiro)"""
+
+    validar_cadastro(cadastro)
+
+    return {
+        'versao': versao_cadastro(cadastro),
+        'empresas': [[ticker, int(cnpj), nome] for ticker, cnpj, nome in sorted(cadastro)],
+    }
+
+
+class RegistroEmpresas:
+    """Índice imutável ticker ↔ CNPJ (int) ↔ razão social"""
+
+    def __init__(self, empresas, versao):
+        self.versao = versao
+        self.por_ticker = MappingProxyType({ticker: (cnpj, nome) for ticker, cnpj, nome in empresas})
+        self.por_cnpj = MappingProxyType({cnpj: ticker for ticker, cnpj, _ in empresas})
+        self.cnpjs = frozenset(self.por_cnpj)
+
+    def __len__(self):
+        return len(self.por_ticker)
+
+    def __contains__(self, ticker):
+        return ticker in self.por_ticker
+
+    def ticker(self, cnpj):
+        """Ticker pelo CNPJ (inteiro ou texto com/sem pontuação); None se não monitorado"""
+
+        if isinstance(cnpj, str):
+            digitos = ''.join(c for c in cnpj if c.isdigit())
+            if not digitos:
+                return None
+            cnpj = int(digitos)
+
+        return self.por_cnpj.get(cnpj)
+
+    def cnpj(self, ticker):
+        """CNPJ inteiro do ticker (None se não cadastrado)"""
+        empresa = self.por_ticker.get(ticker)
+        return empresa[0] if empresa else None
+
+    def cnpj_texto(self, ticker):
+        """CNPJ com 14 dígitos, como aparece nos arquivos da CVM sem pontuação"""
+        cnpj = self.cnpj(ticker)
+        return f'{cnpj:014d}' if cnpj is not None else None
+
+    def nome(self, ticker):
+        """Razão social do ticker (None se não cadastrado)"""
+        empresa = self.por_ticker.get(ticker)
+        return empresa[1] if empresa else None
+
+    def tickers(self):
+        return sorted(self.por_ticker)
+
+    def mapeamento_cnpj_ticker(self):
+        """CNPJ em texto (14 dígitos) → ticker"""
+        return {f'{cnpj:014d}': ticker for cnpj, ticker in self.por_cnpj.items()}
+
+
+def _ler_cache(caminho, versao):
+    """Índice em cache se for da versão atual do cadastro; senão None"""
+    try:
+        with open(caminho, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    return dados if dados.get('versao') == versao else None
+
+def _salvar_cache(caminho, dados):
+    """Grava o índice de forma atômica; sem permissão de escrita segue sem cache"""
+    try:
+        temporario = f'{caminho}.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(dados, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+    except OSError as e:
+        print(f"⚠️  Não foi possível gravar o cache do registro de empresas: {e}")
+
+def carregar_registro(cadastro=CADASTRO_B3, caminho_cache=ARQUIVO_CACHE_REGISTRO):
+    """Registro a partir do cache local; recompila (e valida) quando o cadastro mudou"""
+
+    versao = versao_cadastro(cadastro)
+    dados = _ler_cache(caminho_cache, versao) if caminho_cache else None
+
+    if dados is None:
+        dados = compilar_registro(cadastro)
+        if caminho_cache:
+            _salvar_cache(caminho_cache, dados)
+
+    return RegistroEmpresas(dados['empresas'], versao)
+
+def obter_registro():
+    """Registro de empresas do processo (carregado uma vez)"""
+
+    global _registro
+
+    if _registro is None:
+        _registro = carregar_registro()
+
+    return _registro
@@ -0,0 +1,127 @@
+"""
+Schema da tabela long de balanços
+Um único schema para ingestão, Parquet e carga no dashboard: textos repetitivos
+como dicionário/categoria, ano e trimestre em inteiros pequenos
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+# Tipo de período de cada valor (coluna Periodo)
+PERIODO_TRIMESTRE = 'TRIMESTRE'   # só o trimestre (DT_INI_EXERC no início do trimestre)
+PERIODO_ACUMULADO = 'ACUMULADO'   # acumulado no ano (DT_INI_EXERC em janeiro, após o 1º trimestre)
+PERIODO_SALDO = 'SALDO'           # posição na data (balanço patrimonial, sem DT_INI_EXERC)
+
+# Demonstrações de posição: linhas gravadas antes da coluna Periodo recebem SALDO
+TIPOS_SALDO = ('BPA', 'BPP')
+
+# Posição da conta na árvore do CD_CONTA (ver hierarquia_contas)
+COLUNAS_HIERARQUIA = ('Chave_Conta', 'Nivel_Conta')
+
+# Tipos de armazenamento (Arrow/Parquet)
+TIPOS_ARROW = {
+    'Ticker': pa.dictionary(pa.int32(), pa.string()),
+    'Conta': pa.dictionary(pa.int32(), pa.string()),
+    'Ano': pa.int16(),
+    'Trimestre': pa.int8(),
+    'Valor': pa.float64(),
+    'Tipo': pa.dictionary(pa.int32(), pa.string()),
+    'Periodo': pa.dictionary(pa.int32(), pa.string()),
+    'Chave_Conta': pa.int64(),
+    'Nivel_Conta': pa.int8(),
+}
+
+# Equivalentes em memória no pandas
+TIPOS_PANDAS = {
+    'Ticker': 'category',
+    'Conta': 'category',
+    'Ano': 'int16',
+    'Trimestre': 'int8',
+    'Valor': 'float64',
+    'Tipo': 'category',
+    'Periodo': 'category',
+    'Chave_Conta': 'Int64',
+    'Nivel_Conta': 'Int8',
+}
+
+
+def aplicar_schema_arrow(tabela):
+    """
+    Converte as colunas presentes para o schema de armazenamento e unifica os
+    dicionários (tabelas concatenadas de origens diferentes)
+    """
+
+    if 'Tipo' in tabela.column_names and 'Periodo' not in tabela.column_names:
+        tabela = tabela.append_column('Periodo', pa.array(_periodo_legado(tabela['Tipo'].to_pandas()), pa.string()))
+
+    # Linhas gravadas antes do CD_CONTA ser mantido: conta sem posição na hierarquia
+    if 'Tipo' in tabela.column_names:
+        for coluna in COLUNAS_HIERARQUIA:
+            if coluna not in tabela.column_names:
+                tabela = tabela.append_column(coluna, pa.nulls(tabela.num_rows, TIPOS_ARROW[coluna]))
+
+    for posicao, campo in enumerate(tabela.schema):
+        tipo = TIPOS_ARROW.get(campo.name)
+        if tipo is not None and campo.type != tipo:
+            coluna = tabela.column(posicao)
+            if pa.types.is_dictionary(campo.type):
+                # Dicionário com outro tipo de índice/valor: passar pelo texto
+                coluna = coluna.cast(campo.type.value_type)
+            tabela = tabela.set_column(posicao, campo.name, coluna.cast(tipo))
+
+    # Sem metadados do pandas: o Parquet publicado é o mesmo com qualquer --engine
+    return tabela.unify_dictionaries().replace_schema_metadata(None)
+
+def aplicar_schema_pandas(df):
+    """Versão pandas: categorias para textos repetitivos e inteiros pequenos"""
+
+    if 'Tipo' in df.columns and 'Periodo' not in df.columns:
+        df = df.assign(Periodo=_periodo_legado(df['Tipo']))
+
+    if 'Tipo' in df.columns:
+        faltando = [c for c in COLUNAS_HIERARQUIA if c not in df.columns]
+        if faltando:
+            df = df.assign(**{c: pd.NA for c in faltando})
+
+    tipos = {
+        coluna: tipo for coluna, tipo in TIPOS_PANDAS.items()
+        if coluna in df.columns and str(df[coluna].dtype) != tipo
+    }
+
+    return df.astype(tipos) if tipos else df
+
+def tabela_para_pandas(tabela):
+    """
+    Tabela Arrow → DataFrame no schema de TIPOS_PANDAS. Inteiros viram
+    nulláveis direto na conversão (sem passar por float, que perderia
+    precisão em Chave_Conta com nulos)
+    """
+    nulaveis = {pa.int64(): pd.Int64Dtype(), pa.int8(): pd.Int8Dtype()}
+    return aplicar_schema_pandas(tabela.to_pandas(types_mapper=nulaveis.get))
+
+def _periodo_legado(tipos):
+    """
+    Periodo de linhas gravadas antes da coluna existir: SALDO para balanço,
+    TRIMESTRE para as demais (o --backfill regrava com o período real)
+    """
+    saldo = pd.Series(tipos).astype(str).isin(TIPOS_SALDO).to_numpy()
+    return np.where(saldo, PERIODO_SALDO, PERIODO_TRIMESTRE)
+
+def remover_categorias_sem_uso(df):
+    """Após filtrar (ex.: um ticker), descarta categorias que ficaram sem linhas"""
+
+    for coluna in df.columns:
+        if isinstance(df[coluna].dtype, pd.CategoricalDtype):
+            df[coluna] = df[coluna].cat.remove_unused_categories()
+
+    return df
+
+def colunas_texto(tabela):
+    """Cópia com colunas dicionário decodificadas (para ordenar, que não aceita dicionário)"""
+
+    for posicao, campo in enumerate(tabela.schema):
+        if pa.types.is_dictionary(campo.type):
+            tabela = tabela.set_column(posicao, campo.name, tabela.column(posicao).cast(campo.type.value_type))
+
+    return tabela
@@ -0,0 +1,66 @@
+# scripts/test_catalogo_balancos.py
+"""
+Teste do catálogo incremental: contas do último trimestre quando o lote
+traz só parte das demonstrações de um trimestre já publicado
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.catalogo_balancos import gerar_catalogo
+from scripts.schema_balancos import aplicar_schema_arrow, aplicar_schema_pandas
+
+COLUNAS = ['Ticker', 'Tipo', 'Chave_Conta', 'Conta', 'Ano', 'Trimestre', 'Valor']
+
+
+def _linhas(ticker, tipo, ano, trimestre, contas):
+    return [(ticker, tipo, chave, conta, ano, trimestre, 1.0) for chave, conta in contas]
+
+BPA = [(100000000000000, 'Ativo Total'), (101000000000000, 'Ativo Circulante'), (102000000000000, 'Ativo Não Circulante')]
+DRE = [(301000000000000, 'Receita Líquida'), (9900000000000001, 'Lucro Líquido')]
+
+def _publicados():
+    linhas = (
+        _linhas('WEGE3', 'BPA', 2024, 1, BPA) + _linhas('WEGE3', 'BPA', 2024, 2, BPA)
+        + _linhas('WEGE3', 'DRE', 2024, 2, DRE[:1]) + _linhas('PETR4', 'BPA', 2024, 1, BPA)
+    )
+    return aplicar_schema_arrow(pa.table(pd.DataFrame(linhas, columns=COLUNAS)))
+
+def test_contas_do_trimestre_mesclado():
+    publicados = _publicados()
+    anterior = gerar_catalogo(publicados)
+    assert anterior['empresas']['WEGE3']['contas'] == 4
+
+    # Lote: DRE do 2T24 da WEGE3 (reapresenta uma conta) e o 2T24 da PETR4 (trimestre novo)
+    lote = aplicar_schema_pandas(pd.DataFrame(
+        _linhas('WEGE3', 'DRE', 2024, 2, DRE) + _linhas('PETR4', 'DRE', 2024, 2, DRE[:1]), columns=COLUNAS
+    ))
+
+    anos_lidos = []
+    def ler_publicados(anos):
+        anos_lidos.append(anos)
+        return publicados
+
+    catalogo = gerar_catalogo(lote, anterior, ler_publicados=ler_publicados)
+
+    # BPA publicado (3) + DRE publicada e reapresentada (2 distintas)
+    assert catalogo['empresas']['WEGE3']['contas'] == 5
+    assert catalogo['empresas']['WEGE3']['trimestres'] == 2
+    # Trimestre novo: só o lote conta
+    assert catalogo['empresas']['PETR4']['contas'] == 1
+    assert anos_lidos == [[2024]]
+
+    # Sem leitura dos publicados, as contas vêm só do lote
+    assert gerar_catalogo(lote, anterior)['empresas']['WEGE3']['contas'] == 2
+
+
+if __name__ == "__main__":
+    for nome, teste in list(globals().items()):
+        if nome.startswith('test_'):
+            teste()
+            print(f"✅ {nome}")
@@ -3,7 +3,13 @@
 Teste das funções de carregamento de dados
 """
 
-from data_loader import testar_conexao
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Nome com _ para o pytest não coletar o teste de conexão (usa o armazenamento real)
+from scripts.data_loader import testar_conexao as _testar_conexao
 
 if __name__ == "__main__":
-    testar_conexao()
+    sys.exit(0 if _testar_conexao() else 1)
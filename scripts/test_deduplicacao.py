@@ -0,0 +1,63 @@
+# scripts/test_deduplicacao.py
+"""
+Teste da deduplicação por versão: pandas e Arrow ficam com a mesma linha
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.ingestao_arrow import deduplicar_por_versao_arrow
+from scripts.schema_balancos import aplicar_schema_arrow, aplicar_schema_pandas
+from scripts.update_from_cvm import deduplicar_por_versao
+
+CHAVES = ['Ticker', 'Chave_Conta', 'Conta', 'Ano', 'Trimestre', 'Periodo']
+
+
+def _linha(trimestre, referencia, versao, corrente, valor):
+    return {
+        'Ticker': 'WEGE3', 'Conta': 'Receita Líquida', 'Chave_Conta': 301000000000000, 'Nivel_Conta': 2,
+        'Ano': 2024, 'Trimestre': trimestre, 'Valor': valor, 'Periodo': 'TRIMESTRE',
+        'DT_REFER': pd.Timestamp(referencia), 'VERSAO': versao, 'Corrente': corrente,
+    }
+
+def _dados():
+    # Fora de ordem de propósito: o resultado não pode depender da ordem do arquivo
+    return pd.DataFrame([
+        # 1T24: duas versões da mesma entrega e o comparativo (PENÚLTIMO) da entrega de 2025
+        _linha(1, '2025-03-31', 1, False, 120.0),
+        _linha(1, '2024-03-31', 2, True, 110.0),
+        _linha(1, '2024-03-31', 1, True, 100.0),
+        # 2T24: PENÚLTIMO colide com ÚLTIMO na mesma entrega e versão
+        _linha(2, '2024-06-30', 2, False, 999.0),
+        _linha(2, '2024-06-30', 2, True, 200.0),
+        # 3T24: versão mais nova da mesma entrega, sem data de referência na antiga
+        _linha(3, '2024-09-30', 3, True, 330.0),
+        _linha(3, None, 1, True, 300.0),
+    ])
+
+def _por_trimestre(df):
+    return df.sort_values('Trimestre').set_index('Trimestre')['Valor'].to_dict()
+
+def test_motores_mesma_linha():
+    via_pandas = deduplicar_por_versao(aplicar_schema_pandas(_dados()), CHAVES)
+    via_arrow = deduplicar_por_versao_arrow(
+        aplicar_schema_arrow(pa.Table.from_pandas(_dados(), preserve_index=False)), CHAVES
+    ).to_pandas()
+
+    esperado = {1: 120.0, 2: 200.0, 3: 330.0}
+    assert _por_trimestre(via_pandas) == esperado
+    assert _por_trimestre(via_arrow) == esperado
+    for df in (via_pandas, via_arrow):
+        assert not {'DT_REFER', 'VERSAO', 'Corrente'} & set(df.columns)
+
+
+if __name__ == "__main__":
+    for nome, teste in list(globals().items()):
+        if nome.startswith('test_'):
+            teste()
+            print(f"✅ {nome}")
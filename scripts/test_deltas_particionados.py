@@ -0,0 +1,80 @@
+# scripts/test_deltas_particionados.py
+"""
+Teste de deltas e compactação no layout particionado, com o armazenamento local
+"""
+
+import os
+import sys
+import tempfile
+
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.armazenamento import ArmazenamentoLocal
+from scripts.dataset_balancos import (
+    LAYOUT_PARTICIONADO,
+    SnapshotDataset,
+    compactar_deltas,
+    publicar_particionado,
+)
+from scripts.schema_balancos import aplicar_schema_arrow
+from scripts.update_from_cvm import registrar_versao
+
+OPCOES_PARQUET = {'compression': 'zstd', 'compression_level': None}
+
+
+def _tabela(linhas):
+    colunas = ['Ticker', 'Conta', 'Chave_Conta', 'Nivel_Conta', 'Ano', 'Trimestre', 'Valor', 'Tipo', 'Periodo']
+    return aplicar_schema_arrow(pa.table({c: [linha[i] for linha in linhas] for i, c in enumerate(colunas)}))
+
+def _receita(ticker, trimestre, valor):
+    return (ticker, 'Receita Líquida', 301000000000000, 2, 2024, trimestre, valor, 'DRE', 'TRIMESTRE')
+
+def _publicar(armazenamento, diretorio, timestamp, tabela=None):
+    """Publica os dados (ou compacta, sem tabela) e troca a versão ativa"""
+
+    snapshot = SnapshotDataset(armazenamento, diretorio)
+    if tabela is None:
+        caminho, manifesto = compactar_deltas(armazenamento, snapshot, timestamp, OPCOES_PARQUET)
+    else:
+        caminho, manifesto = publicar_particionado(armazenamento, tabela, snapshot, timestamp, opcoes_parquet=OPCOES_PARQUET)
+
+    registrar_versao(
+        armazenamento, caminho, caminho, LAYOUT_PARTICIONADO, manifesto['registros_total'], OPCOES_PARQUET, manifesto
+    )
+    return manifesto
+
+def test_ultimo_delta_vence_na_compactacao():
+    with tempfile.TemporaryDirectory() as diretorio:
+        armazenamento = ArmazenamentoLocal(os.path.join(diretorio, 'armazenamento'))
+        cache = os.path.join(diretorio, 'cache')
+
+        base = _publicar(armazenamento, cache, '20240101_000000', _tabela([_receita('WEGE3', 1, 100.0), _receita('PETR4', 1, 500.0)]))
+        assert not base['deltas']
+
+        # Dois deltas reapresentam a mesma chave; o segundo também traz um trimestre novo
+        _publicar(armazenamento, cache, '20240201_000000', _tabela([_receita('WEGE3', 1, 110.0)]))
+        antes = _publicar(armazenamento, cache, '20240301_000000', _tabela([_receita('WEGE3', 1, 120.0), _receita('WEGE3', 2, 130.0)]))
+        assert len(antes['deltas']) == 2
+        assert armazenamento.registro_ativo()['deltas_pendentes'] == 2
+
+        depois = _publicar(armazenamento, cache, '20240401_000000')
+
+        assert depois['deltas'] == []
+        assert armazenamento.registro_ativo()['deltas_pendentes'] == 0
+        assert depois['registros_total'] == depois['registros_base'] == 3
+        assert depois['tickers']['WEGE3'] == {'ultimo_ano': 2024, 'ultimo_trimestre': 2, 'registros': 2}
+        assert depois['tickers']['PETR4'] == {'ultimo_ano': 2024, 'ultimo_trimestre': 1, 'registros': 1}
+        assert depois['tickers'] == depois['tickers_base']
+
+        tabela = SnapshotDataset(armazenamento, cache).tabela().to_pandas()
+        valores = tabela.set_index(['Ticker', 'Trimestre'])['Valor'].to_dict()
+        assert valores == {('WEGE3', 1): 120.0, ('WEGE3', 2): 130.0, ('PETR4', 1): 500.0}
+
+
+if __name__ == "__main__":
+    for nome, teste in list(globals().items()):
+        if nome.startswith('test_'):
+            teste()
+            print(f"✅ {nome}")
@@ -0,0 +1,151 @@
+# scripts/test_download_cvm.py
+"""
+Teste da retomada de downloads (HTTP Range) e do cache com GET condicional,
+com uma sessão falsa, sem rede
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts import download_cvm
+from scripts.download_cvm import arquivo_ja_processado, baixar_arquivo, baixar_com_cache, marcar_processado
+
+CONTEUDO = b'0123456789'
+URL = 'https://dados.cvm.gov.br/itr_cia_aberta_2024.zip'
+
+
+class RespostaFalsa:
+    def __init__(self, status_code, conteudo=b'', headers=None):
+        self.status_code = status_code
+        self.conteudo = conteudo
+        self.headers = dict(headers or {}, **{'Content-Length': str(len(conteudo))})
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def iter_content(self, chunk_size=None):
+        yield self.conteudo
+
+
+class SessaoFalsa:
+    """Devolve as respostas na ordem e guarda os headers de cada requisição"""
+
+    def __init__(self, *respostas):
+        self.respostas = list(respostas)
+        self.pedidos = []
+
+    def get(self, url, headers=None, timeout=None, stream=False):
+        self.pedidos.append(dict(headers or {}))
+        return self.respostas.pop(0)
+
+
+def _baixar(sessao, parcial=None):
+    """Baixa com a sessão falsa, partindo de um .part com 'parcial' se indicado"""
+
+    with tempfile.TemporaryDirectory() as diretorio:
+        destino = os.path.join(diretorio, 'arquivo.zip')
+        if parcial is not None:
+            with open(destino + '.part', 'wb') as f:
+                f.write(parcial)
+
+        caminho = baixar_arquivo(URL, destino, tentativas=3, sessao=sessao)
+
+        assert not os.path.exists(destino + '.part')
+        with open(caminho, 'rb') as f:
+            return f.read()
+
+def test_retomada():
+    sessao = SessaoFalsa(RespostaFalsa(206, CONTEUDO[4:], {'Content-Range': 'bytes 4-9/10'}))
+
+    assert _baixar(sessao, CONTEUDO[:4]) == CONTEUDO
+    assert sessao.pedidos[0]['Range'] == 'bytes=4-'
+
+def test_content_range_diferente_do_parcial():
+    # 206 começando em outro byte: descarta o parcial e baixa tudo de novo, sem Range
+    sessao = SessaoFalsa(
+        RespostaFalsa(206, CONTEUDO, {'Content-Range': 'bytes 0-9/10'}),
+        RespostaFalsa(200, CONTEUDO),
+    )
+
+    assert _baixar(sessao, CONTEUDO[:4]) == CONTEUDO
+    assert 'Range' not in sessao.pedidos[1]
+
+def test_range_ignorado():
+    # 200 em resposta a um Range: arquivo inteiro, sem concatenar com o parcial
+    sessao = SessaoFalsa(RespostaFalsa(200, CONTEUDO))
+
+    assert _baixar(sessao, b'xyz') == CONTEUDO
+    assert sessao.pedidos[0]['Range'] == 'bytes=3-'
+
+def test_range_fora_do_arquivo():
+    # 416 com o tamanho do parcial: já estava completo
+    sessao = SessaoFalsa(RespostaFalsa(416, headers={'Content-Range': 'bytes */10'}))
+    assert _baixar(sessao, CONTEUDO) == CONTEUDO
+
+    # 416 com outro tamanho: o arquivo mudou, recomeça do zero
+    sessao = SessaoFalsa(
+        RespostaFalsa(416, headers={'Content-Range': 'bytes */10'}),
+        RespostaFalsa(200, CONTEUDO),
+    )
+    assert _baixar(sessao, b'0123456789abc') == CONTEUDO
+    assert 'Range' not in sessao.pedidos[1]
+
+@contextmanager
+def _cache_temporario():
+    """Cache de downloads em um diretório temporário durante o teste"""
+
+    original = download_cvm.DIRETORIO_CACHE
+    with tempfile.TemporaryDirectory() as diretorio:
+        download_cvm.DIRETORIO_CACHE = diretorio
+        try:
+            yield
+        finally:
+            download_cvm.DIRETORIO_CACHE = original
+
+def _ler(caminho):
+    with open(caminho, 'rb') as f:
+        return f.read()
+
+def test_cache_304():
+    with _cache_temporario():
+        baixar_com_cache(URL, sessao=SessaoFalsa(RespostaFalsa(200, CONTEUDO, {'ETag': '"v1"'})))
+        marcar_processado(URL)
+
+        sessao = SessaoFalsa(RespostaFalsa(304))
+        caminho, modificado = baixar_com_cache(URL, sessao=sessao)
+
+        assert sessao.pedidos[0]['If-None-Match'] == '"v1"'
+        assert not modificado and _ler(caminho) == CONTEUDO
+        # main() pula o arquivo: não mudou e já passou por um pipeline concluído
+        assert arquivo_ja_processado(URL)
+
+def test_cache_200_troca_validadores():
+    with _cache_temporario():
+        baixar_com_cache(URL, sessao=SessaoFalsa(RespostaFalsa(200, CONTEUDO, {'ETag': '"v1"'})))
+        marcar_processado(URL)
+
+        novo = CONTEUDO * 2
+        caminho, modificado = baixar_com_cache(URL, sessao=SessaoFalsa(RespostaFalsa(200, novo, {'ETag': '"v2"'})))
+
+        assert modificado and _ler(caminho) == novo
+        assert download_cvm._ler_json(download_cvm._caminhos_cache(URL)[1])['etag'] == '"v2"'
+        assert not arquivo_ja_processado(URL)
+
+        # Próxima execução pergunta pela versão nova
+        sessao = SessaoFalsa(RespostaFalsa(304))
+        baixar_com_cache(URL, sessao=sessao)
+        assert sessao.pedidos[0]['If-None-Match'] == '"v2"'
+
+
+if __name__ == "__main__":
+    for nome, teste in list(globals().items()):
+        if nome.startswith('test_'):
+            teste()
+            print(f"✅ {nome}")
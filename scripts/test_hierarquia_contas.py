@@ -0,0 +1,74 @@
+# scripts/test_hierarquia_contas.py
+"""
+Teste da codificação da hierarquia de contas (CD_CONTA → chave inteira)
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.hierarquia_contas import (
+    codificar_conta,
+    decodificar_conta,
+    intervalo_descendentes,
+    codificar_contas_arrow,
+    codificar_contas_pandas,
+    mascara_descendentes,
+)
+
+CODIGOS = ['1', '1.01', '1.01.01', '1.01.02', '1.01.02.01', '1.02', '2', '2.01', '3.01', '6.01.01.01.01.01.01.99']
+
+
+def test_ida_e_volta():
+    for codigo in CODIGOS:
+        chave, nivel = codificar_conta(codigo)
+        assert nivel == codigo.count('.') + 1
+        assert decodificar_conta(chave, nivel) == codigo
+
+def test_ordem_da_arvore():
+    chaves = [codificar_conta(c)[0] for c in CODIGOS]
+    assert chaves == sorted(chaves)
+
+def test_codigos_invalidos():
+    for codigo in ['1.001', '1.1', '1.01.1', '1.100', '', 'a.01', '1..01', '1.01.01.01.01.01.01.01.01', None]:
+        assert codificar_conta(codigo) == (None, None), codigo
+
+    assert codificar_conta('1.001')[0] != codificar_conta('1.01')[0]
+
+def test_intervalo_descendentes():
+    inicio, fim = intervalo_descendentes(*codificar_conta('1.01'))
+    dentro = ['1.01', '1.01.01', '1.01.02', '1.01.02.01', '1.01.99.99']
+    fora = ['1', '1.02', '1.00.99', '2.01']
+
+    assert all(inicio <= codificar_conta(c)[0] < fim for c in dentro)
+    assert not any(inicio <= codificar_conta(c)[0] < fim for c in fora)
+
+def test_mascara_descendentes():
+    chaves = pa.array([codificar_conta(c)[0] for c in CODIGOS] + [None], pa.int64())
+
+    filhos = mascara_descendentes(chaves, '1.01').to_pylist()
+    assert [c for c, sim in zip(CODIGOS, filhos) if sim] == ['1.01', '1.01.01', '1.01.02', '1.01.02.01']
+    assert filhos[-1] is False
+
+    sem_conta = mascara_descendentes(chaves, '1.01', incluir_conta=False).to_pylist()
+    assert [c for c, sim in zip(CODIGOS, sem_conta) if sim] == ['1.01.01', '1.01.02', '1.01.02.01']
+
+def test_motores_iguais():
+    codigos = CODIGOS + ['1.001', None]
+
+    chaves_arrow, niveis_arrow = codificar_contas_arrow(pa.array(codigos))
+    chaves_pandas, niveis_pandas = codificar_contas_pandas(pd.Series(codigos))
+
+    assert chaves_arrow.to_pylist() == [None if pd.isna(v) else int(v) for v in chaves_pandas]
+    assert niveis_arrow.to_pylist() == [None if pd.isna(v) else int(v) for v in niveis_pandas]
+
+
+if __name__ == "__main__":
+    for nome, teste in list(globals().items()):
+        if nome.startswith('test_'):
+            teste()
+            print(f"✅ {nome}")
@@ -0,0 +1,81 @@
+# scripts/test_processador_dados.py
+"""
+Teste da anualização de trimestres com linhas de períodos diferentes e da
+formatação de valores em reais
+"""
+
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.processador_dados import anualizar_trimestres, formatar_valor_brasileiro, formatar_valores_brasileiros
+
+
+def _linha(conta, trimestre, periodo, valor):
+    return {'Ticker': 'WEGE3', 'Conta': conta, 'Ano': 2024, 'Trimestre': trimestre, 'Periodo': periodo, 'Valor': valor}
+
+def test_periodos_misturados():
+    # ITR: trimestre isolado e acumulado no ano para o mesmo trimestre; balanço como saldo
+    df = pd.DataFrame([
+        _linha('Receita Líquida', 1, 'TRIMESTRE', 100.0),
+        _linha('Receita Líquida', 2, 'TRIMESTRE', 110.0),
+        _linha('Receita Líquida', 2, 'ACUMULADO', 210.0),
+        _linha('Receita Líquida', 3, 'TRIMESTRE', 120.0),
+        _linha('Receita Líquida', 3, 'ACUMULADO', 330.0),
+        _linha('Ativo Total', 1, 'SALDO', 1000.0),
+        _linha('Ativo Total', 3, 'SALDO', 1300.0),
+    ])
+
+    anual = anualizar_trimestres(df).set_index('Conta')
+
+    assert len(anual) == 2
+    assert anual.loc['Receita Líquida', 'Valor'] == 330.0
+    assert anual.loc['Ativo Total', 'Valor'] == 1300.0
+    assert (anual['Trimestre'] == 'Anual').all()
+
+def test_sem_coluna_periodo():
+    df = pd.DataFrame([
+        _linha('Receita Líquida', 1, None, 100.0),
+        _linha('Receita Líquida', 2, None, 110.0),
+    ]).drop(columns=['Periodo'])
+
+    anual = anualizar_trimestres(df)
+
+    assert anual['Valor'].tolist() == [210.0]
+
+def test_so_acumulado():
+    df = pd.DataFrame([_linha('Receita Líquida', 2, 'ACUMULADO', 210.0)])
+
+    assert anualizar_trimestres(df).empty
+
+def test_escala_auto_no_limite():
+    # A escala vem do valor arredondado: sem "1.000,0" na escala de baixo
+    valores = [999_950, 999.96e6, 999.6, 999.4, 999_949, -999_960]
+    esperados = ['R$ 1,0 mi', 'R$ 1,0 bi', 'R$ 1,0 mil', 'R$ 999', 'R$ 999,9 mil', '-R$ 1,0 mi']
+
+    assert formatar_valores_brasileiros(valores, escala='auto').tolist() == esperados
+
+def test_negativo_arredondado_para_zero():
+    # Nunca "-R$ 0,0": negativo que arredonda para zero vira "R$ 0"
+    assert formatar_valores_brasileiros([-0.04], escala='auto').tolist() == ['R$ 0']
+    assert formatar_valores_brasileiros([-40_000], escala='mi').tolist() == ['R$ 0']
+    assert formatar_valores_brasileiros([-0.4]).tolist() == ['R$ 0']
+    assert formatar_valores_brasileiros([-0.6]).tolist() == ['-R$ 1']
+
+def test_nulos():
+    assert formatar_valores_brasileiros([None, float('nan')], valor_nulo='-').tolist() == ['-', '-']
+
+def test_escalar_igual_a_coluna():
+    valores = [2483044000, -15300, 0, None, 999.6, -0.4, 1_000_000, 532.46]
+
+    assert [formatar_valor_brasileiro(v) for v in valores] == formatar_valores_brasileiros(valores).tolist()
+
+
+if __name__ == "__main__":
+    for nome, teste in list(globals().items()):
+        if nome.startswith('test_'):
+            teste()
+            print(f"✅ {nome}")
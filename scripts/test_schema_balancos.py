@@ -0,0 +1,50 @@
+# scripts/test_schema_balancos.py
+"""
+Teste do schema único: mesmo resultado com dados vindos do pandas ou do Arrow
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pyarrow as pa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.schema_balancos import aplicar_schema_arrow, aplicar_schema_pandas, tabela_para_pandas, TIPOS_PANDAS
+
+
+def _dados():
+    return {
+        'Ticker': ['PETR4', 'PETR4', 'VALE3'],
+        'Conta': ['Ativo Total', 'Receita', 'Ativo Total'],
+        'Chave_Conta': [100000000000000, None, 9900000000000001],
+        'Nivel_Conta': [1, None, 8],
+        'Ano': [2024, 2024, 2024],
+        'Trimestre': [1, 1, 2],
+        'Valor': [1.0, 2.0, 3.0],
+        'Tipo': ['BPA', 'DRE', 'BPA'],
+        'Periodo': ['SALDO', 'TRIMESTRE', 'SALDO'],
+    }
+
+def test_motores_mesmo_schema():
+    via_pandas = aplicar_schema_arrow(pa.Table.from_pandas(aplicar_schema_pandas(pd.DataFrame(_dados())), preserve_index=False))
+    via_arrow = aplicar_schema_arrow(pa.table(_dados()))
+
+    assert via_pandas.schema.equals(via_arrow.schema, check_metadata=True)
+    assert via_pandas.schema.metadata is None
+
+def test_tabela_para_pandas():
+    df = tabela_para_pandas(aplicar_schema_arrow(pa.table(_dados())))
+
+    assert {c: str(t) for c, t in df.dtypes.items()} == TIPOS_PANDAS
+    # Chave acima de 2**53 com nulos na coluna: sem perda de precisão
+    assert df['Chave_Conta'].iloc[2] == 9900000000000001
+    assert df['Chave_Conta'].isna().tolist() == [False, True, False]
+
+
+if __name__ == "__main__":
+    for nome, teste in list(globals().items()):
+        if nome.startswith('test_'):
+            teste()
+            print(f"✅ {nome}")
@@ -3,112 +3,196 @@ Script para atualizar dados da CVM automaticamente
 Baixa ITRs mais recentes, filtra por CNPJ, processa e atualiza no Supabase
 """
 
-import requests
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
 import zipfile
-from io import BytesIO, StringIO
+from io import StringIO
 from datetime import datetime
 import sys
 import os
+import re
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Lista fixa de CNPJs das 133 empresas (para não depender do Supabase)
-CNPJS_MONITORADOS = {
-    '50746577000115': 'CSAN3', '33000167000101': 'PETR4', '10629105000168': 'PRIO3',
-    '33256439000139': 'UGPA3', '34274233000102': 'VBBR3', '08902291000115': 'CMIN3',
-    '33592510000154': 'VALE3', '15141799000103': 'FESA4', '33611500000119': 'GGBR4',
-    '92690783000109': 'GOAU4', '60894730000105': 'USIM5', '33042730000104': 'CSNA3',
-    '42150391000170': 'BRKM5', '33958695000178': 'UNIP6', '97837181000147': 'DXCO3',
-    '56643018000166': 'EUCA4', '89637490000145': 'KLBN3', '16404287000155': 'SUZB3',
-    '92791243000103': 'RANI3', '61092037000181': 'ETER3', '83475913000191': 'PTBL3',
-    '07689002000189': 'EMBR3', '88610126000129': 'FRAS3', '88611835000129': 'POMO4',
-    '89086144000116': 'RAPT4', '84683374000149': 'TUPY3', '84693183000168': 'SHUL4',
-    '84429695000111': 'WEGE3', '91983056000169': 'KEPL3', '27093558000115': 'MILS3',
-    '56720428000163': 'ROMI3', '09305994000129': 'AZUL4', '06164253000187': 'GOLL4',
-    '02387241000160': 'RAIL3', '42278291000124': 'LOGN3', '52548435000179': 'JSLG3',
-    '02351144000118': 'TGMA3', '04149454000180': 'ECOR3', '02762121000104': 'STBP3',
-    '33130691000105': 'PORT3', '01599101000193': 'SEQL3', '33113309000147': 'VLID3',
-    '42331462000131': 'EPAR3', '10807374000177': 'SOJA3', '89096457000155': 'SLCE3',
-    '01838723000127': 'BRFS3', '03853896000140': 'MRFG3', '67620377000114': 'BEEF3',
-    '07206816000115': 'MDIA3', '07526557000100': 'ABEV3', '32785497000197': 'NATU3',
-    '24990777000109': 'GMAT3', '47508411000156': 'PCAR3', '08797760000183': 'CURY3',
-    '73178600000118': 'CYRE3', '16614075000100': 'DIRR3', '43470988000165': 'EVEN3',
-    '08312229000173': 'EZTC3', '01545826000107': 'GFSA3', '49263189000102': 'HBOR3',
-    '08294224000165': 'JHSF3', '24230275000180': 'PLPL3', '71476527000135': 'TEND3',
-    '59418806000147': 'TFCO4', '61079117000105': 'ALPA4', '89850341000160': 'GRND3',
-    '50926955000142': 'VULC3', '33839910000111': 'VIVA3', '61156113000175': 'MYPK3',
-    '60476884000187': 'LEVE3', '10760260000119': 'CVCB3', '09288252000132': 'ANIM3',
-    '02800026000140': 'COGN3', '04986320000113': 'SEER3', '08807432000110': 'YDUQ3',
-    '16670085000155': 'RENT3', '21314559000166': 'MOVI3', '23373000000132': 'VAMO3',
-    '16590234000176': 'AZZA3', '45242914000105': 'CEAB3', '08402943000152': 'GUAR3',
-    '61189288000189': 'AMAR3', '92754738000162': 'LREN3', '33041260065290': 'BHIA3',
-    '47960950000121': 'MGLU3', '13217485000111': 'SBFG3', '18328118000109': 'PETZ3',
-    '61486650000183': 'DASA3', '60840055000131': 'FLRY3', '05197443000138': 'HAPV3',
-    '58119199000151': 'ODPV3', '12104241000402': 'ONCO3', '11992680000193': 'QUAL3',
-    '06047087000139': 'RDOR3', '12108897000150': 'DMVF3', '02932074000191': 'HYPE3',
-    '06626253000151': 'PGMN3', '45453214000151': 'PFRM3', '61585865000151': 'RADL3',
-    '82901000000127': 'INTB3', '59717553000102': 'MLAS3', '53113791000122': 'TOTS3',
-    '08170849000115': 'DESK3', '02558157000162': 'VIVT3', '08364948000138': 'ALUP3',
-    '17155730000164': 'CMIG4', '76483817000120': 'CPLE3', '02429144000193': 'CPFE3',
-    '00001180000126': 'ELET3', '00864214000106': 'ENGI3', '04423567000121': 'ENEV3',
-    '02474103000119': 'EGIE3', '03220438000173': 'EQTL3', '01083200000118': 'NEOE3',
-    '07859971000130': 'TAEE3', '12648266000124': 'AMBP3', '17281106000103': 'CSMG3',
-    '59285411000113': 'BPAN4', '92702067000196': 'BRSR6', '60746948000112': 'BBDC4',
-    '00000000000191': 'BBAS3', '30306294000145': 'BPAC3', '60872504000123': 'ITUB4',
-    '90400888000142': 'SANB3', '02149205000169': 'PSSA3', '42278473000103': 'WIZC3',
-    '60543816000193': 'IGTI3', '09041168000110': 'LOGG3', '07816890000153': 'MULT3',
-    '29780061000109': 'SCAR3', '08078847000109': 'LPSB3', '61532644000115': 'ITSA4',
-    '07415333000120': 'SIMH3',
+from scripts.download_cvm import (
+    baixar_com_cache,
+    ler_texto_com_cache,
+    arquivo_ja_processado,
+    marcar_processado,
+)
+from scripts.dataset_balancos import (
+    SnapshotDataset,
+    caminho_manifesto,
+    gerar_manifesto,
+    publicar_particionado,
+    compactar_deltas,
+    precisa_compactar,
+    CHAVES_REGISTRO,
+    MAX_DELTAS_PENDENTES,
+    MAX_BYTES_DELTAS,
+    LAYOUT_PARTICIONADO,
+    LAYOUT_MONOLITICO,
+)
+from scripts.ingestao_arrow import (
+    ler_csv_arrow,
+    transformar_wide_para_long_arrow,
+    filtrar_dados_novos_arrow,
+    adicionar_tipo_arrow,
+    deduplicar_arrow,
+    mesclar_tabelas_arrow,
+    tabela_para_parquet,
+    COMPRESSAO_PARQUET,
+    ORDEM_EXERCICIO_CORRENTE,
+    FORMATO_DATA_CVM,
+)
+from scripts.armazenamento import criar_armazenamento, definir_armazenamento, obter_armazenamento
+from scripts.schema_balancos import (
+    aplicar_schema_arrow,
+    aplicar_schema_pandas,
+    PERIODO_TRIMESTRE,
+    PERIODO_ACUMULADO,
+    PERIODO_SALDO,
+)
+from scripts.hierarquia_contas import codificar_contas_pandas
+from scripts.registro_empresas import obter_registro
+from scripts.catalogo_balancos import carregar_catalogo, gerar_catalogo, publicar_catalogo
+from scripts.metricas_pipeline import MetricasPipeline, medir_etapa, novo_coletor, obter_metricas
+
+BASE_URL_ITR = "https://dados.cvm.gov.br/dados/CIA_ABERTA/DOC/ITR/DADOS/"
+
+# Empresas monitoradas, do registro único (scripts/registro_empresas.py)
+REGISTRO_EMPRESAS = obter_registro()
+CNPJS_MONITORADOS = REGISTRO_EMPRESAS.mapeamento_cnpj_ticker()
+
+# CNPJ inteiro → ticker (como sai de limpar_cnpj), para filtro e junção
+CNPJS_MONITORADOS_NUMERICOS = REGISTRO_EMPRESAS.por_cnpj
+
+# Demonstrações consolidadas processadas de cada ZIP de ITR
+ARQUIVOS_RELEVANTES = {
+    'DRE': 'itr_cia_aberta_DRE_con',
+    'BPA': 'itr_cia_aberta_BPA_con',
+    'BPP': 'itr_cia_aberta_BPP_con',
+    'DFC': 'itr_cia_aberta_DFC_MI_con'
 }
 
+# Colunas do CSV da CVM usadas na transformação (leitura em streaming lê só estas)
+COLUNAS_CSV_CVM = {
+    'CNPJ_CIA': str,
+    'DT_REFER': str,
+    'VERSAO': 'Int64',
+    'ORDEM_EXERC': str,
+    'DT_INI_EXERC': str,
+    'DT_FIM_EXERC': str,
+    'CD_CONTA': str,
+    'DS_CONTA': str,
+    'VL_CONTA': 'float64',
+}
+
+# Linhas por bloco na leitura em streaming (limita o pico de memória)
+TAMANHO_BLOCO_CSV = 200_000
+
+
+def _por_valores_distintos(serie, funcao):
+    """
+    Aplica 'funcao' só aos valores distintos da série (pd.factorize) e devolve
+    o resultado linha a linha pelos códigos; nulos continuam nulos
+    """
+    
+    codigos, distintos = pd.factorize(serie)
+    convertidos = funcao(pd.Series(distintos)).array
+    
+    return pd.Series(pd.api.extensions.take(convertidos, codigos, allow_fill=True), index=serie.index)
+
+def limpar_cnpj(serie):
+    """Remove pontos, barras e traços e devolve o CNPJ como inteiro (Int64), uma vez por CNPJ distinto"""
+    return _por_valores_distintos(
+        serie,
+        lambda distintos: pd.to_numeric(
+            distintos.astype(str).str.replace(r'[^\d]', '', regex=True), errors='coerce'
+        ).astype('Int64')
+    )
+
+def converter_datas(serie, formato=FORMATO_DATA_CVM):
+    """Datas da CVM em datetime com formato explícito, uma vez por data distinta (inválidas viram NaT)"""
+    return _por_valores_distintos(
+        serie, lambda distintos: pd.to_datetime(distintos, format=formato, errors='coerce')
+    )
+
+def ler_csv_cvm(arquivo, leitura='streaming'):
+    """
+    Lê um CSV de demonstração da CVM.
+    - 'completa': lê todas as colunas de todas as empresas (comportamento original)
+    - 'streaming': lê só as colunas necessárias, em blocos, descartando
+      empresas não monitoradas bloco a bloco
+    """
+    
+    if leitura == 'completa':
+        df = pd.read_csv(arquivo, sep=';', encoding='latin1', low_memory=False)
+        print(f"   • Total de registros: {len(df):,}")
+        return df
+    
+    leitor = pd.read_csv(
+        arquivo,
+        sep=';',
+        encoding='latin1',
+        usecols=lambda coluna: coluna in COLUNAS_CSV_CVM,
+        dtype=COLUNAS_CSV_CVM,
+        chunksize=TAMANHO_BLOCO_CSV
+    )
+    
+    blocos = []
+    total_lido = 0
+    
+    for bloco in leitor:
+        total_lido += len(bloco)
+        
+        # Filtrar empresas monitoradas já no bloco: memória acompanha só o subconjunto
+        bloco['CNPJ_CIA'] = limpar_cnpj(bloco['CNPJ_CIA'])
+        bloco = bloco[bloco['CNPJ_CIA'].isin(REGISTRO_EMPRESAS.cnpjs)]
+        
+        if len(bloco) > 0:
+            blocos.append(bloco)
+    
+    print(f"   • Total de registros: {total_lido:,} (mantidos {sum(len(b) for b in blocos):,} das empresas monitoradas)")
+    
+    if not blocos:
+        return pd.DataFrame(columns=list(COLUNAS_CSV_CVM))
+    
+    return pd.concat(blocos, ignore_index=True)
+
+
+def abrir_snapshot(armazenamento=None):
+    """Snapshot da versão ativa do dataset, compartilhado pelas etapas de uma execução"""
+    return SnapshotDataset(armazenamento or obter_armazenamento())
 
-def obter_ultimos_trimestres_por_empresa():
-    """Consulta Supabase para descobrir qual o último trimestre de cada empresa"""
+def obter_ultimos_trimestres_por_empresa(snapshot=None):
+    """
+    Consulta Supabase para descobrir qual o último trimestre de cada empresa.
+    Lê o manifesto publicado ao lado do Parquet (alguns KB); sem manifesto,
+    usa as estatísticas do rodapé do Parquet.
+    """
     
     print("\n" + "="*70)
     print("🔍 DETECTANDO ÚLTIMO TRIMESTRE DE CADA EMPRESA NO SUPABASE")
     print("="*70 + "\n")
     
-    from config.supabase_config import supabase
-    
     try:
-        print("📥 Baixando dados atuais do Supabase...")
-        
-        resultado = supabase.table('balancos_trimestrais') \
-            .select('arquivo_path') \
-            .eq('status', 'ativo') \
-            .order('data_upload', desc=True) \
-            .limit(1) \
-            .execute()
+        if snapshot is None:
+            snapshot = abrir_snapshot()
         
-        if not resultado.data:
+        if not snapshot.registro:
             print("⚠️  Nenhum dado encontrado no Supabase")
             return {}
         
-        arquivo_path = resultado.data[0]['arquivo_path']
-        
-        # Download do Parquet
-        response = supabase.storage.from_('balancos').download(arquivo_path)
-        df_atual = pd.read_parquet(BytesIO(response))
-        
-        print(f"✅ Carregados {len(df_atual):,} registros atuais")
-        
-        # Agrupar por Ticker e encontrar último trimestre
-        ultimos_trimestres = {}
-        
-        for ticker in df_atual['Ticker'].unique():
-            df_ticker = df_atual[df_atual['Ticker'] == ticker]
-            
-            # Encontrar último ano e trimestre
-            ultimo_ano = df_ticker['Ano'].max()
-            df_ultimo_ano = df_ticker[df_ticker['Ano'] == ultimo_ano]
-            ultimo_trimestre = df_ultimo_ano['Trimestre'].max()
-            
-            ultimos_trimestres[ticker] = {
-                'ultimo_ano': int(ultimo_ano),
-                'ultimo_trimestre': int(ultimo_trimestre)
-            }
+        with medir_etapa('marcas_dagua') as etapa:
+            ultimos_trimestres = snapshot.ultimos_trimestres()
+            etapa['registros_saida'] = len(ultimos_trimestres)
         
         # Mostrar resumo
         print(f"\n📊 Resumo dos últimos trimestres por empresa:")
@@ -129,6 +213,46 @@ def obter_ultimos_trimestres_por_empresa():
         traceback.print_exc()
         return {}
 
+def classificar_periodo(data_inicio, data_fim):
+    """
+    Periodo de cada linha: SALDO sem data de início (balanço), TRIMESTRE
+    para até 3 meses, ACUMULADO para períodos maiores (desde janeiro)
+    """
+    
+    meses = (data_fim.dt.year - data_inicio.dt.year) * 12 + data_fim.dt.month - data_inicio.dt.month + 1
+    periodo = np.where(meses <= 3, PERIODO_TRIMESTRE, PERIODO_ACUMULADO)
+    
+    return pd.Series(np.where(data_inicio.isna(), PERIODO_SALDO, periodo), index=data_fim.index)
+
+def deduplicar_por_versao(df, chaves):
+    """
+    Uma linha por chave, independente da ordem do arquivo: ordena pelos códigos
+    da chave, entrega mais recente (DT_REFER), VERSAO decrescente e exercício
+    corrente primeiro, e fica com a primeira linha de cada chave (sem hash de
+    textos). VERSAO só é comparável dentro da mesma entrega. Remove DT_REFER,
+    VERSAO e Corrente.
+    """
+    
+    codigos = [
+        df[c].cat.codes.to_numpy() if isinstance(df[c].dtype, pd.CategoricalDtype)
+        else df[c].fillna(-1).to_numpy(dtype='int64')
+        for c in chaves
+    ]
+    referencia = df['DT_REFER'].fillna(pd.Timestamp(0)).to_numpy(dtype='datetime64[D]').astype('int64')
+    versao = df['VERSAO'].fillna(0).to_numpy(dtype='int64')
+    corrente = df['Corrente'].to_numpy(dtype=bool)
+    
+    # np.lexsort: a última chave da lista é a principal
+    ordem = np.lexsort([~corrente, -versao, -referencia] + codigos[::-1])
+    
+    # Primeira linha de cada chave: alguma coluna da chave difere da linha anterior
+    primeiras = np.ones(len(ordem), dtype=bool)
+    if len(ordem) > 1:
+        ordenados = [c[ordem] for c in codigos]
+        primeiras[1:] = np.logical_or.reduce([c[1:] != c[:-1] for c in ordenados])
+    
+    return df.iloc[ordem[primeiras]].drop(columns=['DT_REFER', 'VERSAO', 'Corrente'])
+
 def transformar_wide_para_long(df, tipo_demonstracao):
     """Transforma dados do formato CVM (wide) para formato Supabase (long)"""
     
@@ -146,12 +270,12 @@ def transformar_wide_para_long(df, tipo_demonstracao):
             print(f"   ⚠️  Coluna de CNPJ não encontrada")
             return None
         
-        # Limpar CNPJ (remover pontos, barras, traços)
-        df[coluna_cnpj] = df[coluna_cnpj].astype(str).str.replace(r'[^\d]', '', regex=True).str.zfill(14)
+        # Limpar CNPJ (remover pontos, barras, traços) e guardar como inteiro
+        df[coluna_cnpj] = limpar_cnpj(df[coluna_cnpj])
         
         # FILTRAR APENAS EMPRESAS MONITORADAS
         print(f"   🔍 Filtrando por {len(CNPJS_MONITORADOS)} CNPJs monitorados...")
-        df_filtrado = df[df[coluna_cnpj].isin(CNPJS_MONITORADOS.keys())].copy()
+        df_filtrado = df[df[coluna_cnpj].isin(REGISTRO_EMPRESAS.cnpjs)].copy()
         
         print(f"   ✅ Após filtro por CNPJ: {len(df_filtrado):,} registros")
         
@@ -160,7 +284,7 @@ def transformar_wide_para_long(df, tipo_demonstracao):
             return None
         
         # Mapear CNPJ para Ticker
-        df_filtrado['Ticker'] = df_filtrado[coluna_cnpj].map(CNPJS_MONITORADOS)
+        df_filtrado['Ticker'] = df_filtrado[coluna_cnpj].map(CNPJS_MONITORADOS_NUMERICOS)
         
         # Limpar e preparar dados
         df_filtrado = df_filtrado.dropna(subset=['DS_CONTA', 'DT_FIM_EXERC', 'VL_CONTA'])
@@ -170,27 +294,55 @@ def transformar_wide_para_long(df, tipo_demonstracao):
         df_filtrado = df_filtrado.dropna(subset=['VL_CONTA'])
         
         # Extrair Ano e Trimestre da data
-        df_filtrado['DT_FIM_EXERC'] = pd.to_datetime(df_filtrado['DT_FIM_EXERC'], errors='coerce')
+        df_filtrado['DT_FIM_EXERC'] = converter_datas(df_filtrado['DT_FIM_EXERC'])
         df_filtrado = df_filtrado.dropna(subset=['DT_FIM_EXERC'])
         
         df_filtrado['Ano'] = df_filtrado['DT_FIM_EXERC'].dt.year
         df_filtrado['Trimestre'] = df_filtrado['DT_FIM_EXERC'].dt.quarter
         
+        # Trimestre isolado, acumulado no ano ou saldo (balanço não tem DT_INI_EXERC)
+        data_inicio = converter_datas(
+            df_filtrado.get('DT_INI_EXERC', pd.Series(index=df_filtrado.index, dtype=str))
+        )
+        df_filtrado['Periodo'] = classificar_periodo(data_inicio, df_filtrado['DT_FIM_EXERC'])
+        df_filtrado['Corrente'] = df_filtrado.get('ORDEM_EXERC') == ORDEM_EXERCICIO_CORRENTE
+        df_filtrado['DT_REFER'] = converter_datas(
+            df_filtrado.get('DT_REFER', pd.Series(index=df_filtrado.index, dtype=str))
+        )
+        if 'VERSAO' not in df_filtrado.columns:
+            df_filtrado['VERSAO'] = 1
+        
+        # CD_CONTA como posição inteira na árvore de contas
+        df_filtrado['Chave_Conta'], df_filtrado['Nivel_Conta'] = codificar_contas_pandas(
+            df_filtrado.get('CD_CONTA', pd.Series(index=df_filtrado.index, dtype=str))
+        )
+        
         # Criar DataFrame final
         df_long = df_filtrado[[
             'Ticker',
             'DS_CONTA',
+            'Chave_Conta',
+            'Nivel_Conta',
             'Ano',
             'Trimestre',
-            'VL_CONTA'
+            'VL_CONTA',
+            'Periodo',
+            'DT_REFER',
+            'VERSAO',
+            'Corrente'
         ]].copy()
         
-        df_long.columns = ['Ticker', 'Conta', 'Ano', 'Trimestre', 'Valor']
+        df_long.columns = [
+            'Ticker', 'Conta', 'Chave_Conta', 'Nivel_Conta', 'Ano', 'Trimestre', 'Valor',
+            'Periodo', 'DT_REFER', 'VERSAO', 'Corrente'
+        ]
+        
+        # Schema compacto: Ticker/Conta como categoria, Ano int16, Trimestre int8
+        df_long = aplicar_schema_pandas(df_long)
         
-        # Remover duplicatas
-        df_long = df_long.drop_duplicates(
-            subset=['Ticker', 'Conta', 'Ano', 'Trimestre'],
-            keep='last'
+        # Remover duplicatas: entrega e versão mais recentes, exercício corrente, um valor por tipo de período
+        df_long = deduplicar_por_versao(
+            df_long, ['Ticker', 'Chave_Conta', 'Conta', 'Ano', 'Trimestre', 'Periodo']
         )
         
         print(f"   ✅ Transformado: {len(df_long):,} registros únicos")
@@ -214,46 +366,40 @@ def filtrar_dados_novos(df_transformado, ultimos_trimestres):
         print(f"   ⚠️  Sem informação de últimos trimestres, mantendo todos os dados")
         return df_transformado
     
-    registros_novos = []
+    # Marcas d'água por ticker como chave de período única: Ano*4 + Trimestre
+    limites = pd.Series(
+        {ticker: info['ultimo_ano'] * 4 + info['ultimo_trimestre'] for ticker, info in ultimos_trimestres.items()},
+        dtype='int64'
+    )
     
-    for ticker in df_transformado['Ticker'].unique():
-        df_ticker = df_transformado[df_transformado['Ticker'] == ticker]
-        
-        if ticker not in ultimos_trimestres:
-            # Empresa nova, adicionar todos os dados
-            registros_novos.append(df_ticker)
-            continue
-        
-        ultimo_ano = ultimos_trimestres[ticker]['ultimo_ano']
-        ultimo_trimestre = ultimos_trimestres[ticker]['ultimo_trimestre']
-        
-        # Filtrar apenas registros APÓS o último trimestre
-        df_novos = df_ticker[
-            (df_ticker['Ano'] > ultimo_ano) |
-            ((df_ticker['Ano'] == ultimo_ano) & (df_ticker['Trimestre'] > ultimo_trimestre))
-        ]
-        
-        if len(df_novos) > 0:
-            registros_novos.append(df_novos)
+    # Uma passada: limite de cada linha (NaN para empresas novas, que entram inteiras)
+    limite = df_transformado['Ticker'].map(limites).astype('float64')
+    periodo = df_transformado['Ano'].astype('int64') * 4 + df_transformado['Trimestre'].astype('int64')
     
-    if registros_novos:
-        df_final = pd.concat(registros_novos, ignore_index=True)
-        print(f"   ✅ Dados novos encontrados: {len(df_final):,} registros")
-        
-        # Mostrar resumo
-        empresas_com_novos = df_final.groupby('Ticker').size()
-        print(f"\n   📊 Empresas com dados novos: {len(empresas_com_novos)}")
-        
-        for ticker in list(empresas_com_novos.index[:5]):
-            df_ticker = df_final[df_final['Ticker'] == ticker]
-            anos_trimestres = df_ticker[['Ano', 'Trimestre']].drop_duplicates()
-            periodos = [f"{row['Ano']}-Q{row['Trimestre']}" for _, row in anos_trimestres.iterrows()]
-            print(f"      • {ticker}: {', '.join(sorted(periodos))} ({len(df_ticker)} registros)")
-        
-        return df_final
-    else:
+    df_final = df_transformado[limite.isna() | (periodo > limite)]
+    
+    if len(df_final) == 0:
         print(f"   ℹ️  Nenhum dado novo encontrado")
         return pd.DataFrame()
+    
+    print(f"   ✅ Dados novos encontrados: {len(df_final):,} registros")
+    
+    # Mostrar resumo
+    resumo = df_final.groupby('Ticker', observed=True).agg(registros=('Ano', 'size'))
+    print(f"\n   📊 Empresas com dados novos: {len(resumo)}")
+    
+    periodos = (
+        df_final.loc[df_final['Ticker'].isin(resumo.index[:5]), ['Ticker', 'Ano', 'Trimestre']]
+        .drop_duplicates()
+        .sort_values(['Ticker', 'Ano', 'Trimestre'])
+    )
+    periodos['Periodo'] = periodos['Ano'].astype(str) + '-Q' + periodos['Trimestre'].astype(str)
+    periodos = periodos.groupby('Ticker', observed=True)['Periodo'].agg(', '.join)
+    
+    for ticker, texto in periodos.items():
+        print(f"      • {ticker}: {texto} ({resumo.loc[ticker, 'registros']} registros)")
+    
+    return df_final
 
 def verificar_ultimo_trimestre_disponivel():
     """Verifica qual o último trimestre disponível na CVM"""
@@ -263,22 +409,24 @@ def verificar_ultimo_trimestre_disponivel():
     print("="*70 + "\n")
     
     ano_atual = datetime.now().year
-    base_url = "https://dados.cvm.gov.br/dados/CIA_ABERTA/DOC/ITR/DADOS/"
     
     try:
-        response = requests.get(base_url, timeout=30)
+        # Listagem via cache com GET condicional
+        with medir_etapa('descoberta') as etapa:
+            listagem = ler_texto_com_cache(BASE_URL_ITR, timeout=30)
+            etapa['bytes'] = len(listagem or '')
         
-        if response.status_code != 200:
-            print(f"❌ Erro ao acessar CVM: HTTP {response.status_code}")
+        if listagem is None:
+            print(f"❌ Erro ao acessar CVM")
             return None
         
         arquivo_ano_atual = f"itr_cia_aberta_{ano_atual}.zip"
         arquivo_ano_anterior = f"itr_cia_aberta_{ano_atual - 1}.zip"
         
-        if arquivo_ano_atual.lower() in response.text.lower():
+        if arquivo_ano_atual.lower() in listagem.lower():
             print(f"✅ Encontrado: {arquivo_ano_atual}")
             return ano_atual, arquivo_ano_atual
-        elif arquivo_ano_anterior.lower() in response.text.lower():
+        elif arquivo_ano_anterior.lower() in listagem.lower():
             print(f"✅ Encontrado: {arquivo_ano_anterior}")
             return ano_atual - 1, arquivo_ano_anterior
         else:
@@ -289,40 +437,145 @@ def verificar_ultimo_trimestre_disponivel():
         print(f"❌ Erro: {e}")
         return None
 
-def baixar_e_processar_itr(ano, arquivo, ultimos_trimestres):
-    """Baixa ZIP da CVM e processa dados filtrados por empresa"""
+def listar_arquivos_itr_disponiveis():
+    """Lista os ZIPs anuais de ITR publicados pela CVM: {ano: arquivo}"""
+    
+    try:
+        with medir_etapa('descoberta') as etapa:
+            listagem = ler_texto_com_cache(BASE_URL_ITR, timeout=30)
+            etapa['bytes'] = len(listagem or '')
+        
+        if listagem is None:
+            print(f"❌ Erro ao acessar CVM")
+            return {}
+        
+        anos = re.findall(r'itr_cia_aberta_(\d{4})\.zip', listagem, flags=re.IGNORECASE)
+        
+        return {int(ano): f"itr_cia_aberta_{ano}.zip" for ano in set(anos)}
+        
+    except Exception as e:
+        print(f"❌ Erro: {e}")
+        return {}
+
+def baixar_zip_itr(arquivo, forcar=False):
+    """
+    Baixa o ZIP anual via cache local (GET condicional, retomada em blocos).
+    Retorna (caminho, modificado).
+    """
     
     print(f"\n📥 Baixando {arquivo}...")
     
-    base_url = "https://dados.cvm.gov.br/dados/CIA_ABERTA/DOC/ITR/DADOS/"
-    url = base_url + arquivo
+    with medir_etapa('download', arquivo=arquivo) as etapa:
+        caminho_zip, modificado = baixar_com_cache(BASE_URL_ITR + arquivo, timeout=300, forcar=forcar)
+        # 304 Not Modified: nada trafegou além dos cabeçalhos
+        etapa['bytes'] = os.path.getsize(caminho_zip) if caminho_zip and modificado else 0
+        etapa['cache'] = bool(caminho_zip) and not modificado
+    
+    if caminho_zip:
+        tamanho_mb = os.path.getsize(caminho_zip) / 1024 / 1024
+        origem = "Download concluído" if modificado else "Reaproveitado do cache"
+        print(f"✅ {origem} ({tamanho_mb:.1f} MB)")
+    
+    return caminho_zip, modificado
+
+def processar_demonstracao(caminho_zip, tipo, csv_name, ultimos_trimestres, leitura='streaming', engine='pandas'):
+    """
+    Pipeline de uma demonstração (leitura → long → dados novos).
+    Abre o ZIP pelo caminho em disco, então pode rodar em um processo separado.
+    Retorna (tipo, info, métricas das etapas); info é None quando não há dados
+    das empresas monitoradas.
+    """
+    
+    print(f"\n📄 Processando: {tipo}")
+    
+    # Coletor próprio: no pool de processos as etapas voltam junto com o resultado
+    metricas = MetricasPipeline()
+    
+    with zipfile.ZipFile(caminho_zip) as zip_file:
+        tamanho_csv = zip_file.getinfo(csv_name).file_size
+        
+        if engine == 'arrow':
+            with metricas.etapa('leitura', demonstracao=tipo) as etapa, zip_file.open(csv_name) as f:
+                tabela = ler_csv_arrow(f)
+                etapa.update(bytes=tamanho_csv, registros_saida=tabela.num_rows)
+            
+            print(f"   • Total de registros: {tabela.num_rows:,}")
+            
+            with metricas.etapa('transformacao', demonstracao=tipo) as etapa:
+                tabela_long = transformar_wide_para_long_arrow(tabela, tipo, CNPJS_MONITORADOS)
+                etapa['registros_entrada'] = tabela.num_rows
+                etapa['registros_saida'] = tabela_long.num_rows if tabela_long is not None else 0
+            
+            if tabela_long is None or tabela_long.num_rows == 0:
+                return tipo, None, metricas.etapas
+            
+            with metricas.etapa('filtro', demonstracao=tipo) as etapa:
+                tabela_novos = filtrar_dados_novos_arrow(tabela_long, ultimos_trimestres)
+                etapa.update(registros_entrada=tabela_long.num_rows, registros_saida=tabela_novos.num_rows)
+            
+            print(f"   ✅ {tipo} pronto para Supabase: {tabela_novos.num_rows:,} registros novos")
+            
+            return tipo, {
+                'tabela': tabela_novos,
+                'registros': tabela_novos.num_rows,
+                'formato': 'long',
+                'somente_novos': True
+            }, metricas.etapas
+        
+        with metricas.etapa('leitura', demonstracao=tipo) as etapa, zip_file.open(csv_name) as f:
+            df = ler_csv_cvm(f, leitura)
+            etapa.update(bytes=tamanho_csv, registros_saida=len(df))
+    
+    # Transformar para formato long
+    with metricas.etapa('transformacao', demonstracao=tipo) as etapa:
+        etapa['registros_entrada'] = len(df)
+        df_long = transformar_wide_para_long(df, tipo)
+        etapa['registros_saida'] = len(df_long) if df_long is not None else 0
+    
+    if df_long is None or len(df_long) == 0:
+        return tipo, None, metricas.etapas
+    
+    # Filtrar apenas dados novos
+    with metricas.etapa('filtro', demonstracao=tipo) as etapa:
+        df_novos = filtrar_dados_novos(df_long, ultimos_trimestres)
+        etapa.update(registros_entrada=len(df_long), registros_saida=len(df_novos))
+    
+    print(f"   ✅ {tipo} pronto para Supabase: {len(df_novos):,} registros novos")
+    
+    return tipo, {
+        'dataframe': df_novos,
+        'registros': len(df_novos),
+        'formato': 'long',
+        'somente_novos': True
+    }, metricas.etapas
+
+def baixar_e_processar_itr(ano, arquivo, ultimos_trimestres, leitura='streaming', engine='pandas',
+                           workers_demonstracoes=None, caminho_zip=None):
+    """
+    Baixa ZIP da CVM e processa dados filtrados por empresa.
+    As demonstrações (DRE/BPA/BPP/DFC) são independentes e rodam em um pool de
+    processos com workers_demonstracoes processos (1 = sequencial, no próprio processo).
+    Se caminho_zip for informado, o download já foi feito e é reaproveitado.
+    """
     
     try:
-        response = requests.get(url, timeout=300, stream=True)
+        if caminho_zip is None:
+            caminho_zip, _ = baixar_zip_itr(arquivo)
         
-        if response.status_code != 200:
-            print(f"❌ Erro no download: HTTP {response.status_code}")
+        if not caminho_zip:
             return None
         
-        tamanho_mb = len(response.content) / 1024 / 1024
-        print(f"✅ Download concluído ({tamanho_mb:.1f} MB)")
-        
-        zip_file = zipfile.ZipFile(BytesIO(response.content))
-        
-        arquivos_relevantes = {
-            'DRE': 'itr_cia_aberta_DRE_con',
-            'BPA': 'itr_cia_aberta_BPA_con',
-            'BPP': 'itr_cia_aberta_BPP_con',
-            'DFC': 'itr_cia_aberta_DFC_MI_con'
-        }
+        # ZIP aberto a partir do disco: os CSVs são lidos sob demanda
+        with zipfile.ZipFile(caminho_zip) as zip_file:
+            nomes = zip_file.namelist()
         
         print(f"\n🔍 Processando dados das {len(CNPJS_MONITORADOS)} empresas monitoradas...")
         
-        dados_processados = {}
+        tarefas = []
         
-        for tipo, arquivo_interno in arquivos_relevantes.items():
+        for tipo, arquivo_interno in ARQUIVOS_RELEVANTES.items():
             csv_name = None
-            for name in zip_file.namelist():
+            for name in nomes:
                 if arquivo_interno in name and name.endswith('.csv'):
                     csv_name = name
                     break
@@ -331,27 +584,35 @@ def baixar_e_processar_itr(ano, arquivo, ultimos_trimestres):
                 print(f"⚠️  {tipo} não encontrado")
                 continue
             
-            print(f"\n📄 Processando: {tipo}")
+            tarefas.append((caminho_zip, tipo, csv_name, ultimos_trimestres, leitura, engine))
+        
+        if workers_demonstracoes is None:
+            workers_demonstracoes = min(len(tarefas), os.cpu_count() or 1)
+        
+        resultados = {}
+        
+        if workers_demonstracoes <= 1 or len(tarefas) <= 1:
+            for tarefa in tarefas:
+                tipo, info, etapas = processar_demonstracao(*tarefa)
+                resultados[tipo] = info
+                obter_metricas().incorporar(etapas, ano=ano)
+        else:
+            print(f"🚀 {len(tarefas)} demonstrações em {workers_demonstracoes} processos")
             
-            with zip_file.open(csv_name) as f:
-                df = pd.read_csv(f, sep=';', encoding='latin1', low_memory=False)
-                
-                print(f"   • Total de registros: {len(df):,}")
+            with ProcessPoolExecutor(max_workers=workers_demonstracoes) as executor:
+                futuros = [executor.submit(processar_demonstracao, *tarefa) for tarefa in tarefas]
                 
-                # Transformar para formato long
-                df_long = transformar_wide_para_long(df, tipo)
-                
-                if df_long is not None and len(df_long) > 0:
-                    # Filtrar apenas dados novos
-                    df_novos = filtrar_dados_novos(df_long, ultimos_trimestres)
-                    
-                    dados_processados[tipo] = {
-                        'dataframe': df_novos,
-                        'registros': len(df_novos),
-                        'formato': 'long',
-                        'somente_novos': True
-                    }
-                    print(f"   ✅ Pronto para Supabase: {len(df_novos):,} registros novos")
+                for futuro in as_completed(futuros):
+                    tipo, info, etapas = futuro.result()
+                    resultados[tipo] = info
+                    obter_metricas().incorporar(etapas, ano=ano)
+        
+        # Mesma ordem de ARQUIVOS_RELEVANTES, independente de quem terminou primeiro
+        dados_processados = {}
+        
+        for tipo in ARQUIVOS_RELEVANTES:
+            if resultados.get(tipo) is not None:
+                dados_processados[tipo] = resultados[tipo]
         
         return dados_processados
         
@@ -361,14 +622,118 @@ def baixar_e_processar_itr(ano, arquivo, ultimos_trimestres):
         traceback.print_exc()
         return None
 
-def atualizar_supabase(dados):
-    """Atualiza dados no Supabase - UPLOAD REAL"""
+def processar_ano_backfill(ano, arquivo, leitura, engine):
+    """
+    Processa um ZIP anual inteiro (sem filtro de dados novos) - roda em processo separado.
+    Retorna (ano, dados, métricas das etapas do processo).
+    """
+    # O processo filho herda o coletor do pai: começar um vazio
+    metricas = novo_coletor()
+    
+    # Já estamos dentro do pool de anos: demonstrações em sequência neste processo
+    dados = baixar_e_processar_itr(
+        ano, arquivo, {},
+        leitura=leitura,
+        engine=engine,
+        workers_demonstracoes=1
+    )
+    
+    return ano, dados, metricas.etapas
+
+def consolidar_anos(resultados_por_ano):
+    """Junta os frames long de vários anos por demonstração, em uma única etapa"""
+    
+    print("\n🔄 Consolidando anos processados...")
+    
+    dados_consolidados = {}
+    anos = sorted(resultados_por_ano)
+    tipos = sorted({tipo for ano in anos for tipo in resultados_por_ano[ano]})
+    
+    for tipo in tipos:
+        # Ordem crescente de ano: o arquivo mais recente prevalece em reapresentações
+        partes = [resultados_por_ano[ano][tipo] for ano in anos if tipo in resultados_por_ano[ano]]
+        chaves = ['Ticker', 'Chave_Conta', 'Conta', 'Ano', 'Trimestre', 'Periodo']
+        
+        if 'tabela' in partes[0]:
+            tabela = deduplicar_arrow(pa.concat_tables([p['tabela'] for p in partes]), chaves)
+            dados_consolidados[tipo] = {'tabela': tabela, 'registros': tabela.num_rows}
+        else:
+            # Categorias diferentes entre anos viram texto no concat: reaplicar o schema
+            df = aplicar_schema_pandas(pd.concat([p['dataframe'] for p in partes], ignore_index=True))
+            df = df.drop_duplicates(subset=chaves, keep='last')
+            dados_consolidados[tipo] = {'dataframe': df, 'registros': len(df)}
+        
+        dados_consolidados[tipo].update({'formato': 'long', 'somente_novos': False})
+        print(f"   • {tipo}: {dados_consolidados[tipo]['registros']:,} registros")
+    
+    return dados_consolidados
+
+def executar_backfill(ano_inicial, ano_final, workers=None, leitura='streaming', engine='pandas'):
+    """
+    Reconstrói o histórico de vários anos: cada ZIP anual é processado em um
+    processo do pool, os resultados são consolidados uma vez e publicados uma vez
+    """
+    
+    print("\n" + "="*70)
+    print(f"🏗️  BACKFILL HISTÓRICO: {ano_inicial} a {ano_final}")
+    print("="*70 + "\n")
+    
+    disponiveis = listar_arquivos_itr_disponiveis()
+    anos = [ano for ano in range(ano_inicial, ano_final + 1) if ano in disponiveis]
+    
+    if not anos:
+        print("⚠️  Nenhum arquivo ITR disponível no intervalo pedido")
+        return None
+    
+    faltando = sorted(set(range(ano_inicial, ano_final + 1)) - set(anos))
+    if faltando:
+        print(f"⚠️  Anos sem arquivo na CVM (ignorados): {', '.join(map(str, faltando))}")
+    
+    workers = min(workers or os.cpu_count() or 1, len(anos))
+    print(f"🚀 Processando {len(anos)} anos com {workers} processos...")
+    
+    resultados_por_ano = {}
+    
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futuros = [
+            executor.submit(processar_ano_backfill, ano, disponiveis[ano], leitura, engine)
+            for ano in anos
+        ]
+        
+        for futuro in as_completed(futuros):
+            ano, dados_ano, etapas = futuro.result()
+            obter_metricas().incorporar(etapas, ano=ano)
+            
+            if dados_ano is None:
+                # Não publicar histórico parcial
+                print(f"❌ Falha ao processar {ano}; backfill abortado")
+                for pendente in futuros:
+                    pendente.cancel()
+                return None
+            
+            resultados_por_ano[ano] = dados_ano
+            print(f"✅ Ano {ano} concluído ({len(resultados_por_ano)}/{len(anos)})")
+    
+    return consolidar_anos(resultados_por_ano)
+
+def atualizar_supabase(dados, substituir=False, snapshot=None, layout=LAYOUT_PARTICIONADO,
+                       compressao=COMPRESSAO_PARQUET, nivel_compressao=None):
+    """
+    Atualiza dados no Supabase - UPLOAD REAL
+    Com substituir=True (backfill) o arquivo publicado substitui o atual em vez de ser mesclado.
+    O snapshot é o mesmo usado nas marcas d'água, então o merge parte da mesma versão.
+    No layout particionado só as partições Ano/Tipo com dados novos são reescritas.
+    compressao/nivel_compressao escolhem o codec Parquet e ficam registrados na tabela de controle.
+    """
     
     print("\n" + "="*70)
     print("📤 ATUALIZANDO SUPABASE")
     print("="*70 + "\n")
     
-    from config.supabase_config import supabase
+    if snapshot is None:
+        snapshot = abrir_snapshot()
+    
+    armazenamento = snapshot.armazenamento
     
     try:
         # Consolidar todos os DataFrames em um único
@@ -378,8 +743,17 @@ def atualizar_supabase(dados):
         total_registros = 0
         tipos_processados = []
         
+        # Motor Arrow entrega tabelas em 'tabela'; o pandas, DataFrames em 'dataframe'
+        usa_arrow = any(isinstance(info, dict) and 'tabela' in info for info in dados.values())
+        
         for tipo, info in dados.items():
-            if isinstance(info, dict) and 'dataframe' in info:
+            if isinstance(info, dict) and 'tabela' in info:
+                tabela = info['tabela']
+                if tabela.num_rows > 0:
+                    dfs_para_upload.append(adicionar_tipo_arrow(tabela, tipo))
+                    total_registros += tabela.num_rows
+                    tipos_processados.append(tipo)
+            elif isinstance(info, dict) and 'dataframe' in info:
                 df = info['dataframe']
                 if len(df) > 0:
                     # Adicionar coluna de tipo de demonstração
@@ -393,108 +767,75 @@ def atualizar_supabase(dados):
             print("⚠️  Nenhum dado novo para fazer upload")
             return True
         
-        # Consolidar em um único DataFrame
-        df_consolidado = pd.concat(dfs_para_upload, ignore_index=True)
+        # Consolidar em um único DataFrame (ou tabela Arrow)
+        with medir_etapa('consolidacao') as etapa:
+            if usa_arrow:
+                df_consolidado = aplicar_schema_arrow(pa.concat_tables(dfs_para_upload))
+                total_empresas = len(pc.unique(df_consolidado['Ticker']))
+            else:
+                df_consolidado = aplicar_schema_pandas(pd.concat(dfs_para_upload, ignore_index=True))
+                total_empresas = df_consolidado['Ticker'].nunique()
+            etapa.update(registros_entrada=total_registros, registros_saida=len(df_consolidado))
         
         print(f"✅ Dados consolidados: {len(df_consolidado):,} registros")
         print(f"   • Tipos: {', '.join(tipos_processados)}")
-        print(f"   • Empresas: {df_consolidado['Ticker'].nunique()}")
-        
-        # OPÇÃO 1: Salvar como novo arquivo Parquet e fazer upload
-        print("\n📦 Preparando arquivo Parquet para upload...")
-        
-        # Baixar arquivo atual
-        print("   📥 Baixando arquivo atual do Supabase...")
-        resultado = supabase.table('balancos_trimestrais') \
-            .select('arquivo_path') \
-            .eq('status', 'ativo') \
-            .order('data_upload', desc=True) \
-            .limit(1) \
-            .execute()
-        
-        if resultado.data:
-            arquivo_path_atual = resultado.data[0]['arquivo_path']
-            response = supabase.storage.from_('balancos').download(arquivo_path_atual)
-            df_atual = pd.read_parquet(BytesIO(response))
+        print(f"   • Empresas: {total_empresas}")
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        opcoes_parquet = {'compression': compressao, 'compression_level': nivel_compressao}
+        
+        if layout == LAYOUT_PARTICIONADO:
+            # Sobre uma base particionada só o segmento delta é enviado
+            print("\n📦 Publicando no layout particionado...")
             
-            print(f"   ✅ Arquivo atual carregado: {len(df_atual):,} registros")
+            if not usa_arrow:
+                df_consolidado = aplicar_schema_arrow(pa.Table.from_pandas(df_consolidado, preserve_index=False))
             
-            # Merge: remover duplicatas e adicionar novos
-            print("   🔀 Fazendo merge com dados existentes...")
+            novo_arquivo, manifesto = publicar_particionado(
+                armazenamento, df_consolidado, snapshot, timestamp,
+                substituir=substituir, opcoes_parquet=opcoes_parquet
+            )
+            registros_total = manifesto['registros_total']
             
-            # Concatenar
-            df_merged = pd.concat([df_atual, df_consolidado], ignore_index=True)
+            print(f"   📄 Manifesto publicado: {novo_arquivo}")
             
-            # Remover duplicatas (manter o mais recente)
-            df_merged = df_merged.drop_duplicates(
-                subset=['Ticker', 'Conta', 'Ano', 'Trimestre', 'Tipo'],
-                keep='last'
+            catalogo_path = publicar_catalogo_versao(
+                armazenamento, snapshot, df_consolidado, substituir, novo_arquivo, registros_total, timestamp
             )
             
-            print(f"   ✅ Após merge: {len(df_merged):,} registros totais")
-            print(f"   📈 Novos registros adicionados: {len(df_merged) - len(df_atual):,}")
+            registrar_versao(
+                armazenamento, novo_arquivo, novo_arquivo, layout,
+                registros_total, opcoes_parquet, manifesto, catalogo_path
+            )
         else:
-            print("   ⚠️  Nenhum arquivo anterior, criando novo")
-            df_merged = df_consolidado
-        
-        # Salvar novo Parquet
-        print("\n   💾 Gerando novo arquivo Parquet...")
-        
-        # Criar arquivo em memória
-        buffer = BytesIO()
-        df_merged.to_parquet(buffer, index=False, compression='snappy')
-        buffer.seek(0)
-        
-        # Nome do arquivo com timestamp
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        novo_arquivo = f"dados/balancos_completo_{timestamp}.parquet"
-        
-        print(f"   📤 Fazendo upload: {novo_arquivo}")
-        
-        # Upload para Supabase Storage
-        supabase.storage.from_('balancos').upload(
-            novo_arquivo,
-            buffer.getvalue(),
-            file_options={"content-type": "application/octet-stream"}
-        )
-        
-        print(f"   ✅ Upload concluído!")
-        
-        # Atualizar tabela de controle
-        print("\n   📝 Atualizando tabela de controle...")
-        
-        # Desativar arquivo anterior
-        if resultado.data:
-            supabase.table('balancos_trimestrais') \
-                .update({'status': 'inativo'}) \
-                .eq('status', 'ativo') \
-                .execute()
-        
-        # Inserir novo registro
-        novo_registro = {
-            'arquivo_path': novo_arquivo,
-            'arquivo_nome': f'balancos_completo_{timestamp}.parquet',
-            'registros_total': len(df_merged),
-            'status': 'ativo',
-            'data_upload': datetime.now().isoformat()
-        }
-        
-        supabase.table('balancos_trimestrais').insert(novo_registro).execute()
+            novo_arquivo, novo_manifesto, registros_total = publicar_monolitico(
+                armazenamento, df_consolidado, snapshot, timestamp, substituir, usa_arrow, opcoes_parquet
+            )
+            
+            catalogo_path = publicar_catalogo_versao(
+                armazenamento, snapshot, df_consolidado, substituir, novo_arquivo, registros_total, timestamp
+            )
+            
+            registrar_versao(
+                armazenamento, novo_arquivo, novo_manifesto, layout,
+                registros_total, opcoes_parquet, catalogo_path=catalogo_path
+            )
         
         # Registrar no log
         log = {
-            'tipo_atualizacao': 'automatica',
+            'tipo_atualizacao': 'backfill' if substituir else 'automatica',
             'status': 'sucesso',
             'registros_novos': total_registros,
-            'mensagem': f'Upload completo! Adicionados {total_registros:,} novos registros. Total agora: {len(df_merged):,}. Arquivo: {novo_arquivo}',
-            'data_execucao': datetime.now().isoformat()
+            'mensagem': f'Upload completo! Adicionados {total_registros:,} novos registros. Total agora: {registros_total:,}. Arquivo: {novo_arquivo}',
+            'data_execucao': datetime.now().isoformat(),
+            'metricas': obter_metricas().resumo()
         }
         
-        supabase.table('log_atualizacoes').insert(log).execute()
+        armazenamento.registrar_log(log)
         
         print(f"\n✅ ATUALIZAÇÃO COMPLETA!")
         print(f"   • Registros novos adicionados: {total_registros:,}")
-        print(f"   • Total de registros no Supabase: {len(df_merged):,}")
+        print(f"   • Total de registros no Supabase: {registros_total:,}")
         print(f"   • Arquivo: {novo_arquivo}")
         
         return True
@@ -511,17 +852,331 @@ def atualizar_supabase(dados):
                 'status': 'erro',
                 'registros_novos': 0,
                 'mensagem': f'Erro: {str(e)[:500]}',
-                'data_execucao': datetime.now().isoformat()
+                'data_execucao': datetime.now().isoformat(),
+                'metricas': obter_metricas().resumo()
             }
-            supabase.table('log_atualizacoes').insert(log_erro).execute()
+            armazenamento.registrar_log(log_erro)
         except:
             pass
         
         return False
 
-def main():
+def publicar_catalogo_versao(armazenamento, snapshot, dados, substituir, arquivo_path, registros_total, timestamp):
+    """
+    Catálogo da versão que está sendo publicada: o da versão ativa mesclado com
+    os dados novos (no backfill, só os dados novos). Falha aqui não impede a
+    publicação; o dashboard volta a usar o manifesto.
+    Chamado antes de registrar_versao: o snapshot ainda é a versão anterior.
+    """
+    
+    try:
+        with medir_etapa('catalogo') as etapa:
+            anterior = None
+            
+            if not substituir and snapshot.registro:
+                anterior = carregar_catalogo(armazenamento, snapshot.registro)
+                
+                if anterior is None:
+                    # Versão publicada antes do catálogo: resumo da base atual, uma única vez
+                    print("   🗂️  Versão ativa sem catálogo, resumindo o dataset atual...")
+                    anterior = gerar_catalogo(snapshot.tabela())
+            
+            # Último trimestre reapresentado: contas da partição mesclada (base atual + lote)
+            ler_publicados = (lambda anos: snapshot.tabela(anos=anos)) if anterior else None
+            catalogo = gerar_catalogo(dados, anterior, arquivo_path, registros_total, ler_publicados)
+            etapa['registros_saida'] = len(catalogo['empresas'])
+            
+            return publicar_catalogo(armazenamento, catalogo, timestamp)
+    
+    except Exception as e:
+        print(f"   ⚠️  Catálogo não publicado: {e}")
+        return None
+
+def registrar_versao(armazenamento, novo_arquivo, novo_manifesto, layout, registros_total,
+                     opcoes_parquet, manifesto=None, catalogo_path=None):
+    """Troca a versão ativa na tabela de controle (delta publicado fica registrado na linha)"""
+    
+    # Atualizar tabela de controle
+    print("\n   📝 Atualizando tabela de controle...")
+    
+    deltas = (manifesto or {}).get('deltas', [])
+    
+    # Inserir novo registro
+    novo_registro = {
+        'arquivo_path': novo_arquivo,
+        'arquivo_nome': os.path.basename(novo_arquivo),
+        'manifesto_path': novo_manifesto,
+        'catalogo_path': catalogo_path,
+        'formato': layout,
+        'registros_total': registros_total,
+        'deltas_pendentes': len(deltas),
+        'compressao': opcoes_parquet['compression'],
+        'nivel_compressao': opcoes_parquet['compression_level'],
+        'segmento_delta': deltas[-1]['caminho'] if deltas else None,
+        'status': 'ativo',
+        'data_upload': datetime.now().isoformat()
+    }
+    
+    # Desativar arquivo anterior e inserir o novo
+    with medir_etapa('troca_versao'):
+        armazenamento.trocar_versao_ativa(novo_registro)
+
+def compactar_supabase(forcar=False, max_deltas=MAX_DELTAS_PENDENTES, max_bytes=MAX_BYTES_DELTAS,
+                       compressao=COMPRESSAO_PARQUET, nivel_compressao=None):
+    """
+    Compactação: incorpora os segmentos delta pendentes à base particionada
+    quando passam do limite de quantidade ou tamanho (ou sempre, com forcar)
+    """
+    
+    print("\n" + "="*70)
+    print("🗜️  COMPACTANDO DELTAS")
+    print("="*70 + "\n")
+    
+    snapshot = abrir_snapshot()
+    armazenamento = snapshot.armazenamento
+    
+    try:
+        if not snapshot.registro or not snapshot.particionado:
+            print("⚠️  Versão ativa não usa o layout particionado, nada a compactar")
+            return True
+        
+        deltas = snapshot.deltas()
+        tamanho = sum(d['tamanho_bytes'] for d in deltas)
+        print(f"📊 {len(deltas)} delta(s) pendente(s), {tamanho / 1024 / 1024:.1f} MB")
+        
+        if not deltas or not (forcar or precisa_compactar(snapshot.manifesto, max_deltas, max_bytes)):
+            print("✅ Abaixo do limite, compactação adiada")
+            return True
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        opcoes_parquet = {'compression': compressao, 'compression_level': nivel_compressao}
+        novo_arquivo, manifesto = compactar_deltas(armazenamento, snapshot, timestamp, opcoes_parquet)
+        
+        print(f"   📄 Manifesto publicado: {novo_arquivo}")
+        
+        # Compactação não muda o conteúdo: o catálogo da versão anterior continua valendo
+        registrar_versao(
+            armazenamento, novo_arquivo, novo_arquivo,
+            LAYOUT_PARTICIONADO, manifesto['registros_total'], opcoes_parquet, manifesto,
+            snapshot.registro.get('catalogo_path')
+        )
+        
+        armazenamento.registrar_log({
+            'tipo_atualizacao': 'compactacao',
+            'status': 'sucesso',
+            'registros_novos': 0,
+            'mensagem': f'{len(deltas)} delta(s) compactado(s). Total agora: {manifesto["registros_total"]:,}. Arquivo: {novo_arquivo}',
+            'data_execucao': datetime.now().isoformat(),
+            'metricas': obter_metricas().resumo()
+        })
+        
+        print(f"\n✅ COMPACTAÇÃO CONCLUÍDA! Total: {manifesto['registros_total']:,} registros")
+        
+        return True
+        
+    except Exception as e:
+        print(f"\n❌ Erro na compactação: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+def publicar_monolitico(armazenamento, df_consolidado, snapshot, timestamp, substituir=False, usa_arrow=False,
+                        opcoes_parquet=None):
+    """
+    Layout original: mescla com o arquivo ativo inteiro e publica um único Parquet.
+    Retorna (caminho do Parquet, caminho do manifesto, total de registros).
+    """
+    
+    print("\n📦 Preparando arquivo Parquet para upload...")
+    
+    # Baixar arquivo atual
+    if snapshot.registro and not substituir:
+        print(f"   📥 Carregando arquivo atual ({snapshot.arquivo_path})...")
+        
+        if usa_arrow:
+            df_atual = snapshot.tabela()
+        else:
+            df_atual = snapshot.dataframe()
+        
+        print(f"   ✅ Arquivo atual carregado: {len(df_atual):,} registros")
+        
+        # Merge: remover duplicatas e adicionar novos
+        print("   🔀 Fazendo merge com dados existentes...")
+        
+        with medir_etapa('mesclagem') as etapa:
+            if usa_arrow:
+                df_merged = mesclar_tabelas_arrow(df_atual, df_consolidado, CHAVES_REGISTRO)
+            else:
+                # Concatenar
+                df_merged = aplicar_schema_pandas(pd.concat([df_atual, df_consolidado], ignore_index=True))
+                
+                # Remover duplicatas (manter o mais recente)
+                df_merged = df_merged.drop_duplicates(subset=CHAVES_REGISTRO, keep='last')
+            
+            etapa.update(registros_entrada=len(df_atual) + len(df_consolidado), registros_saida=len(df_merged))
+        
+        print(f"   ✅ Após merge: {len(df_merged):,} registros totais")
+        print(f"   📈 Novos registros adicionados: {len(df_merged) - len(df_atual):,}")
+    elif substituir:
+        print("   ♻️  Backfill: histórico reconstruído substitui o arquivo atual")
+        df_merged = df_consolidado
+    else:
+        print("   ⚠️  Nenhum arquivo anterior, criando novo")
+        df_merged = df_consolidado
+    
+    # Salvar novo Parquet
+    print("\n   💾 Gerando novo arquivo Parquet...")
+    
+    # Criar arquivo em memória (ordenado, com row groups e page index para leitura seletiva)
+    with medir_etapa('serializacao') as etapa:
+        if usa_arrow:
+            conteudo_parquet = tabela_para_parquet(df_merged, **(opcoes_parquet or {}))
+        else:
+            conteudo_parquet = tabela_para_parquet(
+                pa.Table.from_pandas(df_merged, preserve_index=False), **(opcoes_parquet or {})
+            )
+        etapa.update(registros_entrada=len(df_merged), bytes=len(conteudo_parquet))
+    
+    # Nome do arquivo com timestamp
+    novo_arquivo = f"dados/balancos_completo_{timestamp}.parquet"
+    
+    print(f"   📤 Fazendo upload: {novo_arquivo}")
+    
+    # Upload para o bucket
+    with medir_etapa('upload', arquivo=novo_arquivo) as etapa:
+        armazenamento.enviar(novo_arquivo, conteudo_parquet)
+        etapa['bytes'] = len(conteudo_parquet)
+    
+    print(f"   ✅ Upload concluído!")
+    
+    # Manifesto com marcas d'água por ticker: próximas execuções leem só ele
+    novo_manifesto = caminho_manifesto(novo_arquivo)
+    manifesto = gerar_manifesto(df_merged, novo_arquivo, conteudo_parquet)
+    conteudo_manifesto = json.dumps(manifesto).encode('utf-8')
+    
+    with medir_etapa('upload', arquivo=novo_manifesto) as etapa:
+        armazenamento.enviar(novo_manifesto, conteudo_manifesto, 'application/json')
+        etapa['bytes'] = len(conteudo_manifesto)
+    
+    print(f"   📄 Manifesto publicado: {novo_manifesto}")
+    
+    return novo_arquivo, novo_manifesto, len(df_merged)
+
+def parse_argumentos(argv=None):
+    """Lê opções de linha de comando"""
+    
+    parser = argparse.ArgumentParser(description="Atualiza dados da CVM no Supabase")
+    parser.add_argument(
+        '--leitura',
+        choices=['streaming', 'completa'],
+        default='streaming',
+        help="streaming: colunas necessárias, em blocos, filtrando CNPJs; completa: CSV inteiro"
+    )
+    parser.add_argument(
+        '--engine',
+        choices=['pandas', 'arrow'],
+        default='pandas',
+        help="pandas: caminho original; arrow: pyarrow.csv + Arrow compute, grava Parquet sem pandas"
+    )
+    parser.add_argument(
+        '--backfill',
+        nargs=2,
+        type=int,
+        metavar=('ANO_INICIAL', 'ANO_FINAL'),
+        help="reconstrói o histórico dos anos indicados (um processo por ZIP anual)"
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help="processos usados no backfill (padrão: número de CPUs)"
+    )
+    parser.add_argument(
+        '--workers-demonstracoes',
+        type=int,
+        default=None,
+        help="processos para DRE/BPA/BPP/DFC de um mesmo ZIP (padrão: um por demonstração, até o número de CPUs; 1 = sequencial)"
+    )
+    parser.add_argument(
+        '--forcar',
+        action='store_true',
+        help="ignora o cache de downloads e reprocessa mesmo sem mudança na CVM"
+    )
+    parser.add_argument(
+        '--layout',
+        choices=[LAYOUT_PARTICIONADO, LAYOUT_MONOLITICO],
+        default=LAYOUT_PARTICIONADO,
+        help="particionado: base por Ano/Tipo + segmentos delta; monolitico: arquivo único reescrito"
+    )
+    parser.add_argument(
+        '--compressao',
+        choices=['zstd', 'snappy', 'gzip', 'lz4', 'none'],
+        default=COMPRESSAO_PARQUET,
+        help="codec dos Parquet publicados (registrado na tabela de controle)"
+    )
+    parser.add_argument(
+        '--nivel-compressao',
+        type=int,
+        default=None,
+        help="nível do codec (ex.: zstd 1-22); padrão do pyarrow se omitido"
+    )
+    parser.add_argument(
+        '--armazenamento',
+        choices=['supabase', 'local'],
+        default=None,
+        help="onde publicar (padrão: BALANCOS_ARMAZENAMENTO ou supabase); local = diretório + SQLite, sem rede"
+    )
+    parser.add_argument(
+        '--diretorio-local',
+        default=None,
+        help="raiz do armazenamento local (padrão: BALANCOS_DIR_LOCAL ou dados_locais); implica --armazenamento local"
+    )
+    parser.add_argument(
+        '--compactar',
+        action='store_true',
+        help="incorpora os deltas pendentes à base se passarem do limite (com --forcar, sempre)"
+    )
+    parser.add_argument(
+        '--max-deltas',
+        type=int,
+        default=MAX_DELTAS_PENDENTES,
+        help="quantidade de deltas pendentes que dispara a compactação"
+    )
+    parser.add_argument(
+        '--max-mb-deltas',
+        type=int,
+        default=MAX_BYTES_DELTAS // (1024 * 1024),
+        help="tamanho total (MB) de deltas pendentes que dispara a compactação"
+    )
+    
+    args = parser.parse_args(argv)
+    
+    # Diretório local sem --armazenamento não pode cair no Supabase (variável de ambiente)
+    if args.diretorio_local:
+        if args.armazenamento == 'supabase':
+            parser.error("--diretorio-local só pode ser usado com --armazenamento local")
+        args.armazenamento = 'local'
+    
+    return args
+
+def main(argv=None):
     """Função principal"""
     
+    args = parse_argumentos(argv)
+    novo_coletor()
+    
+    try:
+        executar(args)
+    finally:
+        # Métricas por etapa em JSON (também quando a execução falha)
+        obter_metricas().emitir()
+
+def executar(args):
+    """Fluxo da execução: compactação, backfill ou atualização incremental"""
+    
+    if args.armazenamento or args.diretorio_local:
+        definir_armazenamento(criar_armazenamento(args.armazenamento, args.diretorio_local))
+    
     print("\n" + "="*70)
     print("🤖 AUTOMAÇÃO DE ATUALIZAÇÃO - DADOS CVM")
     print("="*70)
@@ -530,8 +1185,30 @@ def main():
     
     print(f"\n📊 Monitorando {len(CNPJS_MONITORADOS)} empresas da B3")
     
-    # Obter últimos trimestres
-    ultimos_trimestres = obter_ultimos_trimestres_por_empresa()
+    if args.compactar:
+        if not compactar_supabase(args.forcar, args.max_deltas, args.max_mb_deltas * 1024 * 1024,
+                                  args.compressao, args.nivel_compressao):
+            sys.exit(1)
+        return
+    
+    if args.backfill:
+        ano_inicial, ano_final = args.backfill
+        dados = executar_backfill(
+            ano_inicial, ano_final,
+            workers=args.workers,
+            leitura=args.leitura,
+            engine=args.engine
+        )
+        
+        if not dados or not atualizar_supabase(
+            dados, substituir=True, snapshot=abrir_snapshot(), layout=args.layout,
+            compressao=args.compressao, nivel_compressao=args.nivel_compressao
+        ):
+            print("\n❌ Falha no backfill")
+            sys.exit(1)
+        
+        print("\n✅ BACKFILL CONCLUÍDO!\n")
+        return
     
     # Verificar dados disponíveis
     resultado = verificar_ultimo_trimestre_disponivel()
@@ -542,10 +1219,35 @@ def main():
         return
     
     ano, arquivo = resultado
+    url = BASE_URL_ITR + arquivo
+    
+    # Download condicional: 304 em um ZIP já processado encerra a execução aqui
+    caminho_zip, modificado = baixar_zip_itr(arquivo, forcar=args.forcar)
+    
+    if not caminho_zip:
+        print("\n❌ Falha no download")
+        sys.exit(1)
+    
+    if not modificado and arquivo_ja_processado(url) and not args.forcar:
+        print(f"\n💾 {arquivo} não mudou desde a última execução processada")
+        print("✅ Sistema já está atualizado\n")
+        return
+    
+    # Versão ativa resolvida uma vez: marcas d'água e merge usam o mesmo snapshot
+    snapshot = abrir_snapshot()
     
-    # Baixar e processar
+    # Obter últimos trimestres
+    ultimos_trimestres = obter_ultimos_trimestres_por_empresa(snapshot)
+    
+    # Processar
     print(f"\n🔄 Iniciando processamento do ano {ano}...")
-    dados = baixar_e_processar_itr(ano, arquivo, ultimos_trimestres)
+    dados = baixar_e_processar_itr(
+        ano, arquivo, ultimos_trimestres,
+        leitura=args.leitura,
+        engine=args.engine,
+        workers_demonstracoes=args.workers_demonstracoes,
+        caminho_zip=caminho_zip
+    )
     
     if dados:
         print(f"\n📊 Resumo do processamento:")
@@ -561,6 +1263,12 @@ def main():
         if total_registros > 0:
             print(f"\n🔍 AMOSTRA DOS DADOS TRANSFORMADOS:")
             for tipo in ['DRE']:
+                if tipo in dados and 'tabela' in dados[tipo]:
+                    df_amostra = dados[tipo]['tabela'].slice(0, 5).to_pandas()
+                    if len(df_amostra) > 0:
+                        print(f"\n   {tipo} - Primeiras 5 linhas:")
+                        print(df_amostra.to_string(index=False))
+                    break
                 if tipo in dados and 'dataframe' in dados[tipo]:
                     df_amostra = dados[tipo]['dataframe']
                     if len(df_amostra) > 0:
@@ -569,9 +1277,15 @@ def main():
                     break
         
         # Atualizar Supabase
-        sucesso = atualizar_supabase(dados)
+        sucesso = atualizar_supabase(
+            dados, snapshot=snapshot, layout=args.layout,
+            compressao=args.compressao, nivel_compressao=args.nivel_compressao
+        )
         
         if sucesso:
+            # Próxima execução com o mesmo ZIP (304) pode parar logo após o download
+            marcar_processado(url)
+            
             print("\n" + "="*70)
             print("✅ ATUALIZAÇÃO CONCLUÍDA COM SUCESSO!")
             print("="*70 + "\n")